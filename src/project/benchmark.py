@@ -0,0 +1,350 @@
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+import hydra
+import numpy as np
+import pandas as pd
+import sklearn
+from omegaconf import DictConfig, OmegaConf
+from sklearn.datasets import make_regression
+from sklearn.model_selection import cross_validate
+from sklearn.pipeline import Pipeline
+
+from project.data.module import DataModule
+from project.profiling import peak_rss_mb
+from project.utils import seed_everything
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+CONFIG_DIR = BASE_DIR / "configs"
+
+
+def make_dataset(
+    output_dir: str | Path, n_rows: int, n_features: int, seed: int | None = None
+) -> tuple[str, str]:
+    """
+    Write synthetic train and test regression datasets as CSV files.
+
+    The target is shifted to be strictly positive, so that percentage errors are
+    well defined.
+
+    Args:
+        output_dir (str | Path): Directory to write the datasets to.
+        n_rows (int): Number of rows of each dataset.
+        n_features (int): Number of features.
+        seed (int | None, optional): Random seed. Defaults to None.
+
+    Returns:
+        tuple[str, str]: Paths of the train and test datasets.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    X, y = make_regression(
+        n_samples=2 * n_rows,
+        n_features=n_features,
+        n_informative=max(1, n_features // 2),
+        noise=1.0,
+        random_state=seed,
+    )
+    df = pd.DataFrame(X, columns=[f"x{i}" for i in range(n_features)])
+    df.insert(0, "id", np.arange(len(df)))
+    df["target"] = y - y.min() + 1
+
+    paths = output_dir / "train.csv", output_dir / "test.csv"
+    df.iloc[:n_rows].to_csv(paths[0], index=False)
+    df.iloc[n_rows:].drop(columns=["target"]).to_csv(paths[1], index=False)
+
+    return str(paths[0]), str(paths[1])
+
+
+def benchmark_loading(
+    train_url: str, test_url: str, cache_dir: str | Path
+) -> dict[str, float | None]:
+    """
+    Time loading the training dataset from CSV and from the dataset cache.
+
+    Args:
+        train_url (str): URL of the training dataset.
+        test_url (str): URL of the test dataset.
+        cache_dir (str | Path): Directory of the dataset cache, expected empty.
+
+    Returns:
+        dict[str, float | None]: Load times, throughput and peak RSS.
+    """
+    results: dict[str, float | None] = {}
+    for stage in ("csv", "cache_miss", "cache_hit"):
+        data_module = DataModule(
+            train_url,
+            test_url,
+            "target",
+            cache_dir=None if stage == "csv" else cache_dir,
+        )
+
+        start = time.perf_counter()
+        n_rows = len(data_module.df_train)
+        elapsed = time.perf_counter() - start
+
+        results[f"{stage}_seconds"] = elapsed
+        results[f"{stage}_rows_per_second"] = n_rows / elapsed
+
+    results["peak_rss_mb"] = peak_rss_mb()
+
+    return results
+
+
+def benchmark_model(
+    pipeline: Pipeline,
+    X: pd.DataFrame,
+    y: pd.Series,
+    X_test: pd.DataFrame,
+    cv: int = 3,
+    n_jobs: int | None = None,
+    latency_repeats: int = 100,
+) -> dict[str, float | None]:
+    """
+    Time fitting, cross-validating and predicting with a model pipeline.
+
+    The peak RSS is that of the whole process, so models are benchmarked in a
+    process of their own (see `run_isolated`) for it to be theirs.
+
+    Args:
+        pipeline (Pipeline): The model pipeline.
+        X (pd.DataFrame): Training features.
+        y (pd.Series): Training target.
+        X_test (pd.DataFrame): Features to predict.
+        cv (int, optional): Number of cross-validation folds. Defaults to 3.
+        n_jobs (int | None, optional): Number of cross-validation workers.
+            Defaults to None.
+        latency_repeats (int, optional): Number of single-row predictions the
+            latency percentiles are computed over. Defaults to 100.
+
+    Returns:
+        dict[str, float | None]: Timings, throughput, latency and peak RSS.
+    """
+    start = time.perf_counter()
+    cross_validate(pipeline, X, y, cv=cv, n_jobs=n_jobs)
+    cv_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pipeline.fit(X, y)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pipeline.predict(X_test)
+    predict_seconds = time.perf_counter() - start
+
+    latencies = []
+    for i in range(latency_repeats):
+        row = X_test.iloc[[i % len(X_test)]]
+        start = time.perf_counter()
+        pipeline.predict(row)
+        latencies.append(time.perf_counter() - start)
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+
+    return {
+        "cv_seconds": cv_seconds,
+        "fit_seconds": fit_seconds,
+        "fit_rows_per_second": len(X) / fit_seconds,
+        "predict_seconds": predict_seconds,
+        "predict_rows_per_second": len(X_test) / predict_seconds,
+        "predict_latency_p50_ms": float(p50),
+        "predict_latency_p99_ms": float(p99),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_isolated(function: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Call a function in a fresh process, so that the peak RSS it measures is its own.
+
+    The process is spawned rather than forked, as a forked process starts from the
+    peak RSS of its parent.
+
+    Args:
+        function (Callable[..., Any]): The function, importable by the process.
+        *args (Any): Positional arguments of the function.
+        **kwargs (Any): Keyword arguments of the function.
+
+    Returns:
+        Any: The result of the function.
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(function, *args, **kwargs).result()
+
+
+def compare_results(
+    results: dict[str, dict[str, float | None]],
+    baseline: dict[str, dict[str, float | None]],
+    tolerance: float = 0.25,
+) -> list[dict[str, Any]]:
+    """
+    Compare benchmark results against a baseline.
+
+    Throughput (`*_per_second`) regresses when it drops, every other measurement
+    (times, latencies, memory) when it grows, by more than the tolerance.
+
+    Args:
+        results (dict[str, dict[str, float | None]]): Measurements by benchmark.
+        baseline (dict[str, dict[str, float | None]]): Baseline measurements by
+            benchmark.
+        tolerance (float, optional): Relative change tolerated. Defaults to 0.25.
+
+    Returns:
+        list[dict[str, Any]]: The regressions, with the benchmark, measurement,
+            baseline and current values and their relative change.
+    """
+    regressions = []
+    for name, measurements in results.items():
+        for measurement, value in measurements.items():
+            reference = baseline.get(name, {}).get(measurement)
+            if value is None or not reference:
+                continue
+
+            change = (value - reference) / reference
+            higher_is_better = measurement.endswith("_per_second")
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(
+                    {
+                        "benchmark": name,
+                        "measurement": measurement,
+                        "baseline": reference,
+                        "current": value,
+                        "change": change,
+                    }
+                )
+
+    return regressions
+
+
+def benchmark(cfg: DictConfig) -> list[dict[str, Any]]:
+    """
+    Benchmark data loading and every configured model on a synthetic dataset.
+
+    Args:
+        cfg: Configuration composed by Hydra
+
+    Returns:
+        list[dict[str, Any]]: The regressions against the baseline, if any.
+    """
+    output_dir = Path(hydra.core.hydra_config.HydraConfig.get().runtime.output_dir)
+
+    logger.info(f"Loaded configuration: \n{OmegaConf.to_yaml(cfg)}")
+
+    # Set random seed for reproducibility
+    if cfg.get("seed"):
+        logger.info(f"Setting random seed to {cfg.seed}")
+        seed_everything(cfg.seed)
+
+    logger.info(
+        f"Generating synthetic dataset ({cfg.n_rows} rows, {cfg.n_features} features)"
+    )
+    train_url, test_url = make_dataset(
+        output_dir / "data", cfg.n_rows, cfg.n_features, seed=cfg.get("seed")
+    )
+
+    results = {}
+
+    logger.info("Benchmarking data loading")
+    results["load"] = benchmark_loading(train_url, test_url, output_dir / "cache")
+
+    data_module = DataModule(train_url, test_url, "target")
+    _, X, y = data_module.get_train_data()
+    _, X_test = data_module.get_test_data()
+
+    for name, model_cfg in cfg.models.items():
+        logger.info(f"Benchmarking model {name}")
+        # Measure the models themselves rather than the transformer cache
+        pipeline = hydra.utils.instantiate(model_cfg, memory=None)
+        results[name] = run_isolated(
+            benchmark_model,
+            pipeline,
+            X,
+            y,
+            X_test,
+            cv=cfg.cv,
+            n_jobs=cfg.get("n_jobs"),
+            latency_repeats=cfg.latency_repeats,
+        )
+
+    for name, measurements in results.items():
+        logger.info(f"{name}:")
+        for measurement, value in measurements.items():
+            if value is not None:
+                logger.info(f"  {measurement}: {value:.4f}")
+
+    report = {
+        "metadata": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "n_rows": cfg.n_rows,
+            "n_features": cfg.n_features,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "scikit-learn": sklearn.__version__,
+        },
+        "results": results,
+    }
+
+    # Compare against the baseline, or record this run as the new baseline
+    baseline_file = Path(cfg.baseline)
+    regressions = []
+    if cfg.get("save_baseline"):
+        baseline_file.parent.mkdir(parents=True, exist_ok=True)
+        baseline_file.write_text(json.dumps(report, indent=2))
+        logger.info(f"Saved baseline to {baseline_file}")
+    elif baseline_file.is_file():
+        baseline = json.loads(baseline_file.read_text())
+        regressions = compare_results(results, baseline["results"], cfg.tolerance)
+        for regression in regressions:
+            logger.warning(
+                f"Regression in {regression['benchmark']}.{regression['measurement']}: "
+                f"{regression['baseline']:.4f} -> {regression['current']:.4f} "
+                f"({regression['change']:+.0%})"
+            )
+        if not regressions:
+            logger.info(f"No regressions against the baseline {baseline_file}")
+    else:
+        logger.info(f"No baseline found at {baseline_file}")
+
+    report["regressions"] = regressions
+    results_file = output_dir / "benchmark.json"
+    results_file.write_text(json.dumps(report, indent=2))
+    logger.info(f"Saved benchmark results to {results_file}")
+
+    return regressions
+
+
+@hydra.main(
+    version_base="1.3",
+    config_path=CONFIG_DIR.as_posix(),
+    config_name="benchmark.yaml",
+)
+def main(cfg: DictConfig) -> None:
+    """
+    Main entry point for benchmarking.
+
+    Args:
+        cfg: Configuration composed by Hydra
+    """
+    regressions = benchmark(cfg)
+    if regressions and cfg.get("fail_on_regression"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
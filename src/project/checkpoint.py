@@ -0,0 +1,227 @@
+import functools
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any
+
+import joblib
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def save_model(model: Any, path: str | Path) -> Path:
+    """
+    Save a trained model as a memory-mappable checkpoint.
+
+    The checkpoint is written uncompressed, so its numpy arrays are stored raw and
+    aligned within the file and can be memory-mapped by `load_model`.
+
+    Args:
+        model (Any): The trained model (e.g. a scikit-learn Pipeline).
+        path (str | Path): Where to save the checkpoint.
+
+    Returns:
+        Path: The path of the checkpoint.
+    """
+    path = Path(path)
+    joblib.dump(model, path, compress=0)
+    logger.info(f"Model saved to {path} ({path.stat().st_size / 1024**2:.2f} MB)")
+
+    return path
+
+
+def load_model(path: str | Path, mmap_mode: str | None = "r") -> Any:
+    """
+    Load a model checkpoint, reusing models already loaded by this process.
+
+    Loaded models are cached by path and modification time, so repeated loads are
+    free while an overwritten checkpoint is picked up again. With `mmap_mode`, large
+    numpy arrays are memory-mapped from the checkpoint instead of read into memory,
+    so that concurrent worker processes share their pages. The returned model is
+    shared between callers and must not be modified.
+
+    Args:
+        path (str | Path): Path to the checkpoint.
+        mmap_mode (str | None, optional): Memory-mapping mode of the numpy arrays
+            (see `numpy.load`), or None to read them into memory. Defaults to "r".
+
+    Returns:
+        Any: The trained model.
+    """
+    path = Path(path).resolve()
+    return _load_model(path, path.stat().st_mtime_ns, mmap_mode)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_model(path: Path, mtime_ns: int, mmap_mode: str | None) -> Any:
+    logger.info(f"Loading model from {path}")
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+def clear_model_cache() -> None:
+    """Forget the models loaded by this process."""
+    _load_model.cache_clear()
+
+
+def save_lineage(
+    path: str | Path,
+    ids: np.ndarray,
+    row_hashes: np.ndarray,
+    parent: str | Path | None = None,
+    held_out: np.ndarray | None = None,
+    **metadata: Any,
+) -> Path:
+    """
+    Record the lineage of a checkpoint next to it.
+
+    The parent checkpoint, the fingerprint of the data and any metadata are written
+    to `<name>.lineage.json`, and the hashes of the rows to `<name>.rows.npz`, so
+    that retraining from the checkpoint can tell which rows were added or changed
+    since (see `changed_rows`) and which ones it was trained on (see
+    `trained_rows`).
+
+    Args:
+        path (str | Path): Path of the checkpoint.
+        ids (np.ndarray): Hashes of the ids of the rows, held out ones included.
+        row_hashes (np.ndarray): Hashes of the content of the rows.
+        parent (str | Path | None, optional): Checkpoint the model was retrained
+            from, if any. Defaults to None.
+        held_out (np.ndarray | None, optional): Mask of the rows the model was not
+            trained on. Defaults to None (trained on every row).
+        **metadata (Any): Additional JSON-serializable metadata to record.
+
+    Returns:
+        Path: The path of the lineage file.
+    """
+    path = Path(path)
+    if held_out is None:
+        held_out = np.zeros(len(ids), dtype=bool)
+    np.savez(_rows_file(path), ids=ids, row_hashes=row_hashes, held_out=held_out)
+
+    lineage_file = _lineage_file(path)
+    lineage_file.write_text(
+        json.dumps(
+            {
+                "parent": str(parent) if parent is not None else None,
+                "data_fingerprint": data_fingerprint(ids, row_hashes),
+                "rows": len(ids),
+                **metadata,
+            },
+            indent=2,
+        )
+    )
+    logger.info(f"Lineage saved to {lineage_file}")
+
+    return lineage_file
+
+
+def load_lineage(path: str | Path) -> dict[str, Any] | None:
+    """
+    Load the lineage of a checkpoint recorded by `save_lineage`.
+
+    Args:
+        path (str | Path): Path of the checkpoint.
+
+    Returns:
+        dict[str, Any] | None: The lineage, with the hashes of the rows under "ids"
+            and "row_hashes" and the mask of the held out ones under "held_out", or
+            None if it was not recorded.
+    """
+    path = Path(path)
+    if not _lineage_file(path).is_file() or not _rows_file(path).is_file():
+        return None
+
+    lineage = json.loads(_lineage_file(path).read_text())
+    with np.load(_rows_file(path)) as rows:
+        lineage["ids"] = rows["ids"]
+        lineage["row_hashes"] = rows["row_hashes"]
+        # Lineages recorded before held out rows were kept only hold training rows
+        lineage["held_out"] = (
+            rows["held_out"]
+            if "held_out" in rows
+            else np.zeros(len(lineage["ids"]), dtype=bool)
+        )
+
+    return lineage
+
+
+def data_fingerprint(ids: np.ndarray, row_hashes: np.ndarray) -> str:
+    """
+    Fingerprint a dataset by the hashes of its rows, regardless of their order.
+
+    Args:
+        ids (np.ndarray): Hashes of the ids of the rows.
+        row_hashes (np.ndarray): Hashes of the content of the rows.
+
+    Returns:
+        str: The fingerprint.
+    """
+    order = np.argsort(ids, kind="stable")
+    digest = hashlib.sha256(np.ascontiguousarray(ids[order]).tobytes())
+    digest.update(np.ascontiguousarray(row_hashes[order]).tobytes())
+
+    return digest.hexdigest()[:32]
+
+
+def changed_rows(
+    lineage: dict[str, Any], ids: np.ndarray, row_hashes: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Find the rows added or changed since a checkpoint was trained.
+
+    Rows are matched against every row of the lineage, held out ones included.
+
+    Args:
+        lineage (dict[str, Any]): Lineage of the checkpoint (see `load_lineage`).
+        ids (np.ndarray): Hashes of the ids of the current rows.
+        row_hashes (np.ndarray): Hashes of the content of the current rows.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Masks of the new rows (whose id the
+            lineage does not hold) and of the changed rows.
+    """
+    positions, known = _match(lineage["ids"], ids)
+    changed = np.zeros(len(ids), dtype=bool)
+    changed[known] = lineage["row_hashes"][positions[known]] != row_hashes[known]
+
+    return ~known, changed
+
+
+def trained_rows(lineage: dict[str, Any], ids: np.ndarray) -> np.ndarray:
+    """
+    Find the rows a checkpoint was trained on, whatever their content since.
+
+    Args:
+        lineage (dict[str, Any]): Lineage of the checkpoint (see `load_lineage`).
+        ids (np.ndarray): Hashes of the ids of the current rows.
+
+    Returns:
+        np.ndarray: Mask of the rows whose id the checkpoint was trained on.
+    """
+    positions, known = _match(lineage["ids"], ids)
+    trained = np.zeros(len(ids), dtype=bool)
+    trained[known] = ~lineage["held_out"][positions[known]]
+
+    return trained
+
+
+def _match(known_ids: np.ndarray, ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Positions of ids among known ones, and whether they were found."""
+    if not len(known_ids):
+        return np.zeros(len(ids), dtype=np.intp), np.zeros(len(ids), dtype=bool)
+
+    order = np.argsort(known_ids, kind="stable")
+    positions = np.searchsorted(known_ids, ids, sorter=order)
+    positions = order[positions.clip(max=len(known_ids) - 1)]
+
+    return positions, known_ids[positions] == ids
+
+
+def _lineage_file(path: Path) -> Path:
+    return path.with_name(f"{path.stem}.lineage.json")
+
+
+def _rows_file(path: Path) -> Path:
+    return path.with_name(f"{path.stem}.rows.npz")
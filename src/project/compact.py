@@ -0,0 +1,405 @@
+import copy
+import logging
+import time
+from pathlib import Path
+from typing import Any
+
+import joblib
+import numpy as np
+from sklearn.pipeline import Pipeline
+from sklearn.tree._tree import NODE_DTYPE, TREE_LEAF, TREE_UNDEFINED, Tree
+
+from project.checkpoint import clear_model_cache, load_model
+from project.models import model_type_of
+from project.utils import RunningRegressionMetrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Cast:
+    """Array pickled in a narrow dtype and cast back to its own one when unpickled.
+
+    Unpickling calls `numpy.ndarray.astype`, so loading needs nothing but numpy.
+    """
+
+    def __init__(self, array: np.ndarray, dtype: np.dtype):
+        self.array = array
+        self.dtype = dtype
+
+    def __reduce__(self) -> tuple:
+        return np.ndarray.astype, (self.array, self.dtype)
+
+
+class _PackedTree:
+    """Stand-in of a fitted tree that pickles its nodes in the narrowest dtypes.
+
+    Node indices, sample counts and features are stored as the smallest integers
+    holding them, and thresholds, impurities, weights and values as float32. Since
+    trees compare float32 features, thresholds are rounded down to the nearest
+    float32, which splits float32 features exactly as before. Unpickling rebuilds
+    the tree as scikit-learn defines it, so packed trees are only meant for saving.
+    """
+
+    def __init__(self, tree: Tree):
+        self.args = tree.__reduce__()[1]
+        state = tree.__getstate__()
+        nodes, values = state["nodes"], state["values"]
+
+        n_features = self.args[0]
+        index = np.int32 if len(nodes) < 2**31 else np.int64
+        samples = index if nodes["n_node_samples"].max(initial=0) < 2**31 else np.int64
+        feature = np.result_type(
+            np.min_scalar_type(TREE_UNDEFINED), np.min_scalar_type(n_features)
+        )
+        dtype = np.dtype(
+            [
+                ("left_child", index),
+                ("right_child", index),
+                ("feature", feature),
+                ("threshold", np.float32),
+                ("impurity", np.float32),
+                ("n_node_samples", samples),
+                ("weighted_n_node_samples", np.float32),
+                ("missing_go_to_left", np.uint8),
+            ]
+        )
+        packed = np.empty(len(nodes), dtype=dtype)
+        for name in dtype.names:
+            packed[name] = nodes[name]
+
+        threshold = nodes["threshold"].astype(np.float32)
+        rounded_up = threshold > nodes["threshold"]
+        threshold[rounded_up] = np.nextafter(threshold[rounded_up], np.float32(-np.inf))
+        packed["threshold"] = threshold
+
+        self.state = {
+            "max_depth": state["max_depth"],
+            "node_count": state["node_count"],
+            "nodes": _Cast(packed, NODE_DTYPE),
+            "values": _Cast(values.astype(np.float32), values.dtype),
+        }
+
+    def __reduce__(self) -> tuple:
+        return Tree, self.args, self.state
+
+
+def compact_model(model: Any) -> Any:
+    """
+    Prepare a model to be saved as a compact checkpoint.
+
+    The trees of random forests are replaced by stand-ins pickling them in the
+    narrowest dtypes (see `_PackedTree`), roughly halving their size. The checkpoint
+    loads back as a regular model, with the original dtypes, so that loading stays
+    transparent. The model itself is left as is: the returned one shares its other
+    attributes and is only meant to be saved.
+
+    Args:
+        model (Any): The trained model (a pipeline, or an ensemble of pipelines).
+
+    Returns:
+        Any: The model to save, or the model itself if it holds no random forest.
+    """
+    # Ensembles of fold pipelines
+    if hasattr(model, "estimators"):
+        compact = copy.copy(model)
+        compact.estimators = [
+            compact_model(estimator) for estimator in model.estimators
+        ]
+        return compact
+
+    if not isinstance(model, Pipeline) or model_type_of(model) != "random_forest":
+        return model
+
+    forest = copy.copy(model.steps[-1][1])
+    forest.estimators_ = []
+    for estimator in model.steps[-1][1].estimators_:
+        estimator = copy.copy(estimator)
+        estimator.tree_ = _PackedTree(estimator.tree_)
+        forest.estimators_.append(estimator)
+
+    return _replace_estimator(model, forest)
+
+
+def has_out_of_bag_rows(model: Any) -> bool:
+    """
+    Whether a model is a random forest whose trees left out some of its rows.
+
+    Args:
+        model (Any): The trained model.
+
+    Returns:
+        bool: True for a pipeline ending in a random forest fitted with bootstrap.
+    """
+    return (
+        isinstance(model, Pipeline)
+        and model_type_of(model) == "random_forest"
+        and bool(model.steps[-1][1].bootstrap)
+    )
+
+
+def prune_forest(
+    pipeline: Pipeline,
+    X: Any,
+    y: Any,
+    loss_budget: float,
+    cap_depth: bool = True,
+    drop_trees: bool = True,
+    oob: bool = False,
+) -> Pipeline:
+    """
+    Shrink a random forest within a budget of validation loss.
+
+    The loss is the mean squared error on the given rows, which may grow by up to
+    `loss_budget` times that of the whole forest. Half the budget goes to capping the
+    depth of the trees (internal nodes predict the mean target of their samples, so
+    they become leaves in place), as the smallest depth within budget found by
+    bisection, and the rest to dropping trees, the least accurate first.
+
+    With `oob`, the rows are those the forest was fitted on, and each of them is
+    only predicted by the trees that did not sample it (see `has_out_of_bag_rows`),
+    so that no rows need to be held out for pruning.
+
+    Args:
+        pipeline (Pipeline): The fitted pipeline.
+        X (Any): Features of the validation rows.
+        y (Any): Target of the validation rows.
+        loss_budget (float): Relative increase of the validation loss allowed.
+        cap_depth (bool, optional): Whether to cap the depth of the trees.
+            Defaults to True.
+        drop_trees (bool, optional): Whether to drop trees. Defaults to True.
+        oob (bool, optional): Whether to validate on the out-of-bag rows of the
+            training rows. Defaults to False.
+
+    Returns:
+        Pipeline: The pruned pipeline, sharing its preprocessing steps with the
+            original one, which is left as is.
+
+    Raises:
+        ValueError: If the pipeline is not a random forest, or with `oob`, if its
+            trees sampled every row or other rows than those given.
+    """
+    if model_type_of(pipeline) != "random_forest":
+        raise ValueError(f"Model type {model_type_of(pipeline)} cannot be pruned")
+
+    forest = pipeline.steps[-1][1]
+    Xt = pipeline[:-1].transform(X) if len(pipeline.steps) > 1 else X
+    Xt = np.ascontiguousarray(Xt, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float64)
+    weights = (
+        _out_of_bag(forest, len(y))
+        if oob
+        else np.ones((len(forest.estimators_), len(y)), dtype=bool)
+    )
+
+    # Nodes visited by each row, from the root, in every tree
+    paths = []
+    for estimator in forest.estimators_:
+        path = estimator.decision_path(Xt)
+        path.sort_indices()
+        paths.append(path)
+    depth = max(estimator.tree_.max_depth for estimator in forest.estimators_)
+
+    def predict(depth: int) -> np.ndarray:
+        predictions = np.empty((len(paths), len(y)))
+        for i, (estimator, path) in enumerate(zip(forest.estimators_, paths)):
+            lengths = np.diff(path.indptr)
+            nodes = path.indices[path.indptr[:-1] + np.minimum(depth, lengths - 1)]
+            predictions[i] = estimator.tree_.value[nodes, 0, 0]
+        return predictions
+
+    def loss(predictions: np.ndarray, weights: np.ndarray) -> float:
+        # Rows predicted by none of the trees are left out
+        counts = weights.sum(axis=0)
+        covered = counts > 0
+        mean = (predictions * weights).sum(axis=0)[covered] / counts[covered]
+        return float(np.mean((mean - y[covered]) ** 2))
+
+    base_loss = loss(predict(depth), weights)
+    if cap_depth:
+        low, high = 0, depth
+        while low < high:
+            middle = (low + high) // 2
+            if loss(predict(middle), weights) <= base_loss * (1 + loss_budget / 2):
+                high = middle
+            else:
+                low = middle + 1
+        depth = high
+
+    predictions = predict(depth)
+    n_trees = len(predictions)
+    order = np.argsort(
+        [
+            np.average((p - y) ** 2, weights=w) if w.any() else np.inf
+            for p, w in zip(predictions, weights)
+        ],
+        kind="stable",
+    )
+    if drop_trees:
+        total, counts = np.zeros(len(y)), np.zeros(len(y))
+        for n_trees, tree in enumerate(order, start=1):
+            total += predictions[tree] * weights[tree]
+            counts += weights[tree]
+            covered = counts > 0
+            mean = total[covered] / counts[covered]
+            if np.mean((mean - y[covered]) ** 2) <= base_loss * (1 + loss_budget):
+                break
+
+    kept = order[:n_trees]
+    pruned = copy.copy(forest)
+    pruned.estimators_ = [
+        _truncate(forest.estimators_[tree], depth) for tree in np.sort(kept)
+    ]
+    pruned.n_estimators = n_trees
+    logger.info(
+        f"Pruned random forest from {len(forest.estimators_)} to {n_trees} trees "
+        f"of depth at most {depth} ({'out-of-bag' if oob else 'validation'} loss "
+        f"{base_loss:.6g} -> {loss(predictions[kept], weights[kept]):.6g})"
+    )
+
+    return _replace_estimator(pipeline, pruned)
+
+
+def compaction_report(
+    original: Any,
+    compact: Any,
+    path: str | Path,
+    X: Any = None,
+    y: Any = None,
+    oob: bool = False,
+) -> dict[str, dict[str, float]]:
+    """
+    Compare the size, load time and accuracy of a compact checkpoint to the original.
+
+    The original model is saved to a temporary file next to the checkpoint, to be
+    measured the same way, and removed. Both are loaded with `load_model`, as test.py
+    and predict.py load them, and forgotten by its cache afterwards.
+
+    Args:
+        original (Any): The model before compaction.
+        compact (Any): The model saved to the compact checkpoint (before packing).
+        path (str | Path): Path of the compact checkpoint.
+        X (Any, optional): Features of the validation rows. Defaults to None (no
+            accuracy is reported).
+        y (Any, optional): Target of the validation rows. Defaults to None.
+        oob (bool, optional): Whether the rows are those the random forests were
+            fitted on, each predicted by the trees that did not sample it (see
+            `prune_forest`). Defaults to False.
+
+    Returns:
+        dict[str, dict[str, float]]: The size (MB), load time (s) and validation
+            metrics of the "original" and "compact" models.
+    """
+    path = Path(path)
+    original_path = path.with_name(f"{path.stem}.original.tmp")
+    joblib.dump(original, original_path, compress=0)
+
+    report = {}
+    try:
+        for name, file in (("original", original_path), ("compact", path)):
+            start = time.perf_counter()
+            model = load_model(file)
+            load_time = time.perf_counter() - start
+            report[name] = {
+                "size_mb": file.stat().st_size / 1024**2,
+                "load_s": load_time,
+            }
+
+            if X is not None:
+                metrics = RunningRegressionMetrics()
+                if oob:
+                    metrics.update(*_out_of_bag_predict(model, X, y))
+                else:
+                    metrics.update(y, model.predict(X))
+                report[name].update(
+                    {
+                        metric: float(value)
+                        for metric, value in metrics.compute().items()
+                    }
+                )
+    finally:
+        original_path.unlink(missing_ok=True)
+        clear_model_cache()
+
+    return report
+
+
+def _out_of_bag(forest: Any, n_rows: int) -> np.ndarray:
+    """Mask of the rows each tree of a forest did not sample, by tree."""
+    if not forest.bootstrap:
+        raise ValueError("Out-of-bag rows require a forest fitted with bootstrap")
+
+    weights = np.ones((len(forest.estimators_), n_rows), dtype=bool)
+    for tree, samples in enumerate(forest.estimators_samples_):
+        if samples.max(initial=-1) >= n_rows:
+            raise ValueError("The forest was fitted on other rows than those given")
+        weights[tree, samples] = False
+
+    return weights
+
+
+def _out_of_bag_predict(pipeline: Pipeline, X: Any, y: Any) -> tuple[Any, np.ndarray]:
+    """Target and out-of-bag predictions of the rows predicted by some tree."""
+    forest = pipeline.steps[-1][1]
+    Xt = pipeline[:-1].transform(X) if len(pipeline.steps) > 1 else X
+    Xt = np.ascontiguousarray(Xt, dtype=np.float32)
+    weights = _out_of_bag(forest, len(Xt))
+
+    predictions = np.array([estimator.predict(Xt) for estimator in forest.estimators_])
+    counts = weights.sum(axis=0)
+    covered = counts > 0
+
+    return (
+        np.asarray(y)[covered],
+        (predictions * weights).sum(axis=0)[covered] / counts[covered],
+    )
+
+
+def _replace_estimator(pipeline: Pipeline, estimator: Any) -> Pipeline:
+    replaced = copy.copy(pipeline)
+    replaced.steps = [*pipeline.steps[:-1], (pipeline.steps[-1][0], estimator)]
+    return replaced
+
+
+def _truncate(estimator: Any, depth: int) -> Any:
+    """Copy of a fitted tree whose nodes deeper than `depth` are cut off."""
+    tree = estimator.tree_
+    if tree.max_depth <= depth:
+        return estimator
+
+    state = tree.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+
+    # Depth of every node, one level at a time
+    node_depth = np.zeros(len(nodes), dtype=np.intp)
+    level, frontier = 0, np.array([0])
+    while len(frontier):
+        node_depth[frontier] = level
+        frontier = frontier[nodes["left_child"][frontier] != TREE_LEAF]
+        frontier = np.concatenate(
+            [nodes["left_child"][frontier], nodes["right_child"][frontier]]
+        )
+        level += 1
+
+    # Nodes keep their order, so children are renumbered by counting the kept ones
+    kept = node_depth <= depth
+    index = np.cumsum(kept) - 1
+    nodes = nodes[kept]
+    leaf = (nodes["left_child"] == TREE_LEAF) | (node_depth[kept] == depth)
+    nodes["left_child"] = np.where(leaf, TREE_LEAF, index[nodes["left_child"]])
+    nodes["right_child"] = np.where(leaf, TREE_LEAF, index[nodes["right_child"]])
+    nodes["feature"][leaf] = TREE_UNDEFINED
+    nodes["threshold"][leaf] = TREE_UNDEFINED
+
+    truncated = Tree(*tree.__reduce__()[1])
+    truncated.__setstate__(
+        {
+            "max_depth": depth,
+            "node_count": len(nodes),
+            "nodes": nodes,
+            "values": np.ascontiguousarray(values[kept]),
+        }
+    )
+    estimator = copy.copy(estimator)
+    estimator.tree_ = truncated
+
+    return estimator
@@ -0,0 +1,453 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Callable, Iterator
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class DatasetCache:
+    """Content-addressed on-disk cache of parsed datasets.
+
+    Every entry lives in its own directory named after a hash of the source URL, a
+    fingerprint of its content (the HTTP ``ETag``/``Last-Modified`` header, the file's
+    mtime and size, or a SHA-256 of the downloaded bytes) and the options it was
+    parsed with (e.g. dtypes). Frames are stored column by column as typed ``.npy``
+    arrays next to a ``meta.json`` describing them, so warm starts skip both the
+    download and the CSV parsing.
+    """
+
+    META_FILE = "meta.json"
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        max_size_mb: float | None = None,
+        invalidate: bool = False,
+        timeout: float = 10.0,
+    ):
+        """
+        Initialize the dataset cache.
+
+        Args:
+            cache_dir (str | Path): Directory where cache entries are stored.
+            max_size_mb (float | None, optional): Maximum total size of the cache in
+                megabytes. Least recently used entries are evicted once it is exceeded.
+                Defaults to None (unbounded).
+            invalidate (bool, optional): Whether to discard existing entries of a URL
+                before loading it. Defaults to False.
+            timeout (float, optional): Timeout in seconds for fingerprinting remote
+                datasets. Defaults to 10.0.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_size_mb = max_size_mb
+        self.invalidate = invalidate
+        self.timeout = timeout
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def load(
+        self,
+        url: str,
+        usecols: Callable[[str], bool] | None = None,
+        reader: Callable[[Any, Callable[[str], bool]], pd.DataFrame] | None = None,
+        options: dict[str, Any] | None = None,
+    ) -> pd.DataFrame:
+        """
+        Load a dataset, going through the cache.
+
+        Only the columns accepted by ``usecols`` are read back from a cache entry. An
+        entry that lacks some of them is treated as a miss and rebuilt with both its
+        columns and the missing ones, so that alternating column selections end up
+        sharing a single entry.
+
+        Args:
+            url (str): URL or path of the dataset.
+            usecols (Callable[[str], bool] | None, optional): Predicate selecting the
+                columns to load. Defaults to None (all columns).
+            reader (Callable[[Any, Callable[[str], bool]], pd.DataFrame] | None,
+                optional): Function parsing the selected columns of the dataset from a
+                path or buffer on a cache miss. Defaults to None (pd.read_csv).
+            options (dict[str, Any] | None, optional): JSON-serializable options the
+                reader parses with (e.g. dtypes), keeping an entry per value.
+                Defaults to None.
+
+        Returns:
+            pd.DataFrame: The parsed dataset.
+        """
+        if usecols is None:
+            usecols = _all_columns
+        if reader is None:
+            reader = _read_csv
+
+        if self.invalidate:
+            self.remove(url)
+
+        source: Any = url
+        try:
+            fingerprint = self.fingerprint(url)
+        except OSError as e:
+            logger.warning("Could not fingerprint %s: %s", url, e)
+            entry = self._latest_entry(url, options)
+            if entry is not None:
+                columns = self._covered(entry, usecols)
+                if columns is not None:
+                    logger.info("Dataset cache hit for %s (stale, %s)", url, entry.name)
+                    return self._read(entry, columns)
+            raise
+
+        if fingerprint is None:
+            # No validator is available, so the content itself has to be hashed
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                content = response.read()
+            fingerprint = f"sha256:{hashlib.sha256(content).hexdigest()}"
+            source = io.BytesIO(content)
+
+        entry = self.cache_dir / self.key(url, fingerprint, options)
+        stored: set[str] = set()
+        if (entry / self.META_FILE).is_file():
+            columns = self._covered(entry, usecols)
+            if columns is not None:
+                logger.info("Dataset cache hit for %s (%s)", url, entry.name)
+                os.utime(entry)
+                return self._read(entry, columns)
+            stored = {c["name"] for c in self._meta(entry)["columns"]}
+
+        logger.info("Dataset cache miss for %s", url)
+        source_columns: list[str] = []
+
+        def record(column: str) -> bool:
+            source_columns.append(column)
+            return usecols(column) or column in stored
+
+        df = reader(source, record)
+        self._write(entry, url, fingerprint, df, source_columns, options)
+        self._evict(keep=entry)
+
+        return df[[c for c in df.columns if usecols(c)]] if stored else df
+
+    def iter_chunks(
+        self,
+        url: str,
+        chunk_size: int,
+        usecols: Callable[[str], bool] | None = None,
+        options: dict[str, Any] | None = None,
+    ) -> Iterator[pd.DataFrame] | None:
+        """
+        Iterate over a cached dataset in chunks, memory-mapping its columns.
+
+        Unlike `load`, this never populates the cache, as that would require the whole
+        dataset to fit in memory.
+
+        Args:
+            url (str): URL or path of the dataset.
+            chunk_size (int): Number of rows per chunk.
+            usecols (Callable[[str], bool] | None, optional): Predicate selecting the
+                columns to load. Defaults to None (all columns).
+            options (dict[str, Any] | None, optional): Options the dataset was parsed
+                with (see `load`). Defaults to None.
+
+        Returns:
+            Iterator[pd.DataFrame] | None: The chunks, or None if no cache entry
+                holds the selected columns of the dataset.
+        """
+        if usecols is None:
+            usecols = _all_columns
+
+        try:
+            fingerprint = self.fingerprint(url)
+        except OSError as e:
+            logger.warning("Could not fingerprint %s: %s", url, e)
+            entry = self._latest_entry(url, options)
+        else:
+            entry = (
+                self.cache_dir / self.key(url, fingerprint, options)
+                if fingerprint is not None
+                else None
+            )
+
+        if entry is None or not (entry / self.META_FILE).is_file():
+            return None
+
+        columns = self._covered(entry, usecols)
+        if columns is None:
+            return None
+
+        logger.info("Dataset cache hit for %s (%s)", url, entry.name)
+        os.utime(entry)
+        return self._iter_entry(entry, columns, chunk_size)
+
+    def fingerprint(self, url: str) -> str | None:
+        """
+        Compute a cheap fingerprint of the dataset behind a URL.
+
+        Args:
+            url (str): URL or path of the dataset.
+
+        Returns:
+            str | None: The fingerprint, or None if the source does not expose one
+                (no validator, or a server rejecting HEAD requests).
+
+        Raises:
+            OSError: If the source cannot be reached.
+        """
+        parsed = urlparse(url)
+        if parsed.scheme in ("http", "https"):
+            request = urllib.request.Request(url, method="HEAD")
+            try:
+                response = urllib.request.urlopen(request, timeout=self.timeout)
+            except urllib.error.HTTPError as e:
+                # Servers rejecting HEAD (e.g. 405) are fingerprinted by content
+                logger.info("HEAD %s failed (%s), hashing its content", url, e)
+                return None
+            with response:
+                etag = response.headers.get("ETag")
+                if etag:
+                    return f"etag:{etag}"
+                last_modified = response.headers.get("Last-Modified")
+                if last_modified:
+                    return f"last-modified:{last_modified}"
+            return None
+
+        path = Path(parsed.path if parsed.scheme == "file" else url)
+        stat = path.stat()
+        return f"mtime:{stat.st_mtime_ns}-{stat.st_size}"
+
+    @staticmethod
+    def key(url: str, fingerprint: str, options: dict[str, Any] | None = None) -> str:
+        """
+        Compute the cache key of a dataset.
+
+        Args:
+            url (str): URL or path of the dataset.
+            fingerprint (str): Fingerprint of the dataset content.
+            options (dict[str, Any] | None, optional): Options the dataset is parsed
+                with. Defaults to None.
+
+        Returns:
+            str: The cache key.
+        """
+        key = f"{url}\0{fingerprint}"
+        if options:
+            key += f"\0{json.dumps(options, sort_keys=True)}"
+
+        return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+    def entries(self) -> list[Path]:
+        """
+        List the complete cache entries, least recently used first.
+
+        Returns:
+            list[Path]: Directories of the cache entries.
+        """
+        entries = [
+            p for p in self.cache_dir.iterdir() if (p / self.META_FILE).is_file()
+        ]
+        return sorted(entries, key=lambda p: p.stat().st_mtime)
+
+    def size(self) -> int:
+        """
+        Compute the total size of the cache.
+
+        Returns:
+            int: Size of the cache in bytes.
+        """
+        return sum(self._entry_size(entry) for entry in self.entries())
+
+    def remove(self, url: str) -> None:
+        """
+        Remove every cache entry of a URL.
+
+        Args:
+            url (str): URL or path of the dataset.
+        """
+        for entry in self.entries():
+            if self._meta(entry)["url"] == url:
+                logger.info("Invalidating dataset cache entry %s", entry.name)
+                shutil.rmtree(entry, ignore_errors=True)
+
+    def clear(self) -> None:
+        """Remove every cache entry."""
+        for entry in self.entries():
+            shutil.rmtree(entry, ignore_errors=True)
+
+    def load_split(self, key: str) -> tuple[np.ndarray, np.ndarray] | None:
+        """
+        Load a persisted train/test split.
+
+        Args:
+            key (str): Key of the split.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray] | None: Positions of the training and test
+                rows, or None if the split was never persisted.
+        """
+        path = self.cache_dir / "splits" / f"{key}.npz"
+        if not path.is_file():
+            return None
+
+        with np.load(path) as split:
+            return split["train"], split["test"]
+
+    def save_split(self, key: str, train: np.ndarray, test: np.ndarray) -> None:
+        """
+        Persist a train/test split.
+
+        Args:
+            key (str): Key of the split.
+            train (np.ndarray): Positions of the training rows.
+            test (np.ndarray): Positions of the test rows.
+        """
+        path = self.cache_dir / "splits" / f"{key}.npz"
+        path.parent.mkdir(exist_ok=True)
+
+        # Write next to the destination first so that readers never see partial files
+        scratch = path.with_suffix(".tmp.npz")
+        np.savez(scratch, train=train, test=test)
+        scratch.rename(path)
+
+    def _latest_entry(
+        self, url: str, options: dict[str, Any] | None = None
+    ) -> Path | None:
+        matches = [
+            e
+            for e in self.entries()
+            if self._meta(e)["url"] == url
+            and self._meta(e).get("options") == (options or None)
+        ]
+        return matches[-1] if matches else None
+
+    def _meta(self, entry: Path) -> dict[str, Any]:
+        with open(entry / self.META_FILE) as f:
+            return json.load(f)
+
+    def _covered(self, entry: Path, usecols: Callable[[str], bool]) -> list[str] | None:
+        meta = self._meta(entry)
+        wanted = [c for c in meta["source_columns"] if usecols(c)]
+        stored = {c["name"] for c in meta["columns"]}
+
+        return wanted if stored.issuperset(wanted) else None
+
+    def _read(self, entry: Path, columns: list[str]) -> pd.DataFrame:
+        meta = self._meta(entry)
+        stored = {c["name"]: c for c in meta["columns"]}
+
+        data = {}
+        for column in (stored[name] for name in columns):
+            values = np.load(entry / column["file"], allow_pickle=column["pickled"])
+            data[column["name"]] = pd.Series(values, copy=False)
+            if column["pickled"]:
+                data[column["name"]] = data[column["name"]].astype(column["dtype"])
+
+        return pd.DataFrame(data, columns=columns)
+
+    def _iter_entry(
+        self, entry: Path, columns: list[str], chunk_size: int
+    ) -> Iterator[pd.DataFrame]:
+        meta = self._meta(entry)
+        stored = {c["name"]: c for c in meta["columns"]}
+
+        arrays = {}
+        for column in (stored[name] for name in columns):
+            arrays[column["name"]] = np.load(
+                entry / column["file"],
+                mmap_mode=None if column["pickled"] else "r",
+                allow_pickle=column["pickled"],
+            )
+
+        n_rows = len(next(iter(arrays.values()))) if arrays else 0
+        for start in range(0, n_rows, chunk_size):
+            data = {}
+            for column in (stored[name] for name in columns):
+                values = np.array(arrays[column["name"]][start : start + chunk_size])
+                data[column["name"]] = pd.Series(values, copy=False)
+                if column["pickled"]:
+                    data[column["name"]] = data[column["name"]].astype(column["dtype"])
+
+            yield pd.DataFrame(data, columns=columns)
+
+    def _write(
+        self,
+        entry: Path,
+        url: str,
+        fingerprint: str,
+        df: pd.DataFrame,
+        source_columns: list[str],
+        options: dict[str, Any] | None = None,
+    ) -> None:
+        # Write into a scratch directory first so that readers never see partial entries
+        scratch = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-"))
+        try:
+            columns = []
+            for i, name in enumerate(df.columns):
+                series = df[name]
+                pickled = (
+                    not isinstance(series.dtype, np.dtype) or series.dtype.hasobject
+                )
+                values = series.to_numpy(dtype=object) if pickled else series.to_numpy()
+                filename = f"{i}.npy"
+                np.save(scratch / filename, values, allow_pickle=pickled)
+                columns.append(
+                    {
+                        "name": name,
+                        "dtype": str(series.dtype),
+                        "file": filename,
+                        "pickled": pickled,
+                    }
+                )
+
+            with open(scratch / self.META_FILE, "w") as f:
+                json.dump(
+                    {
+                        "url": url,
+                        "fingerprint": fingerprint,
+                        "source_columns": list(dict.fromkeys(source_columns)),
+                        "columns": columns,
+                        "options": options or None,
+                    },
+                    f,
+                )
+
+            shutil.rmtree(entry, ignore_errors=True)
+            scratch.rename(entry)
+        except BaseException:
+            shutil.rmtree(scratch, ignore_errors=True)
+            raise
+
+    def _entry_size(self, entry: Path) -> int:
+        return sum(f.stat().st_size for f in entry.iterdir())
+
+    def _evict(self, keep: Path) -> None:
+        if self.max_size_mb is None:
+            return
+
+        budget = int(self.max_size_mb * 1024 * 1024)
+        entries = self.entries()
+        total = sum(self._entry_size(entry) for entry in entries)
+        for entry in entries:
+            if total <= budget:
+                break
+            if entry == keep:
+                continue
+            logger.info("Evicting dataset cache entry %s", entry.name)
+            total -= self._entry_size(entry)
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+def _all_columns(column: str) -> bool:
+    return True
+
+
+def _read_csv(source: Any, usecols: Callable[[str], bool]) -> pd.DataFrame:
+    return pd.read_csv(source, usecols=usecols)
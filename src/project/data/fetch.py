@@ -0,0 +1,436 @@
+import abc
+import hashlib
+import json
+import logging
+import os
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Any
+from urllib.parse import unquote, urlparse
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes of the compressed formats pandas reads transparently
+MAGIC_NUMBERS = {
+    b"\x1f\x8b": "gzip",
+    b"\x28\xb5\x2f\xfd": "zstd",
+    b"BZh": "bz2",
+    b"\xfd7zXZ\x00": "xz",
+}
+
+
+class Transport(abc.ABC):
+    """Way of reading the bytes behind URLs of some schemes."""
+
+    @abc.abstractmethod
+    def stat(self, url: str) -> dict[str, Any]:
+        """
+        Describe the resource behind a URL without reading it.
+
+        Args:
+            url (str): URL of the resource.
+
+        Returns:
+            dict[str, Any]: Its "size" in bytes and a "validator" changing with its
+                content (e.g. an ETag), either of which may be None if unknown.
+
+        Raises:
+            OSError: If the resource cannot be reached.
+        """
+
+    @abc.abstractmethod
+    def open(self, url: str, offset: int = 0) -> tuple[IO[bytes], int]:
+        """
+        Open the resource behind a URL for reading, from an offset if supported.
+
+        Args:
+            url (str): URL of the resource.
+            offset (int, optional): Offset to start reading from. Defaults to 0.
+
+        Returns:
+            tuple[IO[bytes], int]: The stream and the offset it actually starts
+                from, which is 0 if the transport cannot resume.
+
+        Raises:
+            OSError: If the resource cannot be reached.
+        """
+
+
+class HTTPTransport(Transport):
+    """HTTP(S) transport resuming downloads with range requests."""
+
+    def __init__(self, timeout: float = 10.0):
+        """
+        Initialize the transport.
+
+        Args:
+            timeout (float, optional): Timeout in seconds of every request.
+                Defaults to 10.0.
+        """
+        self.timeout = timeout
+
+    def stat(self, url: str) -> dict[str, Any]:
+        """
+        Describe the resource behind a URL with a HEAD request.
+
+        Args:
+            url (str): URL of the resource.
+
+        Returns:
+            dict[str, Any]: Its "size" and "validator" (ETag or Last-Modified),
+                both None if the server rejects HEAD requests.
+        """
+        request = urllib.request.Request(url, method="HEAD")
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            # Servers rejecting HEAD (e.g. 405) are downloaded without a validator
+            logger.info("HEAD %s failed (%s), downloading it", url, e)
+            return {"size": None, "validator": None}
+        with response:
+            headers = response.headers
+            length = headers.get("Content-Length")
+            etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+
+        validator = None
+        if etag:
+            validator = f"etag:{etag}"
+        elif last_modified:
+            validator = f"last-modified:{last_modified}"
+
+        return {
+            "size": int(length) if length is not None else None,
+            "validator": validator,
+        }
+
+    def open(self, url: str, offset: int = 0) -> tuple[IO[bytes], int]:
+        """
+        Open the resource behind a URL, requesting the range from the offset.
+
+        Args:
+            url (str): URL of the resource.
+            offset (int, optional): Offset to start reading from. Defaults to 0.
+
+        Returns:
+            tuple[IO[bytes], int]: The response and the offset it starts from, 0 if
+                the server ignored the range.
+        """
+        request = urllib.request.Request(url)
+        if offset:
+            request.add_header("Range", f"bytes={offset}-")
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            # The partial download is not shorter than the resource
+            if e.code != 416:
+                raise
+            return self.open(url)
+
+        return response, offset if response.status == 206 else 0
+
+
+class FileTransport(Transport):
+    """Transport of local files, named by paths or `file://` URLs."""
+
+    def stat(self, url: str) -> dict[str, Any]:
+        """
+        Describe a local file.
+
+        Args:
+            url (str): Path or `file://` URL of the file.
+
+        Returns:
+            dict[str, Any]: Its "size" and "validator" (modification time and size).
+        """
+        stat = self._path(url).stat()
+        return {
+            "size": stat.st_size,
+            "validator": f"mtime:{stat.st_mtime_ns}-{stat.st_size}",
+        }
+
+    def open(self, url: str, offset: int = 0) -> tuple[IO[bytes], int]:
+        """
+        Open a local file from an offset.
+
+        Args:
+            url (str): Path or `file://` URL of the file.
+            offset (int, optional): Offset to start reading from. Defaults to 0.
+
+        Returns:
+            tuple[IO[bytes], int]: The file and the offset.
+        """
+        f = open(self._path(url), "rb")
+        f.seek(offset)
+        return f, offset
+
+    @staticmethod
+    def _path(url: str) -> Path:
+        parsed = urlparse(url)
+        return Path(unquote(parsed.path) if parsed.scheme == "file" else url)
+
+
+# Transport of each URL scheme
+TRANSPORTS: dict[str, Transport] = {
+    "http": HTTPTransport(),
+    "https": HTTPTransport(),
+    "file": FileTransport(),
+}
+
+
+class DatasetFetcher:
+    """Download datasets to a local directory, concurrently and resumably.
+
+    Every URL is downloaded to its own directory, named after a hash of the URL,
+    under the basename of the URL, so that compressed sources keep the suffix pandas
+    infers their compression from. Bytes are streamed in chunks to a `.part` file;
+    a failed download is retried with exponential backoff, resuming from the bytes
+    already received where the transport supports it. Completed downloads are
+    verified against their expected checksum, if any, and described in a
+    `<name>.json` file next to them, so that an unchanged resource (by its
+    validator, e.g. an ETag) is not downloaded again.
+    """
+
+    def __init__(
+        self,
+        download_dir: str | Path,
+        transports: dict[str, Transport] | None = None,
+        max_workers: int = 2,
+        retries: int = 3,
+        backoff: float = 0.5,
+        chunk_size: int = 2**20,
+        checksums: dict[str, str] | None = None,
+    ):
+        """
+        Initialize the fetcher.
+
+        Args:
+            download_dir (str | Path): Directory to download the datasets to.
+            transports (dict[str, Transport] | None, optional): Transport of each URL
+                scheme, overriding those of `TRANSPORTS`. Defaults to None.
+            max_workers (int, optional): Number of datasets downloaded at once.
+                Defaults to 2.
+            retries (int, optional): Number of retries of a failed download.
+                Defaults to 3.
+            backoff (float, optional): Delay in seconds before the first retry,
+                doubled for every following one. Defaults to 0.5.
+            chunk_size (int, optional): Number of bytes read and written at once.
+                Defaults to 2**20.
+            checksums (dict[str, str] | None, optional): Expected SHA-256 hex digest
+                of some URLs. Defaults to None.
+        """
+        self.download_dir = Path(download_dir)
+        self.transports = {**TRANSPORTS, **(transports or {})}
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.chunk_size = chunk_size
+        self.checksums = {
+            url: checksum.removeprefix("sha256:")
+            for url, checksum in (checksums or {}).items()
+        }
+
+        self.download_dir.mkdir(parents=True, exist_ok=True)
+
+    def handles(self, url: str) -> bool:
+        """
+        Check whether a URL is downloaded rather than read in place.
+
+        Plain paths are read in place, as they are local already.
+
+        Args:
+            url (str): URL or path of the dataset.
+
+        Returns:
+            bool: True if the scheme of the URL has a transport.
+        """
+        return urlparse(url).scheme in self.transports
+
+    def fetch_all(self, urls: list[str]) -> list[Path]:
+        """
+        Download several datasets at once.
+
+        Args:
+            urls (list[str]): URLs of the datasets.
+
+        Returns:
+            list[Path]: Local paths of the datasets, in order.
+        """
+        unique = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            paths = dict(zip(unique, executor.map(self.fetch, unique)))
+
+        return [paths[url] for url in urls]
+
+    def fetch(self, url: str) -> Path:
+        """
+        Download a dataset, unless its local copy is up to date.
+
+        Args:
+            url (str): URL of the dataset.
+
+        Returns:
+            Path: Local path of the dataset.
+
+        Raises:
+            OSError: If the download keeps failing and no local copy exists.
+            ValueError: If the downloaded bytes do not match the expected checksum.
+        """
+        transport = self.transports[urlparse(url).scheme]
+        path = self.local_path(url)
+        meta_file = path.with_name(f"{path.name}.json")
+        meta = json.loads(meta_file.read_text()) if meta_file.is_file() else None
+
+        try:
+            remote = self._retry(url, lambda: transport.stat(url))
+        except OSError as e:
+            if meta is not None and path.is_file():
+                logger.warning("Could not reach %s, using stale copy: %s", url, e)
+                return path
+            raise
+
+        if (
+            meta is not None
+            and meta["sha256"] is not None
+            and path.is_file()
+            and remote["validator"] is not None
+            and meta["validator"] == remote["validator"]
+            and meta["sha256"] == self.checksums.get(url, meta["sha256"])
+        ):
+            logger.info("Dataset %s is up to date in %s", url, path)
+            return path
+
+        part = path.with_name(f"{path.name}.part")
+        if (
+            meta is None
+            or remote["validator"] is None
+            or meta["validator"] != remote["validator"]
+        ):
+            # A partial download of another, or unknown, version cannot be resumed
+            part.unlink(missing_ok=True)
+        meta_file.write_text(json.dumps({"url": url, **remote, "sha256": None}))
+
+        start = time.perf_counter()
+        digest = self._retry(
+            url, lambda: self._download(transport, url, part, remote["size"])
+        )
+        elapsed = time.perf_counter() - start
+
+        expected = self.checksums.get(url)
+        if expected is not None and digest != expected:
+            part.unlink(missing_ok=True)
+            raise ValueError(
+                f"Checksum mismatch for {url}: expected {expected}, got {digest}"
+            )
+
+        os.replace(part, path)
+        meta_file.write_text(json.dumps({"url": url, **remote, "sha256": digest}))
+        size = path.stat().st_size
+        logger.info(
+            "Downloaded %s (%.2f MB in %.2fs) to %s",
+            url,
+            size / 1024**2,
+            elapsed,
+            path,
+        )
+
+        return path
+
+    def local_path(self, url: str) -> Path:
+        """
+        Local path a URL is downloaded to.
+
+        Args:
+            url (str): URL of the dataset.
+
+        Returns:
+            Path: The local path.
+        """
+        key = hashlib.sha256(url.encode()).hexdigest()[:32]
+        name = Path(unquote(urlparse(url).path)).name or "dataset"
+        directory = self.download_dir / key
+        directory.mkdir(parents=True, exist_ok=True)
+
+        return directory / name
+
+    def _download(
+        self, transport: Transport, url: str, part: Path, size: int | None = None
+    ) -> str:
+        """
+        Download a URL to a partial file, resuming from its current size.
+
+        Args:
+            transport (Transport): Transport of the URL.
+            url (str): URL of the dataset.
+            part (Path): The partial file.
+            size (int | None, optional): Expected size of the whole file, if known.
+                Defaults to None.
+
+        Returns:
+            str: SHA-256 hex digest of the whole file.
+
+        Raises:
+            OSError: If the stream ends before the expected size, as connections
+                dropping early end it without an error.
+        """
+        offset = part.stat().st_size if part.is_file() else 0
+        stream, offset = transport.open(url, offset)
+
+        digest = hashlib.sha256()
+        with stream, open(part, "r+b" if offset else "wb") as f:
+            if offset:
+                logger.info("Resuming download of %s at byte %d", url, offset)
+                # Hash the bytes already received before appending the rest
+                while chunk := f.read(min(self.chunk_size, offset - f.tell())):
+                    digest.update(chunk)
+                f.truncate(offset)
+            while chunk := stream.read(self.chunk_size):
+                f.write(chunk)
+                digest.update(chunk)
+            received = f.tell()
+
+        if size is not None and received != size:
+            raise OSError(f"Download of {url} ended at byte {received} of {size}")
+
+        return digest.hexdigest()
+
+    def _retry(self, url: str, call: Any) -> Any:
+        for attempt in range(self.retries + 1):
+            try:
+                return call()
+            except urllib.error.HTTPError as e:
+                # Client errors do not go away by retrying
+                if e.code < 500 or attempt == self.retries:
+                    raise
+                error: OSError = e
+            except OSError as e:
+                if attempt == self.retries:
+                    raise
+                error = e
+            delay = self.backoff * 2**attempt
+            logger.warning(
+                "Fetching %s failed (%s), retrying in %.1fs", url, error, delay
+            )
+            time.sleep(delay)
+
+
+def detect_compression(path: str | Path) -> str | None:
+    """
+    Detect the compression of a file from its leading bytes.
+
+    Args:
+        path (str | Path): Path of the file.
+
+    Returns:
+        str | None: The compression, as pandas names it, or None if uncompressed.
+    """
+    with open(path, "rb") as f:
+        head = f.read(8)
+
+    for magic, compression in MAGIC_NUMBERS.items():
+        if head.startswith(magic):
+            return compression
+
+    return None
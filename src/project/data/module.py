@@ -1,8 +1,24 @@
+import hashlib
+import json
 import logging
+import math
+import os
+import shutil
+import tempfile
+import weakref
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
 
+import numpy as np
 import pandas as pd
+from pandas.api.types import is_numeric_dtype
 from sklearn.model_selection import train_test_split
 
+from project.data.cache import DatasetCache
+from project.data.fetch import DatasetFetcher, Transport, detect_compression
+from project.data.validation import DataValidator
+from project.profiling import stage
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,6 +34,25 @@ class DataModule:
         exclude_features: list[str] | None = None,
         drop_na: bool = True,
         test_size: float = 0.2,
+        cache_dir: str | None = None,
+        cache_max_size_mb: float | None = None,
+        invalidate_cache: bool = False,
+        dtypes: dict[str, str] | None = None,
+        downcast: bool = True,
+        seed: int | None = None,
+        split: str = "random",
+        group_column: str | None = None,
+        time_column: str | None = None,
+        shared_dir: str | None = None,
+        download_dir: str | None = None,
+        download_workers: int = 2,
+        download_retries: int = 3,
+        checksums: dict[str, str] | None = None,
+        transports: dict[str, Transport] | None = None,
+        drop_infinite: bool = True,
+        drop_duplicate_ids: bool = True,
+        schema: dict[str, dict[str, float]] | None = None,
+        quarantine_dir: str | None = None,
     ):
         """
         Initialize the data module.
@@ -30,9 +65,65 @@ class DataModule:
                 (if specified, overrides exclude_features). Defaults to None.
             exclude_features (list[str] | None, optional): List of features to exclude
                 (if specified, will be removed from the dataset). Defaults to None.
-            drop_na (bool, optional): Whether to drop NA values. Defaults to True.
+            drop_na (bool, optional): Whether to drop the rows with missing values.
+                Defaults to True.
             test_size (float, optional): Size of the test set. Defaults to 0.2.
+            cache_dir (str | None, optional): Directory of the on-disk dataset cache
+                (if None, the datasets are parsed on every run). Defaults to None.
+            cache_max_size_mb (float | None, optional): Maximum size of the dataset
+                cache in megabytes. Defaults to None (unbounded).
+            invalidate_cache (bool, optional): Whether to discard the cached copies of
+                the datasets before loading them. Defaults to False.
+            dtypes (dict[str, str] | None, optional): Explicit dtype of some columns,
+                used while parsing. Defaults to None.
+            downcast (bool, optional): Whether to downcast the remaining numeric columns
+                to the narrowest dtype (float64 to float32, integers to the smallest
+                width). The target variable keeps its parsed precision. Defaults to
+                True.
+            seed (int | None, optional): Random seed of the train/test split.
+                Defaults to None.
+            split (str, optional): Strategy of the train/test split: "random"
+                (holding out rows by the hash of their id, so that they keep their
+                split as the dataset grows), "stratified" (on quantile bins of the
+                target), "group" (holding out the rows of each `group_column` value
+                together, by its hash) or "time_series" (holding out the latest rows
+                by `time_column`, or by file order). Defaults to "random".
+            group_column (str | None, optional): Column grouping the rows of the
+                "group" split. Defaults to None.
+            time_column (str | None, optional): Column ordering the rows of the
+                "time_series" split. Defaults to None.
+            shared_dir (str | None, optional): Directory of the memory-mapped
+                matrices of `get_shared_split`. Defaults to None (/dev/shm where
+                available, i.e. shared memory, otherwise the temporary directory).
+            download_dir (str | None, optional): Directory remote datasets (http,
+                https and file:// URLs) are downloaded to before being parsed, both at
+                once, with retries and resumption (if None, they are read directly).
+                Defaults to None.
+            download_workers (int, optional): Number of datasets downloaded at once.
+                Defaults to 2.
+            download_retries (int, optional): Number of retries of a failed download.
+                Defaults to 3.
+            checksums (dict[str, str] | None, optional): Expected SHA-256 hex digest
+                of some dataset URLs, verified after downloading them.
+                Defaults to None.
+            transports (dict[str, Transport] | None, optional): Transport of some URL
+                schemes, overriding the default ones. Defaults to None.
+            drop_infinite (bool, optional): Whether to drop the rows with infinite
+                values. Defaults to True.
+            drop_duplicate_ids (bool, optional): Whether to drop the rows whose id
+                appeared earlier in the dataset. Defaults to True.
+            schema (dict[str, dict[str, float]] | None, optional): Valid range of
+                some columns, as a "min" and/or a "max" by column; rows out of range
+                are dropped. Defaults to None.
+            quarantine_dir (str | None, optional): Directory to write the dropped rows
+                of each dataset to (`train-rejected.csv` and `test-rejected.csv`).
+                Defaults to None (they are discarded).
         """
+        if split not in ("random", "stratified", "group", "time_series"):
+            raise ValueError(f"Invalid split strategy: {split}")
+        if split == "group" and group_column is None:
+            raise ValueError("The group split requires a group_column")
+
         self.train_dataset_url = train_dataset_url
         self.test_dataset_url = test_dataset_url
         self.target_variable = target_variable
@@ -40,50 +131,375 @@ class DataModule:
         self.test_size = test_size
         self.include_features = include_features
         self.exclude_features = exclude_features
+        self.dtypes = dict(dtypes) if dtypes is not None else {}
+        self.downcast = downcast
+        self.seed = seed
+        self.split = split
+        self.group_column = group_column
+        self.time_column = time_column
+        self.shared_dir = shared_dir
+        self.cache = (
+            DatasetCache(
+                cache_dir,
+                max_size_mb=cache_max_size_mb,
+                invalidate=invalidate_cache,
+            )
+            if cache_dir is not None
+            else None
+        )
+        self.fetcher = (
+            DatasetFetcher(
+                download_dir,
+                transports=transports,
+                max_workers=download_workers,
+                retries=download_retries,
+                checksums=checksums,
+            )
+            if download_dir is not None
+            else None
+        )
+        self._local_paths: dict[str, str] = {}
+        self.validator = DataValidator(
+            schema=schema,
+            drop_missing=drop_na,
+            drop_infinite=drop_infinite,
+            drop_duplicate_ids=drop_duplicate_ids,
+            quarantine_dir=quarantine_dir,
+        )
+
+        self._df_train: pd.DataFrame | None = None
+        self._df_test: pd.DataFrame | None = None
+        self._features_selected: list[str] | None = None
+        self._n_train: int | None = None
+        self._shared_dir: Path | None = None
+
+    @property
+    def df_train(self) -> pd.DataFrame:
+        """Training dataset, loaded on first access.
 
-        logger.info("Loading training data from %s", self.train_dataset_url)
-        self.df_train = pd.read_csv(self.train_dataset_url)
+        Its invalid rows are dropped (see `DataValidator`) and the others ordered by
+        split, the training rows first, so that `get_split` serves both splits as
+        slices instead of copies. Both happen in a single selection of the rows.
+        """
+        if self._df_train is None:
+            logger.info("Loading training data from %s", self.train_dataset_url)
+            df = self._read(self.train_dataset_url)
+
+            with stage("validate_dataset"):
+                self.validator.start("train")
+                valid = self.validator.check(df, "train")
 
-        logger.info("Loading test data from %s", self.test_dataset_url)
-        self.df_test = pd.read_csv(self.test_dataset_url)
+            # The split only needs a few columns of the valid rows
+            positions = np.arange(len(df))
+            if valid is not None:
+                positions = np.flatnonzero(valid)
+                split_columns = [
+                    c
+                    for c in dict.fromkeys(
+                        (
+                            "id",
+                            self.target_variable,
+                            self.group_column,
+                            self.time_column,
+                        )
+                    )
+                    if c is not None
+                ]
+                split_df = df[split_columns].take(positions)
+            else:
+                split_df = df
 
-        if self.drop_na:
-            logger.info("Dropping rows with missing values")
-            self.df_train.dropna(inplace=True)
+            with stage("compute_split"):
+                train_indices, test_indices = self._split_indices(split_df)
+            self._n_train = len(train_indices)
+            self._df_train = df.take(
+                positions[np.concatenate([train_indices, test_indices])]
+            )
 
-        # Define feature sets
-        all_features = [c for c in self.df_train.columns if c != self.target_variable]
+        return self._df_train
+
+    @property
+    def df_test(self) -> pd.DataFrame:
+        """Test dataset, loaded on first access, without its invalid rows."""
+        if self._df_test is None:
+            logger.info("Loading test data from %s", self.test_dataset_url)
+            df = self._read(self.test_dataset_url)
+
+            with stage("validate_dataset"):
+                self.validator.start("test")
+                self._df_test = self.validator.clean(df, "test")
+
+        return self._df_test
+
+    @property
+    def features_selected(self) -> list[str]:
+        """Selected features, including the id column."""
+        if self._features_selected is None:
+            self._features_selected = self._select_features(self.df_train.columns)
+
+        return self._features_selected
+
+    def _select_features(self, columns: Iterable[str]) -> list[str]:
+        """
+        Select the features of a dataset.
+
+        Args:
+            columns (Iterable[str]): Columns of the dataset.
+
+        Returns:
+            list[str]: The selected features, including the id column.
+        """
+        all_features = [c for c in columns if c != self.target_variable]
         logger.info("Found %d features in the dataset", len(all_features))
 
+        features_selected = all_features
+
         if self.include_features is not None:
-            self.features_selected = [
-                f for f in all_features if f in self.include_features
-            ]
+            features_selected = [f for f in all_features if f in self.include_features]
 
         if self.exclude_features is not None:
-            self.features_selected = [
+            features_selected = [
                 f for f in all_features if f not in self.exclude_features
             ]
 
-        if "id" not in self.features_selected:
+        if "id" not in features_selected:
             logger.warning(
                 "The 'id' column is not included in the selected features. "
                 "It will be added automatically."
             )
-            self.features_selected = ["id", *self.features_selected]
+            features_selected = ["id", *features_selected]
 
         logger.info(
             "Selected %d features from the dataset: %s",
-            len(self.features_selected),
-            ", ".join(self.features_selected),
+            len(features_selected),
+            ", ".join(features_selected),
         )
 
+        return features_selected
+
+    def _is_selected(self, column: str) -> bool:
+        """
+        Check whether a column has to be loaded at all.
+
+        Args:
+            column (str): Name of the column.
+
+        Returns:
+            bool: True if the column is the id, the target or a selected feature.
+        """
+        if column in ("id", self.target_variable, self.group_column, self.time_column):
+            return True
+
+        if self.exclude_features is not None:
+            return column not in self.exclude_features
+
+        if self.include_features is not None:
+            return column in self.include_features
+
+        return True
+
+    def _local(self, url: str) -> str:
+        """
+        Local path of a dataset, downloading it first if it is remote.
+
+        Both datasets are downloaded at once on the first call, as both are needed
+        to train or predict.
+
+        Args:
+            url (str): URL of the dataset.
+
+        Returns:
+            str: Path of the downloaded dataset, or the URL if it is read directly.
+        """
+        if self.fetcher is None or not self.fetcher.handles(url):
+            return url
+
+        if url not in self._local_paths:
+            urls = [
+                u
+                for u in (url, self.train_dataset_url, self.test_dataset_url)
+                if self.fetcher.handles(u) and u not in self._local_paths
+            ]
+            with stage("fetch_datasets"):
+                paths = self.fetcher.fetch_all(urls)
+            self._local_paths.update(zip(urls, map(str, paths)))
+
+        return self._local_paths[url]
+
+    def _read(self, url: str) -> pd.DataFrame:
+        source = self._local(url)
+        with stage("read_dataset"):
+            if self.cache is None:
+                return self._parse(source, self._is_selected)
+
+            return self.cache.load(
+                source,
+                usecols=self._is_selected,
+                reader=self._parse,
+                options=self._parse_options(),
+            )
+
+    def _parse_options(self) -> dict[str, Any]:
+        """Settings `_parse` parses with, keying the cached datasets."""
+        return {
+            "dtypes": {column: str(dtype) for column, dtype in self.dtypes.items()},
+            "downcast": self.downcast,
+        }
+
+    def _parse(self, source: Any, usecols: Callable[[str], bool]) -> pd.DataFrame:
+        """
+        Parse the selected columns of a CSV dataset.
+
+        Args:
+            source (Any): Path, URL or buffer of the dataset.
+            usecols (Callable[[str], bool]): Predicate selecting the columns to parse.
+
+        Returns:
+            pd.DataFrame: The parsed dataset.
+        """
+        skipped = []
+
+        def keep(column: str) -> bool:
+            if usecols(column):
+                return True
+            skipped.append(column)
+            return False
+
+        df = pd.read_csv(
+            source,
+            usecols=keep,
+            dtype=self.dtypes or None,
+            compression=_compression(source),
+        )
+
+        if skipped:
+            # pandas may call the predicate more than once per column
+            skipped = list(dict.fromkeys(skipped))
+            logger.info(
+                "Skipped parsing %d unused columns: %s",
+                len(skipped),
+                ", ".join(skipped),
+            )
+
+        if self.downcast:
+            nbytes = df.memory_usage(deep=True).sum()
+            df = self._downcast(df)
+            saved = nbytes - df.memory_usage(deep=True).sum()
+            logger.info(
+                "Downcasting saved %.2f MB (%.1f%%)",
+                saved / 1024**2,
+                100 * saved / nbytes if nbytes else 0.0,
+            )
+
+        return df
+
+    def _downcast(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Downcast numeric columns to the narrowest dtype holding their values.
+
+        Args:
+            df (pd.DataFrame): The dataset.
+
+        Returns:
+            pd.DataFrame: The dataset with downcast columns.
+        """
+        for column in df.columns:
+            if column == self.target_variable or column in self.dtypes:
+                continue
+            if pd.api.types.is_float_dtype(df[column]):
+                df[column] = pd.to_numeric(df[column], downcast="float")
+            elif pd.api.types.is_integer_dtype(df[column]):
+                df[column] = pd.to_numeric(df[column], downcast="integer")
+
+        return df
+
+    def _split_indices(self, df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Compute the train/test split, reusing the one persisted in the dataset cache.
+
+        The random and group splits hold out rows by the hash of their id or group,
+        so that rows keep their split when the dataset grows, and are not persisted.
+        Other splits are keyed by the rows of the dataset (through their ids), the
+        strategy, the seed and the test size.
+
+        Args:
+            df (pd.DataFrame): The training dataset.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Positions of the training and test rows.
+
+        Raises:
+            ValueError: If either split is empty.
+        """
+        if self.split in ("random", "group"):
+            held_out = self._is_held_out(
+                df["id"] if self.split == "random" else df[self.group_column]
+            )
+            if held_out.all() or not held_out.any():
+                raise ValueError(
+                    f"The {self.split} split of {len(df)} rows left an empty "
+                    f"{'training' if held_out.all() else 'test'} split"
+                )
+            positions = np.arange(len(df))
+            return positions[~held_out], positions[held_out]
+
+        key = hashlib.sha256(
+            json.dumps(
+                [
+                    str(pd.util.hash_pandas_object(df["id"], index=False).sum()),
+                    len(df),
+                    self.split,
+                    self.seed,
+                    self.test_size,
+                    self.group_column,
+                    self.time_column,
+                ]
+            ).encode()
+        ).hexdigest()[:32]
+
+        if self.cache is not None:
+            indices = self.cache.load_split(key)
+            if indices is not None:
+                logger.info("Loaded %s train/test split %s", self.split, key)
+                return indices
+
+        logger.info("Computing %s train/test split", self.split)
+        positions = np.arange(len(df))
+
+        if self.split == "stratified":
+            # Both splits need a row of every bin
+            n_bins = max(
+                1, min(10, int(len(df) * min(self.test_size, 1 - self.test_size)))
+            )
+            bins = pd.qcut(
+                df[self.target_variable], q=n_bins, labels=False, duplicates="drop"
+            )
+            train_indices, test_indices = train_test_split(
+                positions,
+                test_size=self.test_size,
+                random_state=self.seed,
+                stratify=bins,
+            )
+        else:
+            if self.time_column is not None:
+                positions = np.argsort(df[self.time_column].to_numpy(), kind="stable")
+            n_train = len(positions) - math.ceil(len(df) * self.test_size)
+            train_indices, test_indices = positions[:n_train], positions[n_train:]
+
+        if self.cache is not None:
+            self.cache.save_split(key, train_indices, test_indices)
+
+        return train_indices, test_indices
+
     def get_split(
         self, train: bool = True
     ) -> tuple[pd.Series, pd.DataFrame, pd.Series]:
         """
         Get the training or testing data.
 
+        The split is deterministic given the seed and served as slices of the
+        training dataset, so repeated calls do not copy it.
+
         Args:
             train (bool): If True, return training data; otherwise, return testing data.
                 Defaults to True.
@@ -91,31 +507,132 @@ class DataModule:
         Returns:
             tuple[pd.Series, pd.DataFrame, pd.Series]: id (pd.Series), features (pd.DataFrame), and target variable (pd.Series).
         """
-        logger.info("Splitting data into train and test sets")
+        df = self.df_train
+        rows = slice(None, self._n_train) if train else slice(self._n_train, None)
+        features = [f for f in self.features_selected if f != "id"]
 
-        X = self.df_train[self.features_selected]
-        y = self.df_train[self.target_variable]
+        split = df.iloc[rows]
+        logger.info(
+            "Serving %s split (%d rows)", "train" if train else "test", len(split)
+        )
 
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=self.test_size
+        return (
+            split["id"],
+            split[features],
+            split[self.target_variable],
         )
 
-        if train:
-            return (
-                X_train["id"],
-                X_train.drop(columns=["id"]),
-                y_train,
-            )
-        else:
-            return (
-                X_test["id"],
-                X_test.drop(columns=["id"]),
-                y_test,
+    def get_shared_split(
+        self, train: bool = True
+    ) -> tuple[pd.Series, pd.DataFrame, pd.Series]:
+        """
+        Get the training or testing data, backed by memory-mapped files.
+
+        The features are written once as a single contiguous float matrix (of the
+        narrowest float dtype holding every feature, so downcast features stay
+        32-bit), and the target as a float64 vector, to files in `shared_dir`. The
+        returned frames are zero-copy views of the files, which joblib hands to worker
+        processes by reference instead of pickling a copy of the data per task. The files are
+        removed when the data module is garbage collected.
+
+        Args:
+            train (bool): If True, return training data; otherwise, return testing data.
+                Defaults to True.
+
+        Returns:
+            tuple[pd.Series, pd.DataFrame, pd.Series]: id (pd.Series), features (pd.DataFrame), and target variable (pd.Series).
+
+        Raises:
+            ValueError: If some features are not numeric.
+        """
+        ids, X, y = self.get_split(train=train)
+
+        non_numeric = [c for c in X.columns if not is_numeric_dtype(X[c])]
+        if non_numeric:
+            raise ValueError(f"Non-numeric features: {', '.join(non_numeric)}")
+
+        if self._shared_dir is None:
+            shared_dir = self.shared_dir
+            if shared_dir is None and os.path.isdir("/dev/shm"):
+                shared_dir = "/dev/shm"
+            self._shared_dir = Path(
+                tempfile.mkdtemp(prefix="datamodule-", dir=shared_dir)
             )
+            weakref.finalize(self, shutil.rmtree, self._shared_dir, True)
+
+        name = "train" if train else "test"
+        dtype = np.result_type(np.float32, *X.dtypes)
+        features = np.lib.format.open_memmap(
+            self._shared_dir / f"{name}-features.npy",
+            mode="w+",
+            dtype=dtype,
+            shape=X.shape,
+        )
+        for i, column in enumerate(X.columns):
+            features[:, i] = X[column].to_numpy(dtype=dtype)
+        target = np.lib.format.open_memmap(
+            self._shared_dir / f"{name}-target.npy",
+            mode="w+",
+            dtype=np.float64,
+            shape=y.shape,
+        )
+        target[:] = y.to_numpy(dtype=np.float64)
+        features.flush()
+        target.flush()
+        del features, target
+
+        # Reopen read-only, so that the views are shared by reference with workers
+        features = np.load(self._shared_dir / f"{name}-features.npy", mmap_mode="r")
+        target = np.load(self._shared_dir / f"{name}-target.npy", mmap_mode="r")
+        logger.info(
+            "Shared %s split as a %.1f MB memory-mapped matrix in %s",
+            name,
+            features.nbytes / 1024**2,
+            self._shared_dir,
+        )
+
+        return (
+            ids,
+            pd.DataFrame(features, index=X.index, columns=X.columns, copy=False),
+            pd.Series(target, index=y.index, name=y.name, copy=False),
+        )
+
+    def row_hashes(self, train: bool = True) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Hash the id and the content (selected features and target) of each row.
+
+        Comparing the hashes of two versions of a dataset tells which rows were
+        added or changed, without keeping a copy of the old version. Numeric columns
+        are hashed as 64-bit values, since downcasting may pick different widths for
+        two versions.
+
+        Args:
+            train (bool): If True, hash the training data; otherwise, the testing data.
+                Defaults to True.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Hashes (uint64) of the id and of the
+                content of each row.
+        """
+        ids, X, y = self.get_split(train=train)
+        rows = pd.concat([ids, X, y], axis=1)
+        rows = rows.astype(
+            {
+                column: "int64" if pd.api.types.is_integer_dtype(dtype) else "float64"
+                for column, dtype in rows.dtypes.items()
+                if pd.api.types.is_numeric_dtype(dtype)
+                and not pd.api.types.is_bool_dtype(dtype)
+            }
+        )
+
+        return (
+            pd.util.hash_pandas_object(rows["id"], index=False).to_numpy(),
+            pd.util.hash_pandas_object(rows, index=False).to_numpy(),
+        )
 
     def get_train_data(self) -> tuple[pd.Series, pd.DataFrame, pd.Series]:
         """
-        Get the training data.
+        Get the training data, in file order.
 
         Returns:
             tuple[pd.Series, pd.DataFrame, pd.Series]:
@@ -125,8 +642,9 @@ class DataModule:
         """
         logger.info("Loading training data")
 
-        X: pd.DataFrame = self.df_train[self.features_selected]
-        y: pd.Series = self.df_train[self.target_variable]
+        df = self.df_train.sort_index()
+        X: pd.DataFrame = df[self.features_selected]
+        y: pd.Series = df[self.target_variable]
 
         return (
             X["id"],
@@ -134,10 +652,20 @@ class DataModule:
             y,
         )
 
-    def get_test_data(self) -> tuple[pd.Series, pd.DataFrame]:
+    def get_test_data(
+        self, features: Iterable[str] | None = None
+    ) -> tuple[pd.Series, pd.DataFrame]:
         """
         Get the test data.
 
+        The training data is not loaded for it: features are selected from the test
+        dataset's columns unless they were already selected for training.
+
+        Args:
+            features (Iterable[str] | None, optional): Features to return, in order
+                (e.g. the features the model was fitted on). Defaults to None (the
+                selected features, in file order).
+
         Returns:
             tuple[pd.Series, pd.DataFrame]:
                 id (pd.Series): Unique identifier for each sample.
@@ -145,9 +673,172 @@ class DataModule:
         """
         logger.info("Loading test data")
 
-        X = self.df_test[self.features_selected]
+        if features is not None:
+            columns = ["id", *features]
+        elif self._features_selected is not None:
+            columns = self._features_selected
+        else:
+            columns = self._select_features(self.df_test.columns)
+        X = self.df_test[columns]
 
         return (
             X["id"],
             X.drop(columns=["id"]),
         )
+
+    def iter_train_data(
+        self,
+        chunk_size: int,
+        train: bool | None = True,
+        features: Iterable[str] | None = None,
+    ) -> Iterator[tuple[pd.Series, pd.DataFrame, pd.Series]]:
+        """
+        Iterate over the training data in chunks, without loading it all in memory.
+
+        Chunks are read from the dataset cache when it holds the dataset, and from the
+        CSV file otherwise. Rows are held out for validation by hashing their id, as
+        in the random split, so that a fraction `test_size` of them is held out
+        consistently across passes.
+
+        Args:
+            chunk_size (int): Number of rows read per chunk.
+            train (bool | None, optional): If True, yield the training rows; if False,
+                yield the held out rows; if None, yield every row. Defaults to True.
+            features (Iterable[str] | None, optional): Features to return, in order.
+                Defaults to None (the selected features, in file order).
+
+        Yields:
+            tuple[pd.Series, pd.DataFrame, pd.Series]:
+                id (pd.Series): Unique identifier for each sample of the chunk.
+                features (pd.DataFrame): Features for each sample of the chunk.
+                target (pd.Series): Target variable for each sample of the chunk.
+        """
+        logger.info(
+            "Streaming training data from %s in chunks of %d rows",
+            self.train_dataset_url,
+            chunk_size,
+        )
+
+        self.validator.start("train")
+        seen_ids: set = set()
+        for chunk in self._iter_chunks(self.train_dataset_url, chunk_size):
+            # Select the valid rows of the requested split at once
+            mask = self.validator.check(chunk, "train", seen_ids=seen_ids)
+            if train is not None:
+                held_out = self._is_held_out(chunk["id"])
+                in_split = ~held_out if train else held_out
+                mask = in_split if mask is None else mask & in_split
+            if mask is not None:
+                chunk = chunk[mask]
+
+            if chunk.empty:
+                continue
+
+            yield (
+                chunk["id"],
+                chunk[self._feature_columns(chunk, features)],
+                chunk[self.target_variable],
+            )
+
+    def iter_test_data(
+        self, chunk_size: int, features: Iterable[str] | None = None
+    ) -> Iterator[tuple[pd.Series, pd.DataFrame]]:
+        """
+        Iterate over the test data in chunks, without loading it all in memory.
+
+        Args:
+            chunk_size (int): Number of rows per chunk.
+            features (Iterable[str] | None, optional): Features to return, in order
+                (e.g. the features the model was fitted on). Defaults to None (the
+                selected features, in file order).
+
+        Yields:
+            tuple[pd.Series, pd.DataFrame]:
+                id (pd.Series): Unique identifier for each sample of the chunk.
+                features (pd.DataFrame): Features for each sample of the chunk.
+        """
+        logger.info(
+            "Streaming test data from %s in chunks of %d rows",
+            self.test_dataset_url,
+            chunk_size,
+        )
+
+        self.validator.start("test")
+        seen_ids: set = set()
+        for chunk in self._iter_chunks(self.test_dataset_url, chunk_size):
+            chunk = self.validator.clean(chunk, "test", seen_ids=seen_ids)
+            if chunk.empty:
+                continue
+
+            yield chunk["id"], chunk[self._feature_columns(chunk, features)]
+
+    def _iter_chunks(self, url: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+        source = self._local(url)
+        chunks = None
+        if self.cache is not None:
+            chunks = self.cache.iter_chunks(
+                source,
+                chunk_size,
+                usecols=self._is_selected,
+                options=self._parse_options(),
+            )
+
+        if chunks is None:
+            chunks = pd.read_csv(
+                source,
+                usecols=self._is_selected,
+                dtype=self.dtypes or None,
+                chunksize=chunk_size,
+                compression=_compression(source),
+            )
+
+        for chunk in chunks:
+            yield self._downcast(chunk) if self.downcast else chunk
+
+    def _feature_columns(
+        self, chunk: pd.DataFrame, features: Iterable[str] | None
+    ) -> list[str]:
+        if features is not None:
+            return list(features)
+
+        return [c for c in chunk.columns if c not in ("id", self.target_variable)]
+
+    def _is_held_out(self, ids: pd.Series) -> np.ndarray:
+        """
+        Deterministically assign a fraction `test_size` of the rows to validation.
+
+        Every row is assigned by the hash of its id (and of the seed) alone, so it
+        keeps its split whatever other rows the dataset holds.
+
+        Args:
+            ids (pd.Series): Unique identifier for each sample (or group of samples).
+
+        Returns:
+            np.ndarray: True for each held out sample.
+        """
+        if pd.api.types.is_integer_dtype(ids):
+            # Downcasting may pick a different width per chunk
+            ids = ids.astype("int64")
+
+        hashes = pd.util.hash_pandas_object(ids, index=False).to_numpy()
+        if self.seed is not None:
+            hashes = pd.util.hash_array(hashes ^ np.uint64(self.seed % 2**64))
+
+        return hashes % 10000 < self.test_size * 10000
+
+
+def _compression(source: Any) -> str | None:
+    """
+    Compression of a dataset, detected from the content of local files.
+
+    Args:
+        source (Any): Path, URL or buffer of the dataset.
+
+    Returns:
+        str | None: The compression, or "infer" to let pandas infer it from the
+            suffix of URLs and the content of buffers.
+    """
+    if isinstance(source, (str, Path)) and os.path.isfile(source):
+        return detect_compression(source)
+
+    return "infer"
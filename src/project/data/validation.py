@@ -0,0 +1,224 @@
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_float_dtype, is_numeric_dtype
+
+logger = logging.getLogger(__name__)
+
+# Rules a row can be rejected by, in the order they are reported
+RULES = ("missing", "infinite", "out_of_range", "duplicate_id")
+
+
+class DataValidator:
+    """Validate and clean datasets through a single boolean mask per frame.
+
+    Every column is scanned once, checking all of the enabled rules at the same
+    time, and the rejected rows are removed with a single selection at the end. The
+    rules are missing values, infinite values, values out of the range declared by
+    a schema and duplicate ids (the first occurrence of an id is kept). Rejected
+    rows can be written to a quarantine file, along with the rules they broke.
+    """
+
+    def __init__(
+        self,
+        schema: dict[str, dict[str, float]] | None = None,
+        drop_missing: bool = True,
+        drop_infinite: bool = True,
+        drop_duplicate_ids: bool = True,
+        quarantine_dir: str | Path | None = None,
+    ):
+        """
+        Initialize the validator.
+
+        Args:
+            schema (dict[str, dict[str, float]] | None, optional): Valid range of
+                some columns, as a "min" and/or a "max" (inclusive) by column.
+                Defaults to None.
+            drop_missing (bool, optional): Whether to reject rows with missing
+                values. Defaults to True.
+            drop_infinite (bool, optional): Whether to reject rows with infinite
+                values. Defaults to True.
+            drop_duplicate_ids (bool, optional): Whether to reject the rows whose id
+                was already seen. Defaults to True.
+            quarantine_dir (str | Path | None, optional): Directory to write the
+                rejected rows of each frame to, as `<name>-rejected.csv`.
+                Defaults to None (rejected rows are discarded).
+        """
+        self.schema = {
+            column: dict(bounds) for column, bounds in (schema or {}).items()
+        }
+        self.drop_missing = drop_missing
+        self.drop_infinite = drop_infinite
+        self.drop_duplicate_ids = drop_duplicate_ids
+        self.quarantine_dir = Path(quarantine_dir) if quarantine_dir else None
+
+        self.reports: dict[str, dict[str, int]] = {}
+        self._quarantined: set[str] = set()
+
+    def validate(
+        self, df: pd.DataFrame, seen_ids: set | None = None
+    ) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """
+        Check every row of a frame against the enabled rules.
+
+        Args:
+            df (pd.DataFrame): The frame.
+            seen_ids (set | None, optional): Ids seen in previous chunks of the same
+                dataset, updated with those of this frame, so that duplicates are
+                found across chunks. Defaults to None.
+
+        Returns:
+            tuple[np.ndarray, dict[str, np.ndarray]]: Mask of the valid rows, and
+                mask of the rows broken by each enabled rule.
+        """
+        n_rows = len(df)
+        broken = {
+            rule: np.zeros(n_rows, dtype=bool)
+            for rule, enabled in zip(
+                RULES,
+                (
+                    self.drop_missing,
+                    self.drop_infinite,
+                    bool(self.schema),
+                    self.drop_duplicate_ids and "id" in df.columns,
+                ),
+            )
+            if enabled
+        }
+
+        for column in df.columns:
+            series = df[column]
+            values = series.to_numpy()
+            bounds = self.schema.get(column)
+
+            if is_float_dtype(values.dtype):
+                if "missing" in broken:
+                    broken["missing"] |= np.isnan(values)
+                if "infinite" in broken:
+                    broken["infinite"] |= np.isinf(values)
+            elif "missing" in broken and not is_numeric_dtype(series.dtype):
+                broken["missing"] |= series.isna().to_numpy()
+
+            if bounds is not None:
+                # Missing values are left to the missing rule
+                with np.errstate(invalid="ignore"):
+                    if bounds.get("min") is not None:
+                        broken["out_of_range"] |= values < bounds["min"]
+                    if bounds.get("max") is not None:
+                        broken["out_of_range"] |= values > bounds["max"]
+
+        if "duplicate_id" in broken:
+            ids = df["id"]
+            duplicated = ids.duplicated(keep="first").to_numpy()
+            if seen_ids is not None:
+                duplicated = duplicated | ids.isin(seen_ids).to_numpy()
+                seen_ids.update(ids.tolist())
+            broken["duplicate_id"] = duplicated
+
+        valid = np.ones(n_rows, dtype=bool)
+        for mask in broken.values():
+            valid &= ~mask
+
+        return valid, broken
+
+    def start(self, name: str) -> None:
+        """
+        Start validating a dataset over, e.g. before another pass over its chunks.
+
+        Its report is reset and its quarantine file is started over.
+
+        Args:
+            name (str): Name of the dataset.
+        """
+        self.reports.pop(name, None)
+        self._quarantined.discard(name)
+
+    def check(
+        self, df: pd.DataFrame, name: str, seen_ids: set | None = None
+    ) -> np.ndarray | None:
+        """
+        Find the invalid rows of a frame, reporting how many each rule rejected.
+
+        The counts are logged and accumulated in `reports[name]`, and the invalid
+        rows are quarantined if configured.
+
+        Args:
+            df (pd.DataFrame): The frame, or a chunk of the dataset.
+            name (str): Name of the dataset, for the report and the quarantine file.
+            seen_ids (set | None, optional): Ids seen in previous chunks of the same
+                dataset (see `validate`). Defaults to None.
+
+        Returns:
+            np.ndarray | None: Mask of the valid rows, or None if every row is valid.
+        """
+        valid, broken = self.validate(df, seen_ids=seen_ids)
+        rejected = int(len(df) - valid.sum())
+
+        report = self.reports.setdefault(
+            name, {"rows": 0, "rejected": 0, **{rule: 0 for rule in broken}}
+        )
+        report["rows"] += len(df)
+        report["rejected"] += rejected
+        for rule, mask in broken.items():
+            report[rule] = report.get(rule, 0) + int(mask.sum())
+
+        if not rejected:
+            return None
+
+        logger.info(
+            "Rejected %d of %d %s rows (%s)",
+            rejected,
+            len(df),
+            name,
+            ", ".join(f"{rule}: {mask.sum()}" for rule, mask in broken.items()),
+        )
+        if self.quarantine_dir is not None:
+            self._quarantine(df, valid, broken, name)
+
+        return valid
+
+    def clean(
+        self, df: pd.DataFrame, name: str, seen_ids: set | None = None
+    ) -> pd.DataFrame:
+        """
+        Remove the invalid rows of a frame (see `check`).
+
+        The frame is returned as is if every row is valid, and selected once
+        otherwise.
+
+        Args:
+            df (pd.DataFrame): The frame, or a chunk of the dataset.
+            name (str): Name of the dataset, for the report and the quarantine file.
+            seen_ids (set | None, optional): Ids seen in previous chunks of the same
+                dataset (see `validate`). Defaults to None.
+
+        Returns:
+            pd.DataFrame: The valid rows.
+        """
+        valid = self.check(df, name, seen_ids=seen_ids)
+        return df if valid is None else df[valid]
+
+    def _quarantine(
+        self,
+        df: pd.DataFrame,
+        valid: np.ndarray,
+        broken: dict[str, np.ndarray],
+        name: str,
+    ) -> None:
+        rows = ~valid
+        rejected = df[rows].assign(
+            rejected_by=[
+                ",".join(rule for rule, hit in zip(broken, hits) if hit)
+                for hits in zip(*(mask[rows] for mask in broken.values()))
+            ]
+        )
+
+        # The file of a frame is started over by the first chunk of this run
+        path = self.quarantine_dir / f"{name}-rejected.csv"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        first = name not in self._quarantined
+        rejected.to_csv(path, mode="w" if first else "a", header=first, index=False)
+        self._quarantined.add(name)
+        logger.info("Quarantined %d %s rows in %s", len(rejected), name, path)
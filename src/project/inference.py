@@ -0,0 +1,116 @@
+import logging
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.pipeline import Pipeline
+
+from project.checkpoint import load_model
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceEngine:
+    """Batch inference engine sharding rows across a pool of workers."""
+
+    def __init__(
+        self,
+        n_jobs: int = 1,
+        batch_size: int = 10000,
+        backend: str = "loky",
+        mmap_mode: str | None = "r",
+    ):
+        """
+        Initialize the inference engine.
+
+        Args:
+            n_jobs (int, optional): Number of workers (-1 uses every core). Defaults to 1.
+            batch_size (int, optional): Number of rows per batch. Inputs no larger than
+                a single batch are predicted in the calling thread. Defaults to 10000.
+            backend (str, optional): Joblib backend of the pool, either "loky"
+                (processes) or "threading". Defaults to "loky".
+            mmap_mode (str | None, optional): Memory-mapping mode process workers
+                load the checkpoint with (see `load_model`). Defaults to "r".
+        """
+        self.n_jobs = n_jobs
+        self.batch_size = batch_size
+        self.backend = backend
+        self.mmap_mode = mmap_mode
+
+    def predict(
+        self,
+        pipeline: Pipeline,
+        X: pd.DataFrame | np.ndarray,
+        checkpoint: str | Path | None = None,
+        n_jobs: int | None = None,
+    ) -> np.ndarray:
+        """
+        Predict the target of every row, in input order.
+
+        Args:
+            pipeline (Pipeline): The trained pipeline.
+            X (pd.DataFrame | np.ndarray): Features for each sample.
+            checkpoint (str | Path | None, optional): Checkpoint the pipeline was
+                loaded from. Process workers load it once each (memory-mapped with
+                `mmap_mode`) instead of receiving a pickled copy of the pipeline with every batch.
+                Defaults to None.
+            n_jobs (int | None, optional): Number of workers of this call, instead
+                of `n_jobs` (e.g. as chosen by `parallelism`). Defaults to None.
+
+        Returns:
+            np.ndarray: The predictions.
+        """
+        n_jobs = self.n_jobs if n_jobs is None else n_jobs
+        n_batches = self.n_batches(len(X))
+        if n_jobs == 1 or n_batches <= 1:
+            return pipeline.predict(X)
+
+        logger.info(
+            f"Predicting {len(X)} rows in {n_batches} batches "
+            f"(n_jobs={n_jobs}, backend={self.backend})"
+        )
+
+        # Threads share the pipeline as is, processes load it from the checkpoint
+        model: Pipeline | str = pipeline
+        if self.backend != "threading" and checkpoint is not None:
+            model = str(checkpoint)
+
+        batches = (
+            _slice(X, start, start + self.batch_size)
+            for start in range(0, len(X), self.batch_size)
+        )
+        predictions = Parallel(n_jobs=n_jobs, backend=self.backend)(
+            delayed(_predict_batch)(model, batch, self.mmap_mode) for batch in batches
+        )
+
+        return np.concatenate(predictions)
+
+    def n_batches(self, n_rows: int) -> int:
+        """
+        Number of batches the rows are predicted in.
+
+        Args:
+            n_rows (int): Number of rows.
+
+        Returns:
+            int: The number of batches.
+        """
+        return math.ceil(n_rows / self.batch_size)
+
+
+def _slice(
+    X: pd.DataFrame | np.ndarray, start: int, stop: int
+) -> pd.DataFrame | np.ndarray:
+    return X.iloc[start:stop] if isinstance(X, pd.DataFrame) else X[start:stop]
+
+
+def _predict_batch(
+    model: Pipeline | str, X: pd.DataFrame | np.ndarray, mmap_mode: str | None
+) -> np.ndarray:
+    # Workers load the checkpoint once and reuse it for every following batch
+    pipeline = (
+        load_model(model, mmap_mode=mmap_mode) if isinstance(model, str) else model
+    )
+    return pipeline.predict(X)
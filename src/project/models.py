@@ -1,16 +1,231 @@
-from typing import Dict, Any
+import importlib
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List
 
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import Lasso, LinearRegression
+import numpy as np
+from joblib import Memory
+from sklearn.base import BaseEstimator, RegressorMixin, clone
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler
-from sklearn.svm import SVR
+
+logger = logging.getLogger(__name__)
+
+# Estimator of each model type, as its module, its class and whether it takes a
+# random state. Modules are imported on first use, so that only the selected
+# estimator's is loaded.
+MODEL_TYPES: Dict[str, tuple[str, str, bool]] = {
+    "linear": ("sklearn.linear_model", "LinearRegression", False),
+    "lasso": ("sklearn.linear_model", "Lasso", True),
+    "random_forest": ("sklearn.ensemble", "RandomForestRegressor", True),
+    "svm": ("sklearn.svm", "SVR", False),
+    "hist_gradient_boosting": (
+        "sklearn.ensemble",
+        "HistGradientBoostingRegressor",
+        True,
+    ),
+    "sgd": ("sklearn.linear_model", "SGDRegressor", True),
+    "svm_approx": ("sklearn.linear_model", "Ridge", False),
+}
+
+# Relative cost of fitting each model type, used to schedule the slowest fits first
+FIT_COSTS: Dict[str, float] = {
+    "svm": 16.0,
+    "random_forest": 8.0,
+    "hist_gradient_boosting": 4.0,
+    "svm_approx": 2.0,
+    "lasso": 1.0,
+    "sgd": 1.0,
+    "linear": 1.0,
+}
+
+# Model types that can continue training from a previous fit, and the rows they are
+# retrained on: only the new or changed ones ("delta"), or every row starting from
+# the previous coefficients ("full"), for full-batch solvers that would otherwise
+# forget the rows they were trained on
+WARM_START: Dict[str, str] = {
+    "random_forest": "delta",
+    "sgd": "delta",
+    "lasso": "full",
+}
+
+# Model types running threads of their own within a fit or a prediction, and what
+# runs them: the estimator's n_jobs (random forests, over their trees), OpenMP
+# (histogram gradient boosting) or BLAS (least squares and kernel approximations);
+# the other model types run on a single thread
+THREADING: Dict[str, str] = {
+    "random_forest": "n_jobs",
+    "hist_gradient_boosting": "openmp",
+    "linear": "blas",
+    "svm_approx": "blas",
+}
+
+# Kernel approximations of the "svm_approx" model type, as their module and class
+KERNEL_APPROXIMATIONS: Dict[str, tuple[str, str]] = {
+    "nystroem": ("sklearn.kernel_approximation", "Nystroem"),
+    "rbf_sampler": ("sklearn.kernel_approximation", "RBFSampler"),
+}
+
+
+def _import(module: str, name: str) -> Any:
+    return getattr(importlib.import_module(module), name)
+
+
+class TransformerCache:
+    """Size-bounded joblib Memory for Pipeline steps, counting hits and misses.
+
+    Calls and hits are appended to a log file within the cache directory, so that
+    they are also counted when the pipeline is fitted in worker processes. Hits are
+    recorded as joblib validates the cached result it found, so that arguments are
+    only hashed once, and the log is compacted into totals once it outgrows
+    `STATS_MAX_BYTES` (events recorded by other processes meanwhile may be lost).
+    """
+
+    STATS_FILE = "stats.log"
+    STATS_MAX_BYTES = 64 * 1024
+
+    def __init__(self, location: str | Path, max_size_mb: float | None = None):
+        """
+        Initialize the cache, evicting old entries beyond its size budget.
+
+        Args:
+            location (str | Path): Directory of the cache.
+            max_size_mb (float | None, optional): Maximum size of the cache in
+                megabytes. Defaults to None (unbounded).
+        """
+        self.location = Path(location)
+        self.max_size_mb = max_size_mb
+        self.memory = Memory(self.location, verbose=0)
+
+        if max_size_mb is not None:
+            self.memory.reduce_size(bytes_limit=int(max_size_mb * 1024**2))
+
+    def cache(self, func: Callable[..., Any], **kwargs: Any) -> Callable[..., Any]:
+        """
+        Cache the results of a function, as `joblib.Memory.cache` does.
+
+        Args:
+            func (Callable[..., Any]): The function to cache.
+            **kwargs (Any): Additional arguments to pass to `joblib.Memory.cache`.
+
+        Returns:
+            Callable[..., Any]: The cached function.
+        """
+        callback = kwargs.pop("cache_validation_callback", None)
+
+        def validate(metadata: Dict[str, Any]) -> bool:
+            # Only called for calls found in the cache
+            valid = callback is None or callback(metadata)
+            if valid:
+                self._record("hit")
+            return valid
+
+        memorized = self.memory.cache(
+            func, cache_validation_callback=validate, **kwargs
+        )
+
+        def cached(*args: Any, **kwargs: Any) -> Any:
+            self._record("call")
+            return memorized(*args, **kwargs)
+
+        return cached
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Count the cache hits and misses recorded so far.
+
+        Returns:
+            Dict[str, int]: Number of hits and misses.
+        """
+        counts = self._counts()
+
+        return {"hits": counts["hit"], "misses": counts["call"] - counts["hit"]}
+
+    def clear(self) -> None:
+        """Remove every cached result and the recorded statistics."""
+        self.memory.clear(warn=False)
+        (self.location / self.STATS_FILE).unlink(missing_ok=True)
+
+    def _record(self, event: str) -> None:
+        with open(self.location / self.STATS_FILE, "a") as f:
+            f.write(f"{event} 1\n")
+            size = f.tell()
+
+        if size > self.STATS_MAX_BYTES:
+            counts = self._counts()
+            compacted = self.location / f"{self.STATS_FILE}.{os.getpid()}.tmp"
+            compacted.write_text(
+                "".join(f"{event} {count}\n" for event, count in counts.items())
+            )
+            os.replace(compacted, self.location / self.STATS_FILE)
+
+    def _counts(self) -> Dict[str, int]:
+        counts = {"call": 0, "hit": 0}
+        try:
+            with open(self.location / self.STATS_FILE) as f:
+                for line in f:
+                    event, _, count = line.partition(" ")
+                    if event in counts:
+                        counts[event] += int(count)
+        except FileNotFoundError:
+            pass
+
+        return counts
+
+
+class FoldEnsemble(RegressorMixin, BaseEstimator):
+    """Average the predictions of estimators already fitted on cross-validation folds.
+
+    Used as a checkpoint instead of refitting the pipeline on the whole dataset.
+    """
+
+    def __init__(self, estimators: List[Any]):
+        """
+        Initialize the ensemble.
+
+        Args:
+            estimators (List[Any]): The fitted fold estimators.
+        """
+        self.estimators = estimators
+
+    def fit(self, X: Any, y: Any) -> "FoldEnsemble":
+        """
+        Fit every fold estimator on the same data.
+
+        Args:
+            X (Any): Features for each sample.
+            y (Any): Target variable for each sample.
+
+        Returns:
+            FoldEnsemble: The fitted ensemble.
+        """
+        self.estimators = [clone(estimator).fit(X, y) for estimator in self.estimators]
+        return self
+
+    @property
+    def feature_names_in_(self) -> np.ndarray:
+        """Names of the features the fold estimators were fitted on."""
+        return self.estimators[0].feature_names_in_
+
+    def predict(self, X: Any) -> np.ndarray:
+        """
+        Predict the target as the mean of the fold estimators' predictions.
+
+        Args:
+            X (Any): Features for each sample.
+
+        Returns:
+            np.ndarray: The predictions.
+        """
+        return np.mean([estimator.predict(X) for estimator in self.estimators], axis=0)
 
 
 def create_pipeline(
     model_type: str = "linear",
     scale_features: bool = True,
     seed: int = 1234,
+    memory: str | None = None,
+    memory_max_size_mb: float | None = None,
     **model_params: Dict[str, Any],
 ) -> Pipeline:
     """
@@ -18,30 +233,143 @@ def create_pipeline(
 
     Args:
         model_type (str): A string specifying the type of model to include in the pipeline.
-            Supported options are "linear", "lasso", "random_forest", and "svm".
+            Supported options are "linear", "lasso", "random_forest", "svm",
+            "hist_gradient_boosting", "sgd", and "svm_approx" (an RBF kernel
+            approximation, chosen by the "approximation" parameter among "nystroem"
+            and "rbf_sampler" with "n_components" and "gamma", followed by ridge
+            regression).
         scale_features (bool): A boolean indicating whether to include feature scaling in the pipeline.
         seed (int): An integer for setting the random state for models that require it.
+        memory (str | None): Directory caching the fitted preprocessing steps, so that
+            identical steps are fitted once across folds, candidates and runs.
+        memory_max_size_mb (float | None): Maximum size of the cache in megabytes.
         **model_params (Dict[str, Any]): Additional parameters to pass to the model constructor.
 
     Returns:
         Pipeline: A scikit-learn Pipeline object with the specified configuration.
     """
+    if model_type not in MODEL_TYPES:
+        raise ValueError(f"Invalid model type: {model_type}")
+
     steps = []
 
     if scale_features:
-        steps.append(("scaler", StandardScaler()))
-
-    if model_type == "linear":
-        steps.append(("model", LinearRegression(**model_params)))
-    elif model_type == "lasso":
-        steps.append(("model", Lasso(random_state=seed, **model_params)))
-    elif model_type == "random_forest":
-        steps.append(
-            ("model", RandomForestRegressor(random_state=seed, **model_params))
-        )
-    elif model_type == "svm":
-        steps.append(("model", SVR(**model_params)))
+        scaler = _import("sklearn.preprocessing", "StandardScaler")
+        steps.append(("scaler", scaler()))
+
+    if model_type == "svm_approx":
+        # Approximate the kernel feature map, so that a linear model scales linearly
+        # with the number of samples instead of quadratically or cubically like SVR
+        approximation = model_params.pop("approximation", "nystroem")
+        kernel_params = {
+            "n_components": model_params.pop("n_components", 100),
+            "random_state": seed,
+        }
+        gamma = model_params.pop("gamma", None)
+        if gamma is not None:
+            kernel_params["gamma"] = gamma
+
+        if approximation not in KERNEL_APPROXIMATIONS:
+            raise ValueError(f"Invalid kernel approximation: {approximation}")
+        if approximation == "nystroem":
+            kernel_params["kernel"] = "rbf"
+
+        kernel = _import(*KERNEL_APPROXIMATIONS[approximation])
+        steps.append(("kernel", kernel(**kernel_params)))
+
+    module, name, takes_seed = MODEL_TYPES[model_type]
+    if takes_seed:
+        model_params["random_state"] = seed
+    steps.append(("model", _import(module, name)(**model_params)))
+
+    cache = (
+        TransformerCache(memory, max_size_mb=memory_max_size_mb)
+        if memory is not None
+        else None
+    )
+
+    return Pipeline(steps=steps, memory=cache)
+
+
+def model_type_of(pipeline: Pipeline) -> str | None:
+    """
+    Find the model type of a pipeline from its final estimator.
+
+    Args:
+        pipeline (Pipeline): A pipeline created by `create_pipeline`.
+
+    Returns:
+        str | None: The model type, or None if the estimator is not a known one.
+    """
+    estimator = pipeline.steps[-1][1]
+    kernel = "kernel" in pipeline.named_steps
+
+    for model_type, (module, name, _) in MODEL_TYPES.items():
+        if (model_type == "svm_approx") != kernel:
+            continue
+        cls = type(estimator)
+        if cls.__module__.startswith(module) and cls.__name__ == name:
+            return model_type
+
+    return None
+
+
+def warm_start(
+    pipeline: Pipeline,
+    X: Any,
+    y: Any,
+    n_estimators: int = 50,
+    epochs: int = 1,
+    seed: int | None = None,
+) -> Pipeline:
+    """
+    Continue training a fitted pipeline on more data, in place.
+
+    The preprocessing steps are kept as fitted, so that the features the estimator
+    was trained on keep their meaning. A random forest grows `n_estimators` more
+    trees on the data, an SGD model runs `epochs` more passes over it and a lasso
+    model is refit on it starting from its previous coefficients (see `WARM_START`
+    for the rows each model type expects).
+
+    Args:
+        pipeline (Pipeline): The fitted pipeline.
+        X (Any): Features for each sample.
+        y (Any): Target variable for each sample.
+        n_estimators (int, optional): Number of trees added to a random forest.
+            Defaults to 50.
+        epochs (int, optional): Number of passes of an SGD model over the data.
+            Defaults to 1.
+        seed (int | None, optional): Seed of the order of the SGD passes.
+            Defaults to None.
+
+    Returns:
+        Pipeline: The pipeline.
+
+    Raises:
+        ValueError: If the model type does not support warm starts.
+    """
+    model_type = model_type_of(pipeline)
+    if model_type not in WARM_START:
+        raise ValueError(f"Model type {model_type} does not support warm starts")
+
+    estimator = pipeline.steps[-1][1]
+    Xt = pipeline[:-1].transform(X) if len(pipeline.steps) > 1 else X
+
+    if model_type == "sgd":
+        rng = np.random.default_rng(seed)
+        y = np.asarray(y)
+        for _ in range(epochs):
+            order = rng.permutation(len(y))
+            X_epoch = Xt.iloc[order] if hasattr(Xt, "iloc") else Xt[order]
+            estimator.partial_fit(X_epoch, y[order])
     else:
-        raise ValueError(f"Invalid model type: {model_type}")
+        if model_type == "random_forest":
+            estimator.set_params(n_estimators=estimator.n_estimators + n_estimators)
+        estimator.set_params(warm_start=True)
+        try:
+            estimator.fit(Xt, y)
+        finally:
+            # Later fits of the checkpoint, e.g. of clones, start from scratch
+            estimator.set_params(warm_start=False)
 
-    return Pipeline(steps=steps)
+    return pipeline
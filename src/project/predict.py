@@ -1,13 +1,20 @@
+import contextlib
 import logging
 from pathlib import Path
 
 import hydra
-import joblib
 import pandas as pd
 from omegaconf import DictConfig, OmegaConf
+from sklearn.pipeline import Pipeline
 
+from project.checkpoint import load_model
+from project.compiled import CompiledModel, compiled_path, load_compiled
 from project.data.module import DataModule
-from project.utils import seed_everything
+from project.inference import InferenceEngine
+from project.profiling import Profiler, stage
+from project.resources import parallelism, shallow_copy
+from project.writers import open_writer
+from project.utils import TopK, seed_everything, top_predictions
 
 logger = logging.getLogger(__name__)
 
@@ -35,38 +42,160 @@ def predict(cfg: DictConfig) -> None:
     logger.info(f"Instantiating data module <{cfg.data._target_}>")
     data_module: DataModule = hydra.utils.instantiate(cfg.data)
 
-    ids, X = data_module.get_test_data()
-
     # Load the saved model
     if not Path(cfg.checkpoint).is_file():
         logger.error(f"Model file not found at {cfg.checkpoint}")
         logger.info("Please run the training script first to generate a model.")
         return
 
-    logger.info(f"Loading model from {cfg.checkpoint}")
-    with open(cfg.checkpoint, "rb") as f:
-        pipeline = joblib.load(f)
+    # The compiled model is saved next to the checkpoint when training
+    compiled_file = compiled_path(cfg.checkpoint)
+    if cfg.get("compiled") and not compiled_file.is_file():
+        logger.error(f"Compiled model file not found at {compiled_file}")
+        logger.info("Please train the model with compile_model=true first.")
+        return
+
+    with stage("load_model"):
+        if cfg.get("compiled"):
+            pipeline = load_compiled(compiled_file)
+        else:
+            # The loaded model is shared, its threads are governed on a copy
+            pipeline = shallow_copy(
+                load_model(cfg.checkpoint, mmap_mode=cfg.get("mmap_mode"))
+            )
+
+    # Instantiate inference engine
+    engine = InferenceEngine(mmap_mode=cfg.get("mmap_mode"))
+    if cfg.get("inference"):
+        logger.info(f"Instantiating inference engine <{cfg.inference._target_}>")
+        engine = hydra.utils.instantiate(cfg.inference, mmap_mode=cfg.get("mmap_mode"))
+
+    top_k = cfg.get("top_k", 10)
+    predictions_file = None
+    if cfg.get("predictions_file"):
+        predictions_file = output_dir / cfg.get("predictions_file")
+
+    if cfg.get("chunk_size"):
+        with stage("predict_streaming"):
+            predictions_df = predict_streaming(
+                cfg, pipeline, engine, data_module, predictions_file
+            )
+        logger.info(f"Top {top_k} predictions:\n{predictions_df}")
+        return
+
+    with stage("get_test_data"):
+        ids, X = data_module.get_test_data(
+            features=getattr(pipeline, "feature_names_in_", None)
+        )
 
     # Make predictions on the predict set
     logger.info("Making predictions on the predict set")
-    y_pred = pipeline.predict(X)
+    with (
+        stage("predict"),
+        parallelism(
+            "predict", pipeline, n_tasks=engine.n_batches(len(X)), n_jobs=engine.n_jobs
+        ) as n_jobs,
+    ):
+        y_pred = engine.predict(
+            pipeline, X, checkpoint=worker_checkpoint(cfg), n_jobs=n_jobs
+        )
 
     # Create predictions DataFrame
     predictions_df = pd.DataFrame({"id": ids, cfg.data.target_variable: y_pred})
 
     # Sort predictions by target variable (descending) as in the original notebook
-    predictions_df = predictions_df.sort_values(
-        cfg.data.target_variable, ascending=False
-    )
+    if cfg.get("sort_predictions"):
+        with stage("sort_predictions"):
+            predictions_df = predictions_df.sort_values(
+                cfg.data.target_variable, ascending=False
+            )
 
     # Save predictions if specified
-    if cfg.get("predictions_file"):
-        predictions_file = output_dir / cfg.get("predictions_file")
+    if predictions_file is not None:
         logger.info(f"Saving predictions to {predictions_file}")
-        predictions_df.to_csv(predictions_file, index=False)
+        with stage("save_predictions"), open_writer(predictions_file) as writer:
+            writer.write(predictions_df)
 
     # Display top predictions
-    logger.info(f"Top 10 predictions:\n{predictions_df.head(10)}")
+    logger.info(
+        f"Top {top_k} predictions:\n"
+        f"{top_predictions(predictions_df, cfg.data.target_variable, top_k)}"
+    )
+
+
+def predict_streaming(
+    cfg: DictConfig,
+    pipeline: Pipeline | CompiledModel,
+    engine: InferenceEngine,
+    data_module: DataModule,
+    predictions_file: Path | None,
+) -> pd.DataFrame:
+    """
+    Make predictions chunk by chunk, keeping memory usage bounded.
+
+    Predictions are appended to the output file in input order, as sorting them would
+    require holding all of them in memory; the top predictions are tracked with a
+    bounded heap instead. The file format follows its suffix (see `open_writer`).
+
+    Args:
+        cfg: Configuration composed by Hydra
+        pipeline: The trained pipeline, or its compiled model
+        engine: The inference engine making the predictions
+        data_module: The data module providing the input
+        predictions_file: Where to append the predictions, if anywhere
+
+    Returns:
+        pd.DataFrame: The top predictions, sorted by target variable (descending)
+    """
+    target = cfg.data.target_variable
+    top_k = TopK(cfg.get("top_k", 10))
+    features = getattr(pipeline, "feature_names_in_", None)
+    checkpoint = worker_checkpoint(cfg)
+
+    writer = None
+    if predictions_file is not None:
+        logger.info(f"Streaming predictions to {predictions_file}")
+        writer = open_writer(predictions_file)
+
+    n_rows = 0
+    try:
+        with parallelism(
+            "predict",
+            pipeline,
+            n_tasks=engine.n_batches(cfg.chunk_size),
+            n_jobs=engine.n_jobs,
+        ) as n_jobs:
+            for ids, X in data_module.iter_test_data(cfg.chunk_size, features=features):
+                y_pred = engine.predict(
+                    pipeline, X, checkpoint=checkpoint, n_jobs=n_jobs
+                )
+                top_k.update(ids, y_pred)
+
+                if writer is not None:
+                    writer.write(pd.DataFrame({"id": ids, target: y_pred}))
+
+                n_rows += len(ids)
+                logger.info(f"Made predictions for {n_rows} rows")
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return pd.DataFrame(top_k.items(), columns=["id", target])
+
+
+def worker_checkpoint(cfg: DictConfig) -> str | None:
+    """
+    Checkpoint the inference workers load the model from.
+
+    Compiled models are small and handed to the workers as they are.
+
+    Args:
+        cfg: Configuration composed by Hydra
+
+    Returns:
+        str | None: Path of the checkpoint, or None for compiled models
+    """
+    return None if cfg.get("compiled") else cfg.checkpoint
 
 
 @hydra.main(
@@ -81,7 +210,22 @@ def main(cfg: DictConfig) -> None:
     Args:
         cfg: Configuration composed by Hydra
     """
-    predict(cfg)
+    output_dir = Path(hydra.core.hydra_config.HydraConfig.get().runtime.output_dir)
+
+    profiler = Profiler()
+    if cfg.get("profiling"):
+        profiler = hydra.utils.instantiate(cfg.profiling)
+
+    # Split the cores between the inference workers and the threads within them
+    governor = contextlib.nullcontext()
+    if cfg.get("resources"):
+        governor = hydra.utils.instantiate(cfg.resources)
+
+    try:
+        with profiler, governor:
+            predict(cfg)
+    finally:
+        profiler.save(output_dir)
 
 
 if __name__ == "__main__":
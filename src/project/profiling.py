@@ -0,0 +1,306 @@
+import cProfile
+import contextlib
+import json
+import logging
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Iterator
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Profiler recording the stages of the running entry point, if any
+_active: "Profiler | None" = None
+
+
+def peak_rss_mb() -> float | None:
+    """
+    Peak resident set size of the process so far.
+
+    Returns:
+        float | None: Peak RSS in MB, or None where it cannot be measured.
+    """
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def rss_mb(pid: int | str = "self") -> float | None:
+    """
+    Current resident set size of a process.
+
+    Args:
+        pid (int | str, optional): Process ID. Defaults to "self" (this process).
+
+    Returns:
+        float | None: RSS in MB, or None where it cannot be measured (outside Linux).
+    """
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024**2
+
+
+def private_mb(pid: int | str = "self") -> float | None:
+    """
+    Current private (unshared) resident memory of a process.
+
+    Unlike the RSS, it excludes the pages shared with other processes, such as
+    those of memory-mapped files, so that it adds up across processes.
+
+    Args:
+        pid (int | str, optional): Process ID. Defaults to "self" (this process).
+
+    Returns:
+        float | None: Private memory in MB, or None where it cannot be measured
+            (outside Linux).
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            private_kb = sum(
+                int(line.split()[1]) for line in f if line.startswith("Private_")
+            )
+    except (OSError, IndexError, ValueError):
+        return None
+
+    return private_kb / 1024
+
+
+def workers_private_mb() -> float | None:
+    """
+    Total private resident memory of the descendants of this process, such as the
+    joblib worker processes.
+
+    Returns:
+        float | None: Private memory in MB, or None where it cannot be measured
+            (outside Linux).
+    """
+    if not os.path.isdir("/proc/self/task"):
+        return None
+
+    total = 0.0
+    pending = [str(os.getpid())]
+    while pending:
+        pid = pending.pop()
+        try:
+            tasks = os.listdir(f"/proc/{pid}/task")
+        except OSError:
+            continue
+        for task in tasks:
+            try:
+                with open(f"/proc/{pid}/task/{task}/children") as f:
+                    children = f.read().split()
+            except OSError:
+                continue
+            for child in children:
+                total += private_mb(child) or 0.0
+                pending.append(child)
+
+    return total
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Record a stage with the active profiler, if any.
+
+    Stages nest: a stage entered within another one is recorded as
+    "<outer>/<inner>". Without an active profiler, this does nothing.
+
+    Args:
+        name (str): Name of the stage.
+    """
+    if _active is None:
+        yield
+    else:
+        with _active.stage(name):
+            yield
+
+
+class Profiler:
+    """Record wall time, CPU time and peak memory of the named stages of a run.
+
+    Stages are recorded with `stage` while the profiler is active, i.e. within a
+    `with profiler:` block. CPU time covers every thread of the process but not
+    worker processes. Peak memory is the peak RSS of the process at the end of the
+    stage, and how much the stage raised it; with `trace_memory`, the peak of the
+    memory allocated by Python and numpy within the stage is traced as well.
+    """
+
+    def __init__(
+        self, cprofile: bool = False, trace_memory: bool = False, top: int = 30
+    ):
+        """
+        Initialize the profiler.
+
+        Args:
+            cprofile (bool, optional): Profile the top-level stages with cProfile and
+                save the statistics of the hottest one. Defaults to False.
+            trace_memory (bool, optional): Trace memory allocations with
+                tracemalloc, which slows the run down. Defaults to False.
+            top (int, optional): Number of functions listed in the cProfile
+                summary. Defaults to 30.
+        """
+        self.cprofile = cprofile
+        self.trace_memory = trace_memory
+        self.top = top
+
+        self.stages: dict[str, dict[str, Any]] = {}
+        self._stack: list[str] = []
+        self._traced_peaks: list[int] = []
+        self._profiles: dict[str, cProfile.Profile] = {}
+        self._start = time.perf_counter()
+        self.total_seconds: float | None = None
+
+    def __enter__(self) -> "Profiler":
+        global _active
+        self._previous = _active
+        _active = self
+
+        self._start = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        global _active
+        _active = self._previous
+
+        self.total_seconds = time.perf_counter() - self._start
+        if self.trace_memory:
+            tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Record a stage.
+
+        Args:
+            name (str): Name of the stage.
+        """
+        path = "/".join([*self._stack, name])
+        self._stack.append(name)
+
+        profile = None
+        if self.cprofile and len(self._stack) == 1:
+            profile = self._profiles.setdefault(path, cProfile.Profile())
+        if self.trace_memory:
+            # Carry the peak so far over to the enclosing stage before resetting it
+            if self._traced_peaks:
+                peak = tracemalloc.get_traced_memory()[1]
+                self._traced_peaks[-1] = max(self._traced_peaks[-1], peak)
+            tracemalloc.reset_peak()
+            self._traced_peaks.append(0)
+
+        rss_before = peak_rss_mb()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            rss_after = peak_rss_mb()
+            self._stack.pop()
+
+            record = self.stages.setdefault(
+                path, {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0}
+            )
+            record["calls"] += 1
+            record["wall_seconds"] += wall
+            record["cpu_seconds"] += cpu
+            if rss_after is not None:
+                record["peak_rss_mb"] = rss_after
+                record["rss_increase_mb"] = record.get("rss_increase_mb", 0.0) + (
+                    rss_after - rss_before
+                )
+
+            if self.trace_memory:
+                peak = max(self._traced_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                record["peak_traced_mb"] = max(
+                    record.get("peak_traced_mb", 0.0), peak / 1024**2
+                )
+                if self._traced_peaks:
+                    self._traced_peaks[-1] = max(self._traced_peaks[-1], peak)
+
+    def hottest_stage(self) -> str | None:
+        """
+        Top-level stage taking the most wall time.
+
+        Returns:
+            str | None: Name of the stage, or None if no stage was recorded.
+        """
+        top_level = {k: v for k, v in self.stages.items() if "/" not in k}
+        if not top_level:
+            return None
+
+        return max(top_level, key=lambda k: top_level[k]["wall_seconds"])
+
+    def save(self, output_dir: str | Path) -> Path:
+        """
+        Save the stage records to `profile.json`, along with the cProfile statistics
+        of the hottest stage (`profile.prof` and a text summary, `profile.txt`).
+
+        Args:
+            output_dir (str | Path): Directory to save the profile to.
+
+        Returns:
+            Path: Path of `profile.json`.
+        """
+        output_dir = Path(output_dir)
+        hottest = self.hottest_stage()
+
+        for path, record in self.stages.items():
+            logger.info(
+                f"Stage {path}: {record['wall_seconds']:.3f}s wall, "
+                f"{record['cpu_seconds']:.3f}s CPU"
+                + (
+                    f", peak RSS {record['peak_rss_mb']:.1f} MB"
+                    if "peak_rss_mb" in record
+                    else ""
+                )
+            )
+
+        cprofile_file = None
+        if hottest in self._profiles:
+            cprofile_file = output_dir / "profile.prof"
+            self._profiles[hottest].dump_stats(cprofile_file)
+            with open(output_dir / "profile.txt", "w") as f:
+                stats = pstats.Stats(str(cprofile_file), stream=f)
+                stats.sort_stats("cumulative").print_stats(self.top)
+            logger.info(f"Saved cProfile statistics of stage {hottest}")
+
+        profile_file = output_dir / "profile.json"
+        profile_file.write_text(
+            json.dumps(
+                {
+                    "total_seconds": self.total_seconds
+                    or time.perf_counter() - self._start,
+                    "hottest_stage": hottest,
+                    "cprofile": cprofile_file.name if cprofile_file else None,
+                    "stages": self.stages,
+                },
+                indent=2,
+            )
+        )
+        logger.info(f"Saved profile to {profile_file}")
+
+        return profile_file
@@ -0,0 +1,225 @@
+import contextlib
+import copy
+import logging
+from typing import Any, Iterator
+
+from joblib import cpu_count
+from sklearn.pipeline import Pipeline
+from threadpoolctl import threadpool_limits
+
+from project.models import THREADING, model_type_of
+
+logger = logging.getLogger(__name__)
+
+# Governor splitting the cores of the running entry point, if any
+_active: "ResourceGovernor | None" = None
+
+
+@contextlib.contextmanager
+def parallelism(
+    name: str,
+    models: Any,
+    n_tasks: int | None = None,
+    n_jobs: int | None = None,
+) -> Iterator[int | None]:
+    """
+    Split the cores of the active governor between the workers and threads of a stage.
+
+    Without an active governor, this does nothing and the number of workers is
+    left as configured.
+
+    Args:
+        name (str): Name of the stage, for the log.
+        models (Any): The model, or list of models, fitted or predicting in the
+            stage (pipelines, ensembles of pipelines or compiled models).
+        n_tasks (int | None, optional): Number of tasks the workers share (e.g.
+            fits or batches), or None if unknown. Defaults to None.
+        n_jobs (int | None, optional): Number of workers configured for the stage,
+            capping the governed one (joblib semantics). Defaults to None.
+
+    Yields:
+        int | None: Number of workers of the stage.
+    """
+    if _active is None:
+        yield n_jobs
+    else:
+        with _active.limit(name, models, n_tasks=n_tasks, n_jobs=n_jobs) as workers:
+            yield workers
+
+
+class ResourceGovernor:
+    """Split a budget of cores between workers and the threads within each of them.
+
+    Outer parallelism runs tasks such as cross-validation fits or prediction
+    batches in a pool of workers; inner parallelism runs threads within a task,
+    either in the estimator (the trees of a random forest, through its `n_jobs`),
+    in OpenMP or in BLAS (through threadpoolctl limits). Nesting both without a
+    budget starts workers times threads threads, which oversubscribes the cores.
+
+    Stages are governed with `parallelism` while the governor is active, i.e.
+    within a `with governor:` block. Every stage gets as many workers as it has
+    tasks, up to the budget, and model types running threads of their own (see
+    `THREADING`) get the rest of the budget as threads within each worker, while
+    the others run single-threaded. Worker processes started by joblib limit their
+    OpenMP and BLAS threads to the cores of the machine divided by their number.
+    """
+
+    def __init__(
+        self,
+        n_cores: int | None = None,
+        outer_jobs: int | None = None,
+        inner_threads: int | None = None,
+    ):
+        """
+        Initialize the governor.
+
+        Args:
+            n_cores (int | None, optional): Budget of cores. Defaults to None (the
+                cores available to the process).
+            outer_jobs (int | None, optional): Number of workers of every stage,
+                instead of choosing it from the tasks. Defaults to None.
+            inner_threads (int | None, optional): Number of threads within every
+                worker, instead of choosing it from the model type. Defaults to
+                None.
+        """
+        self.n_cores = n_cores or cpu_count()
+        self.outer_jobs = outer_jobs
+        self.inner_threads = inner_threads
+
+    def __enter__(self) -> "ResourceGovernor":
+        global _active
+        self._previous = _active
+        _active = self
+
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        global _active
+        _active = self._previous
+
+    def layout(
+        self,
+        model_types: set[str | None],
+        n_tasks: int | None = None,
+        n_jobs: int | None = None,
+    ) -> tuple[int, int]:
+        """
+        Split the budget of cores for a stage.
+
+        Args:
+            model_types (set[str | None]): Types of the models of the stage.
+            n_tasks (int | None, optional): Number of tasks of the stage, or None if
+                unknown. Defaults to None.
+            n_jobs (int | None, optional): Number of workers configured for the
+                stage, capping the governed one; negative values count from the
+                budget as in joblib (-1 is every core). Defaults to None.
+
+        Returns:
+            tuple[int, int]: Number of workers, and of threads within each of them.
+        """
+        workers = self.outer_jobs or min(n_tasks or self.n_cores, self.n_cores)
+        if n_jobs is not None:
+            workers = min(workers, n_jobs if n_jobs > 0 else self.n_cores + 1 + n_jobs)
+        workers = max(1, min(workers, self.n_cores))
+
+        threaded = any(THREADING.get(model_type) for model_type in model_types)
+        threads = self.inner_threads or (
+            max(1, self.n_cores // workers) if threaded else 1
+        )
+
+        return workers, threads
+
+    @contextlib.contextmanager
+    def limit(
+        self,
+        name: str,
+        models: Any,
+        n_tasks: int | None = None,
+        n_jobs: int | None = None,
+    ) -> Iterator[int]:
+        """
+        Govern a stage (see `parallelism`).
+
+        The threads of the estimators are set through their `n_jobs`, which clones
+        made within the stage keep, and restored when it ends. Models shared with
+        other callers (e.g. returned by `load_model`) have to be governed through a
+        `shallow_copy`. OpenMP and BLAS threads are limited in this process.
+
+        Args:
+            name (str): Name of the stage, for the log.
+            models (Any): The model, or list of models, of the stage.
+            n_tasks (int | None, optional): Number of tasks of the stage.
+                Defaults to None.
+            n_jobs (int | None, optional): Number of workers configured for the
+                stage. Defaults to None.
+
+        Yields:
+            int: Number of workers of the stage.
+        """
+        pipelines = _pipelines(models)
+        model_types = {model_type_of(pipeline) for pipeline in pipelines} or {None}
+        workers, threads = self.layout(model_types, n_tasks=n_tasks, n_jobs=n_jobs)
+
+        logger.info(
+            f"Parallelism of {name}: {workers} workers x {threads} threads "
+            f"on {self.n_cores} cores "
+            f"({', '.join(sorted(str(model_type) for model_type in model_types))}, "
+            f"{n_tasks if n_tasks is not None else 'unknown'} tasks)"
+        )
+
+        estimators = [
+            pipeline.steps[-1][1]
+            for pipeline in pipelines
+            if "n_jobs" in pipeline.steps[-1][1].get_params()
+        ]
+        previous = [estimator.n_jobs for estimator in estimators]
+        for estimator in estimators:
+            estimator.set_params(n_jobs=threads)
+        try:
+            with threadpool_limits(limits=threads):
+                yield workers
+        finally:
+            for estimator, n_jobs in zip(estimators, previous):
+                estimator.set_params(n_jobs=n_jobs)
+
+
+def shallow_copy(model: Any) -> Any:
+    """
+    Copy a model so that the threads of its estimators can be governed.
+
+    Pipelines, and the ensembles of pipelines, are copied along with their final
+    estimators, whose fitted attributes (e.g. the trees of a forest) are shared
+    with the original model rather than copied.
+
+    Args:
+        model (Any): The model (pipeline, ensemble of pipelines or compiled model).
+
+    Returns:
+        Any: The copy, or the model itself if it has no estimator to govern.
+    """
+    if hasattr(model, "estimators"):
+        ensemble = copy.copy(model)
+        ensemble.estimators = [
+            shallow_copy(estimator) for estimator in model.estimators
+        ]
+        return ensemble
+
+    if isinstance(model, Pipeline):
+        pipeline = copy.copy(model)
+        name, estimator = model.steps[-1]
+        pipeline.steps = [*model.steps[:-1], (name, copy.copy(estimator))]
+        return pipeline
+
+    return model
+
+
+def _pipelines(models: Any) -> list[Pipeline]:
+    pipelines = []
+    for model in models if isinstance(models, (list, tuple)) else [models]:
+        # Ensembles of fold pipelines
+        if hasattr(model, "estimators"):
+            pipelines.extend(_pipelines(model.estimators))
+        elif isinstance(model, Pipeline):
+            pipelines.append(model)
+
+    return pipelines
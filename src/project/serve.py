@@ -0,0 +1,377 @@
+import collections
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable
+
+import hydra
+import numpy as np
+import pandas as pd
+from omegaconf import DictConfig, OmegaConf
+from sklearn.pipeline import Pipeline
+
+from project.checkpoint import load_model
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+CONFIG_DIR = BASE_DIR / "configs"
+
+
+class LatencyStats:
+    """Thread-safe request latency and throughput statistics."""
+
+    def __init__(self, window: int = 10000):
+        """
+        Initialize the statistics.
+
+        Args:
+            window (int, optional): Number of most recent requests the latency
+                percentiles are computed over. Defaults to 10000.
+        """
+        self._latencies: collections.deque[float] = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+
+    def record_request(self, latency: float, rows: int) -> None:
+        """
+        Record a served request.
+
+        Args:
+            latency (float): Latency of the request in seconds.
+            rows (int): Number of rows predicted for the request.
+        """
+        with self._lock:
+            self._latencies.append(latency)
+            self.requests += 1
+            self.rows += rows
+
+    def record_batch(self) -> None:
+        """Record a call to the model."""
+        with self._lock:
+            self.batches += 1
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarize the statistics.
+
+        Returns:
+            dict[str, float]: Request count, latency percentiles in milliseconds,
+                throughput and mean micro-batch size.
+        """
+        with self._lock:
+            latencies = np.array(self._latencies)
+            elapsed = time.perf_counter() - self._start
+            p50, p99 = (
+                np.percentile(latencies, [50, 99]) * 1000
+                if len(latencies)
+                else (0.0, 0.0)
+            )
+            return {
+                "requests": self.requests,
+                "rows": self.rows,
+                "batches": self.batches,
+                "mean_batch_requests": self.requests / self.batches
+                if self.batches
+                else 0.0,
+                "p50_ms": float(p50),
+                "p99_ms": float(p99),
+                "requests_per_second": self.requests / elapsed,
+                "rows_per_second": self.rows / elapsed,
+            }
+
+
+class MicroBatcher:
+    """Coalesce concurrent prediction requests into micro-batches.
+
+    If predicting a batch fails, each of its requests is predicted alone, so that
+    only the requests that cannot be predicted fail.
+    """
+
+    def __init__(
+        self,
+        predict: Callable[[pd.DataFrame], np.ndarray],
+        max_batch_size: int = 256,
+        max_wait_ms: float = 5.0,
+        stats: LatencyStats | None = None,
+    ):
+        """
+        Initialize the micro-batcher and start its worker thread.
+
+        Args:
+            predict (Callable[[pd.DataFrame], np.ndarray]): Function making the
+                predictions of a batch.
+            max_batch_size (int, optional): Maximum number of rows per batch.
+                Defaults to 256.
+            max_wait_ms (float, optional): Maximum time in milliseconds the first
+                request of a batch waits for others to join it. Defaults to 5.0.
+            stats (LatencyStats | None, optional): Statistics to record batches in.
+                Defaults to None.
+        """
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = stats
+
+        self._queue: queue.Queue[tuple[pd.DataFrame, Future] | None] = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, X: pd.DataFrame) -> np.ndarray:
+        """
+        Predict the target of some rows, waiting for their batch to be processed.
+
+        Args:
+            X (pd.DataFrame): Features for each sample.
+
+        Returns:
+            np.ndarray: The predictions.
+        """
+        future: Future = Future()
+        self._queue.put((X, future))
+        return future.result()
+
+    def close(self) -> None:
+        """Process the pending requests and stop the worker thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            rows = len(item[0])
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                rows += len(item[0])
+
+            self._process(batch)
+
+    def _process(self, batch: list[tuple[pd.DataFrame, Future]]) -> None:
+        try:
+            y_pred = self.predict(pd.concat([X for X, _ in batch], ignore_index=True))
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # Predict each request alone, so that one bad request fails by itself
+            logger.warning(f"Batch of {len(batch)} requests failed, retrying each: {e}")
+            for item in batch:
+                self._process([item])
+            return
+
+        if self.stats is not None:
+            self.stats.record_batch()
+
+        offsets = np.cumsum([len(X) for X, _ in batch])[:-1]
+        for (_, future), y in zip(batch, np.split(y_pred, offsets)):
+            future.set_result(y)
+
+
+class PredictionServer:
+    """Long-lived HTTP server making predictions with a loaded pipeline.
+
+    `POST /predict` accepts a JSON body with either `instances` (a list of records) or
+    `columns` and `data` (a list of rows) and returns `{"predictions": [...]}`.
+    `GET /stats` returns latency and throughput statistics and `GET /health` returns
+    `{"status": "ok"}`.
+    """
+
+    def __init__(
+        self,
+        pipeline: Pipeline,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        max_batch_size: int = 256,
+        max_wait_ms: float = 5.0,
+    ):
+        """
+        Initialize the server and bind its socket.
+
+        Args:
+            pipeline (Pipeline): The trained pipeline.
+            host (str, optional): Address to listen on. Defaults to "127.0.0.1".
+            port (int, optional): Port to listen on (0 picks a free one).
+                Defaults to 8000.
+            max_batch_size (int, optional): Maximum number of rows per micro-batch.
+                Defaults to 256.
+            max_wait_ms (float, optional): Maximum time in milliseconds a request
+                waits for others to join its micro-batch. Defaults to 5.0.
+        """
+        self.pipeline = pipeline
+        self.features = getattr(pipeline, "feature_names_in_", None)
+        self.stats = LatencyStats()
+        self.batcher = MicroBatcher(
+            pipeline.predict,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            stats=self.stats,
+        )
+
+        self.httpd = ThreadingHTTPServer((host, port), _RequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.app = self  # type: ignore[attr-defined]
+
+    @property
+    def address(self) -> tuple[str, int]:
+        """Address and port the server listens on."""
+        host, port = self.httpd.server_address[:2]
+        return str(host), int(port)
+
+    def predict(self, payload: dict[str, Any]) -> list[float]:
+        """
+        Make predictions for a request payload.
+
+        Args:
+            payload (dict[str, Any]): The decoded JSON request body.
+
+        Returns:
+            list[float]: The predictions.
+
+        Raises:
+            ValueError: If the payload is malformed, lacks some features or holds
+                non-numeric values.
+        """
+        start = time.perf_counter()
+
+        if "instances" in payload:
+            X = pd.DataFrame.from_records(payload["instances"])
+        elif "data" in payload:
+            X = pd.DataFrame(payload["data"], columns=payload.get("columns"))
+        else:
+            raise ValueError("Expected either 'instances' or 'data' in the request")
+
+        if self.features is not None:
+            missing = [f for f in self.features if f not in X.columns]
+            if missing:
+                raise ValueError(f"Missing features: {', '.join(missing)}")
+            X = X[self.features]
+
+        # Convert the request before it joins a batch, so that it fails by itself
+        X = X.astype(np.float64)
+
+        y_pred = self.batcher.submit(X)
+        self.stats.record_request(time.perf_counter() - start, len(X))
+
+        return y_pred.tolist()
+
+    def serve_forever(self) -> None:
+        """Serve requests until `shutdown` is called."""
+        host, port = self.address
+        logger.info(f"Serving predictions on http://{host}:{port}")
+        self.httpd.serve_forever()
+
+    def shutdown(self) -> None:
+        """Stop serving requests and release the socket."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.batcher.close()
+        logger.info(f"Server statistics: {self.stats.summary()}")
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        app: PredictionServer = self.server.app  # type: ignore[attr-defined]
+
+        if self.path == "/health":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send(200, app.stats.summary())
+        else:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        app: PredictionServer = self.server.app  # type: ignore[attr-defined]
+
+        if self.path != "/predict":
+            self._send(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            self._send(200, {"predictions": app.predict(payload)})
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            logger.exception("Prediction failed")
+            self._send(500, {"error": str(e)})
+
+    def _send(self, status: int, body: dict[str, Any]) -> None:
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format, *args)
+
+
+def serve(cfg: DictConfig) -> None:
+    """
+    Serve predictions of a trained model over HTTP.
+
+    Args:
+        cfg: Configuration composed by Hydra
+    """
+    logger.info(f"Loaded configuration: \n{OmegaConf.to_yaml(cfg)}")
+
+    # Load the saved model
+    if not Path(cfg.checkpoint).is_file():
+        logger.error(f"Model file not found at {cfg.checkpoint}")
+        logger.info("Please run the training script first to generate a model.")
+        return
+
+    pipeline = load_model(cfg.checkpoint, mmap_mode=cfg.get("mmap_mode"))
+
+    # Instantiate prediction server
+    logger.info(f"Instantiating prediction server <{cfg.server._target_}>")
+    server: PredictionServer = hydra.utils.instantiate(cfg.server, pipeline=pipeline)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+    finally:
+        server.shutdown()
+
+
+@hydra.main(
+    version_base="1.3",
+    config_path=CONFIG_DIR.as_posix(),
+    config_name="serve.yaml",
+)
+def main(cfg: DictConfig) -> None:
+    """
+    Main entry point for serving.
+
+    Args:
+        cfg: Configuration composed by Hydra
+    """
+    serve(cfg)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,23 @@
+import contextlib
 import logging
 from pathlib import Path
 
 import hydra
-import joblib
 import pandas as pd
 from omegaconf import DictConfig, OmegaConf
 
+from project.checkpoint import load_model
 from project.data.module import DataModule
-from project.utils import evaluate_model, seed_everything
+from project.inference import InferenceEngine
+from project.profiling import Profiler, stage
+from project.resources import parallelism, shallow_copy
+from project.writers import open_writer
+from project.utils import (
+    bootstrap_metrics,
+    evaluate_model,
+    seed_everything,
+    top_predictions,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -35,7 +45,8 @@ def test(cfg: DictConfig) -> None:
     logger.info(f"Instantiating data module <{cfg.data._target_}>")
     data_module: DataModule = hydra.utils.instantiate(cfg.data)
 
-    ids_test, X_test, y_test = data_module.get_split(train=False)
+    with stage("get_split"):
+        ids_test, X_test, y_test = data_module.get_split(train=False)
 
     # Load the saved model
     if not Path(cfg.checkpoint).is_file():
@@ -43,39 +54,87 @@ def test(cfg: DictConfig) -> None:
         logger.info("Please run the training script first to generate a model.")
         return
 
-    logger.info(f"Loading model from {cfg.checkpoint}")
-    with open(cfg.checkpoint, "rb") as f:
-        pipeline = joblib.load(f)
+    with stage("load_model"):
+        # The loaded model is shared, its threads are governed on a copy
+        pipeline = shallow_copy(
+            load_model(cfg.checkpoint, mmap_mode=cfg.get("mmap_mode"))
+        )
+
+    # Instantiate inference engine
+    engine = InferenceEngine(mmap_mode=cfg.get("mmap_mode"))
+    if cfg.get("inference"):
+        logger.info(f"Instantiating inference engine <{cfg.inference._target_}>")
+        engine = hydra.utils.instantiate(cfg.inference, mmap_mode=cfg.get("mmap_mode"))
 
     # Make predictions on the test set
     logger.info("Making predictions on the test set")
-    y_pred = pipeline.predict(X_test)
+    with (
+        stage("predict"),
+        parallelism(
+            "predict",
+            pipeline,
+            n_tasks=engine.n_batches(len(X_test)),
+            n_jobs=engine.n_jobs,
+        ) as n_jobs,
+    ):
+        y_pred = engine.predict(
+            pipeline, X_test, checkpoint=cfg.checkpoint, n_jobs=n_jobs
+        )
 
     # Create predictions DataFrame
     predictions_df = pd.DataFrame({"id": ids_test, cfg.data.target_variable: y_pred})
 
     # Sort predictions by target variable (descending) as in the original notebook
-    predictions_df = predictions_df.sort_values(
-        cfg.data.target_variable, ascending=False
-    )
+    if cfg.get("sort_predictions"):
+        with stage("sort_predictions"):
+            predictions_df = predictions_df.sort_values(
+                cfg.data.target_variable, ascending=False
+            )
 
     # Save predictions if specified
     if cfg.get("predictions_file"):
         predictions_file = output_dir / cfg.get("predictions_file")
         logger.info(f"Saving predictions to {predictions_file}")
-        predictions_df.to_csv(predictions_file, index=False)
+        with stage("save_predictions"), open_writer(predictions_file) as writer:
+            writer.write(predictions_df)
 
     # Display top predictions
-    logger.info(f"Top 10 predictions:\n{predictions_df.head(10)}")
+    top_k = cfg.get("top_k", 10)
+    logger.info(
+        f"Top {top_k} predictions:\n"
+        f"{top_predictions(predictions_df, cfg.data.target_variable, top_k)}"
+    )
 
     # Instantiate metrics
     logger.info("Instantiating metrics")
 
     # Evaluate model on validation set
-    metrics = evaluate_model(cfg.get("metrics"), y_test, y_pred)
+    with stage("evaluate"):
+        metrics = evaluate_model(cfg.get("metrics"), y_test, y_pred)
+
+    # Estimate confidence intervals of the metrics
+    intervals = {}
+    if cfg.get("bootstrap"):
+        logger.info(f"Bootstrapping metrics over {cfg.bootstrap.n_resamples} resamples")
+        with stage("bootstrap"):
+            intervals = bootstrap_metrics(
+                cfg.get("metrics"),
+                y_test,
+                y_pred,
+                seed=cfg.get("seed"),
+                **cfg.bootstrap,
+            )
+
     logger.info("Test set metrics:")
     for metric, value in metrics.items():
-        logger.info(f"  {metric}: {value:.4f}")
+        if metric in intervals:
+            low, high = intervals[metric]
+            logger.info(
+                f"  {metric}: {value:.4f} "
+                f"({cfg.bootstrap.confidence:.0%} CI {low:.4f} - {high:.4f})"
+            )
+        else:
+            logger.info(f"  {metric}: {value:.4f}")
 
 
 @hydra.main(
@@ -90,7 +149,22 @@ def main(cfg: DictConfig) -> None:
     Args:
         cfg: Configuration composed by Hydra
     """
-    test(cfg)
+    output_dir = Path(hydra.core.hydra_config.HydraConfig.get().runtime.output_dir)
+
+    profiler = Profiler()
+    if cfg.get("profiling"):
+        profiler = hydra.utils.instantiate(cfg.profiling)
+
+    # Split the cores between the inference workers and the threads within them
+    governor = contextlib.nullcontext()
+    if cfg.get("resources"):
+        governor = hydra.utils.instantiate(cfg.resources)
+
+    try:
+        with profiler, governor:
+            test(cfg)
+    finally:
+        profiler.save(output_dir)
 
 
 if __name__ == "__main__":
@@ -1,20 +1,75 @@
+import contextlib
+import copy
 import logging
+import time
 from datetime import datetime
 from pathlib import Path
+from typing import Any, Iterator
 
 import hydra
-import joblib
+import numpy as np
 import pandas as pd
-from omegaconf import DictConfig, OmegaConf
+from joblib import Parallel, delayed
+from omegaconf import DictConfig, ListConfig, OmegaConf
+from sklearn.base import clone
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import check_cv
+from sklearn.pipeline import Pipeline
 
+from project.checkpoint import (
+    changed_rows,
+    load_lineage,
+    load_model,
+    save_lineage,
+    trained_rows,
+    save_model,
+)
+from project.compact import (
+    compact_model,
+    compaction_report,
+    has_out_of_bag_rows,
+    prune_forest,
+)
+from project.compiled import (
+    COMPILABLE_TYPES,
+    compile_pipeline,
+    compiled_path,
+    save_compiled,
+)
 from project.data.module import DataModule
-from project.utils import format_cv_results, save_results, seed_everything
+from project.models import (
+    FIT_COSTS,
+    WARM_START,
+    FoldEnsemble,
+    TransformerCache,
+    model_type_of,
+    warm_start,
+)
+from project.profiling import (
+    Profiler,
+    private_mb,
+    rss_mb,
+    stage,
+    workers_private_mb,
+)
+from project.resources import parallelism
+from project.utils import (
+    RunningRegressionMetrics,
+    format_cv_results,
+    format_search_results,
+    save_results,
+    seed_everything,
+)
 
 logger = logging.getLogger(__name__)
 
 BASE_DIR = Path(__file__).resolve().parents[2]
 CONFIG_DIR = BASE_DIR / "configs"
 
+# Default of OmegaConf.select telling missing keys from keys set to null
+_MISSING = object()
+
 
 def train(cfg: DictConfig) -> None:
     """
@@ -36,21 +91,170 @@ def train(cfg: DictConfig) -> None:
     logger.info(f"Instantiating data module <{cfg.data._target_}>")
     data_module: DataModule = hydra.utils.instantiate(cfg.data)
 
-    _, X, y = data_module.get_split(train=True)
+    # Continue training a previous checkpoint on the new or changed rows
+    if cfg.get("parent_checkpoint"):
+        parent = resolve_checkpoint(cfg.parent_checkpoint, cfg.get("checkpoint_dir"))
+        with stage("retrain"):
+            pipeline, metadata = retrain(cfg, parent, data_module, output_dir)
+        if pipeline is not None:
+            save_checkpoint(cfg, pipeline, data_module, parent=parent, **metadata)
+        return
+
+    # Compare several model configurations on a single load and split of the data
+    if cfg.get("models"):
+        pipeline = train_models(cfg, data_module, output_dir)
+        save_checkpoint(cfg, pipeline, data_module)
+        return
 
     # Create model pipeline
     logger.info(f"Creating model pipeline <{cfg.model._target_}>")
     pipeline = hydra.utils.instantiate(cfg.model)
 
+    # Train out-of-core instead of loading the whole dataset
+    if cfg.get("chunk_size"):
+        with stage("train_incremental"):
+            pipeline = train_incremental(cfg, pipeline, data_module, output_dir)
+        save_checkpoint(cfg, pipeline)
+        return
+
+    X, y = get_training_split(cfg, data_module)
+
+    transformer_cache = pipeline.memory
+    if isinstance(transformer_cache, TransformerCache):
+        cache_stats = transformer_cache.stats()
+
+    # Search hyperparameters instead of cross-validating a single configuration
+    if cfg.get("search"):
+        with stage("search"):
+            pipeline = search_hyperparameters(cfg, pipeline, X, y, output_dir)
+    else:
+        pipeline = cross_validate_and_fit(cfg, pipeline, X, y, output_dir)
+
+    log_memory("after training")
+
+    if isinstance(transformer_cache, TransformerCache):
+        stats = transformer_cache.stats()
+        logger.info(
+            f"Transformer cache: {stats['hits'] - cache_stats['hits']} hits, "
+            f"{stats['misses'] - cache_stats['misses']} misses"
+        )
+
+    save_checkpoint(cfg, pipeline, data_module)
+
+
+def get_training_split(
+    cfg: DictConfig, data_module: DataModule
+) -> tuple[pd.DataFrame, pd.Series]:
+    """
+    Get the training split, shared with worker processes if `cfg.share_data`.
+
+    Shared splits are backed by memory-mapped files, which joblib hands to workers
+    by reference, so that each task does not receive a copy of the data.
+
+    Args:
+        cfg: Configuration composed by Hydra
+        data_module: The data module providing the training split
+
+    Returns:
+        tuple[pd.DataFrame, pd.Series]: Features and target variable for each sample
+    """
+    with stage("get_split"):
+        _, X, y = data_module.get_split(train=True)
+    log_memory("after loading the training split")
+
+    if cfg.get("share_data"):
+        with stage("share_split"):
+            _, X, y = data_module.get_shared_split(train=True)
+        log_memory("after sharing the training split")
+
+    return X, y
+
+
+def log_memory(when: str) -> None:
+    """
+    Log the resident memory of this process and the private memory of its workers.
+
+    Args:
+        when (str): When the memory is measured, for the log message.
+    """
+    rss = rss_mb()
+    if rss is not None:
+        logger.info(
+            f"Resident memory {when}: {rss:.1f} MB ({private_mb():.1f} MB private), "
+            f"{workers_private_mb():.1f} MB private in workers"
+        )
+
+
+def cross_validate_and_fit(
+    cfg: DictConfig,
+    pipeline: Pipeline,
+    X: pd.DataFrame,
+    y: pd.Series,
+    output_dir: Path,
+) -> Pipeline | FoldEnsemble:
+    """
+    Cross-validate a pipeline and obtain the final model.
+
+    The final model depends on `cfg.final_model`: "refit" fits it on the whole
+    training split after cross-validation, "concurrent" fits it as an extra task of
+    the cross-validation worker pool and "ensemble" averages the fold estimators
+    instead of fitting another one.
+
+    Args:
+        cfg: Configuration composed by Hydra
+        pipeline: The pipeline to cross-validate
+        X: Features for each sample
+        y: Target variable for each sample
+        output_dir: Where to save the cross-validation results
+
+    Returns:
+        Pipeline | FoldEnsemble: The final model
+    """
+    final_model = cfg.get("final_model", "refit")
+    if final_model not in ("refit", "concurrent", "ensemble"):
+        raise ValueError(f"Invalid final model strategy: {final_model}")
+
     # Perform cross-validation
     if cfg.get("cross_validate"):
         logger.info("Performing k-fold cross-validation")
-        cv_results = hydra.utils.instantiate(
-            cfg.cross_validate,
-            estimator=pipeline,
-            X=X,
-            y=y,
-        )
+
+        # The full fit runs alongside the folds in the concurrent strategy
+        n_splits = check_cv(cfg.cross_validate.get("cv"), y).get_n_splits(X, y)
+        with (
+            stage("cross_validate"),
+            parallelism(
+                "cross_validate",
+                pipeline,
+                n_tasks=n_splits + (final_model == "concurrent"),
+                n_jobs=cfg.cross_validate.get("n_jobs"),
+            ) as n_jobs,
+        ):
+            if final_model == "concurrent":
+                # The full fit is scheduled first, as it is the longest task, and
+                # scored on the test indices of the first fold, as the score is
+                # discarded anyway
+                splits = list(check_cv(cfg.cross_validate.get("cv"), y).split(X, y))
+                cv = [(np.arange(len(X)), splits[0][1]), *splits]
+                cv_results = hydra.utils.instantiate(
+                    cfg.cross_validate,
+                    estimator=pipeline,
+                    X=X,
+                    y=y,
+                    cv=cv,
+                    return_estimator=True,
+                    n_jobs=n_jobs,
+                )
+                full_fit = cv_results["estimator"][0]
+                cv_results = {key: values[1:] for key, values in cv_results.items()}
+            else:
+                cv_results = hydra.utils.instantiate(
+                    cfg.cross_validate,
+                    estimator=pipeline,
+                    X=X,
+                    y=y,
+                    return_estimator=final_model == "ensemble",
+                    n_jobs=n_jobs,
+                )
 
     # Format and display cross-validation results
     formatted_results = format_cv_results(cv_results)
@@ -60,24 +264,587 @@ def train(cfg: DictConfig) -> None:
     # Save results
     save_results(results_df, output_dir / "cv_results.csv")
 
+    if final_model == "concurrent":
+        logger.info("Final model was trained on full dataset alongside the folds")
+        return full_fit
+
+    if final_model == "ensemble":
+        logger.info(f"Averaging the {len(cv_results['estimator'])} fold estimators")
+        return FoldEnsemble(list(cv_results["estimator"]))
+
     # Train final model on full dataset
     logger.info("Training final model on full dataset")
     pipeline = hydra.utils.instantiate(cfg.model)
-    pipeline.fit(X, y)
+    with stage("fit"), parallelism("fit", pipeline, n_tasks=1):
+        pipeline.fit(X, y)
+
+    return pipeline
+
+
+def train_models(
+    cfg: DictConfig,
+    data_module: DataModule,
+    output_dir: Path,
+) -> Pipeline | FoldEnsemble:
+    """
+    Cross-validate several model configurations and obtain the final model of the best.
+
+    The data is loaded and split once, and the folds of every model are fitted in a
+    single worker pool, so that the models do not compete for cores. Fits are
+    scheduled by decreasing estimated cost, the slowest models first, so that the
+    cheap ones fill in the gaps at the end. The combined leaderboard is saved to
+    `cv_results.csv` and the final model is obtained from the best model as
+    `cfg.final_model` describes (see `cross_validate_and_fit`).
+
+    Args:
+        cfg: Configuration composed by Hydra
+        data_module: The data module providing the training split
+        output_dir: Where to save the leaderboard
+
+    Returns:
+        Pipeline | FoldEnsemble: The final model of the best model configuration
+    """
+    final_model = cfg.get("final_model", "refit")
+    if final_model not in ("refit", "concurrent", "ensemble"):
+        raise ValueError(f"Invalid final model strategy: {final_model}")
+    if cfg.get("search"):
+        raise ValueError("Hyperparameter search does not support several models")
+
+    X, y = get_training_split(cfg, data_module)
+
+    # Compose the configuration of each model as if selected with model=<name>,
+    # along with the other overrides of the run (e.g. model.scale_features=false)
+    overrides = [
+        override
+        for override in hydra.core.hydra_config.HydraConfig.get().overrides.task
+        if override.lstrip("~+").split("=")[0] not in ("model", "models")
+    ]
+    model_cfgs = {name: _compose_model(name, overrides) for name in cfg.models}
+    pipelines = {name: hydra.utils.instantiate(c) for name, c in model_cfgs.items()}
+
+    cv_cfg = cfg.cross_validate
+    folds = list(check_cv(cv_cfg.get("cv"), y).split(X, y))
+    scoring = cv_cfg.get("scoring")
+    if isinstance(scoring, (ListConfig, DictConfig)):
+        scoring = OmegaConf.to_container(scoring)
+    scorer = check_scoring(next(iter(pipelines.values())), scoring=scoring)
+
+    tasks = [
+        (name, train_indices, test_indices)
+        for name in pipelines
+        for train_indices, test_indices in folds
+    ]
+    if final_model == "concurrent":
+        tasks += [(name, np.arange(len(X)), None) for name in pipelines]
+    tasks.sort(
+        key=lambda task: (
+            FIT_COSTS.get(model_cfgs[task[0]].model_type, 1.0) * len(task[1])
+        ),
+        reverse=True,
+    )
+
+    with (
+        stage("cross_validate"),
+        parallelism(
+            "cross_validate",
+            list(pipelines.values()),
+            n_tasks=len(tasks),
+            n_jobs=cv_cfg.get("n_jobs"),
+        ) as n_jobs,
+    ):
+        logger.info(
+            f"Cross-validating {len(pipelines)} models on {len(folds)} folds "
+            f"({len(tasks)} fits, n_jobs={n_jobs})"
+        )
+        fits = Parallel(n_jobs=n_jobs, pre_dispatch="all")(
+            delayed(_fit_and_score)(
+                clone(pipelines[name]),
+                X,
+                y,
+                train_indices,
+                test_indices,
+                scorer,
+                cv_cfg.get("return_train_score", False),
+            )
+            for name, train_indices, test_indices in tasks
+        )
+
+    log_memory("after training")
+
+    # Gather the results of each model, as cross_validate would return them
+    cv_results: dict[str, dict[str, list]] = {name: {} for name in pipelines}
+    full_fits = {}
+    for (name, _, test_indices), fit in zip(tasks, fits):
+        if test_indices is None:
+            full_fits[name] = fit["estimator"]
+            continue
+        for key, value in fit.items():
+            cv_results[name].setdefault(key, []).append(value)
+
+    # Rank the models by their mean test score on the first metric
+    primary = next(key for key in cv_results[tasks[0][0]] if key.startswith("test_"))
+    ranking = sorted(
+        cv_results, key=lambda name: np.mean(cv_results[name][primary]), reverse=True
+    )
+    leaderboard = pd.DataFrame.from_dict(
+        {
+            name: {
+                **format_cv_results(results),
+                "fit_time": np.mean(results["fit_time"]),
+            }
+            for name, results in cv_results.items()
+        },
+        orient="index",
+    ).loc[ranking]
+    leaderboard.insert(0, "rank", np.arange(1, len(leaderboard) + 1))
+    logger.info(f"Cross-validation leaderboard:\n{leaderboard}")
+
+    # Save results
+    save_results(leaderboard, output_dir / "cv_results.csv")
+
+    best = leaderboard.index[0]
+    logger.info(f"Best model: {best}")
+
+    if final_model == "concurrent":
+        logger.info("Final model was trained on full dataset alongside the folds")
+        return full_fits[best]
+
+    if final_model == "ensemble":
+        logger.info(f"Averaging the {len(folds)} fold estimators of {best}")
+        return FoldEnsemble(cv_results[best]["estimator"])
+
+    # Train final model on full dataset
+    logger.info("Training final model on full dataset")
+    pipeline = hydra.utils.instantiate(model_cfgs[best])
+    with stage("fit"), parallelism("fit", pipeline, n_tasks=1):
+        pipeline.fit(X, y)
+
+    return pipeline
+
+
+def _compose_model(name: str, overrides: list[str]) -> DictConfig:
+    """
+    Compose the configuration of a model with the overrides of the run.
+
+    Overrides of model parameters (`model.*`) only apply to the models they fit:
+    those setting or deleting a parameter to the models having it, and those adding
+    one (`+model.*`) to the models lacking it. The others are skipped for the model,
+    as composing it with them would fail.
+
+    Args:
+        name (str): Name of the model configuration.
+        overrides (list[str]): Overrides of the run, other than the model ones.
+
+    Returns:
+        DictConfig: The model configuration.
+    """
+    is_model = [o.lstrip("~+").startswith("model.") for o in overrides]
+    others = [o for o, model in zip(overrides, is_model) if not model]
+    model_cfg = hydra.compose(
+        config_name="train", overrides=[*others, f"model={name}"]
+    ).model
+
+    applicable, skipped = [], []
+    for override in (o for o, model in zip(overrides, is_model) if model):
+        key = override.lstrip("~+").split("=")[0].removeprefix("model.")
+        present = OmegaConf.select(model_cfg, key, default=_MISSING) is not _MISSING
+        if override.startswith("++"):
+            fits = True
+        elif override.startswith("+"):
+            fits = not present
+        else:
+            fits = present
+        (applicable if fits else skipped).append(override)
+
+    if skipped:
+        logger.info(f"Skipped overrides for model {name}: {', '.join(skipped)}")
+    if not applicable:
+        return model_cfg
 
-    # Save the trained model
+    return hydra.compose(
+        config_name="train", overrides=[*others, f"model={name}", *applicable]
+    ).model
+
+
+def _fit_and_score(
+    pipeline: Pipeline,
+    X: pd.DataFrame,
+    y: pd.Series,
+    train_indices: np.ndarray,
+    test_indices: np.ndarray | None,
+    scorer: Any,
+    return_train_score: bool,
+) -> dict[str, Any]:
+    # Fit on the training rows and score on the test rows, if any
+    X_train, y_train = X.iloc[train_indices], y.iloc[train_indices]
+
+    start = time.perf_counter()
+    pipeline.fit(X_train, y_train)
+    results: dict[str, Any] = {"fit_time": time.perf_counter() - start}
+
+    if test_indices is not None:
+        start = time.perf_counter()
+        scores = scorer(pipeline, X.iloc[test_indices], y.iloc[test_indices])
+        results["score_time"] = time.perf_counter() - start
+        if not isinstance(scores, dict):
+            scores = {"score": scores}
+        results.update({f"test_{k}": v for k, v in scores.items()})
+
+        if return_train_score:
+            scores = scorer(pipeline, X_train, y_train)
+            if not isinstance(scores, dict):
+                scores = {"score": scores}
+            results.update({f"train_{k}": v for k, v in scores.items()})
+
+    results["estimator"] = pipeline
+
+    return results
+
+
+def train_incremental(
+    cfg: DictConfig,
+    pipeline: Pipeline,
+    data_module: DataModule,
+    output_dir: Path,
+) -> Pipeline:
+    """
+    Train a pipeline by streaming chunks of the dataset through `partial_fit`.
+
+    Every step of the pipeline must support `partial_fit`. Each preprocessing step
+    is fitted in a pass of its own, before the estimator is trained for
+    `cfg.epochs` passes. Metrics are computed on rows held out by the data module,
+    which are streamed as well, so memory usage is bounded by the chunk size.
+
+    Args:
+        cfg: Configuration composed by Hydra
+        pipeline: The pipeline to train
+        data_module: The data module streaming the dataset
+        output_dir: Where to save the validation results
+
+    Returns:
+        Pipeline: The trained pipeline
+    """
+    unsupported = [
+        name for name, step in pipeline.steps if not hasattr(step, "partial_fit")
+    ]
+    if unsupported:
+        raise ValueError(
+            f"Steps {', '.join(unsupported)} of model type {cfg.model.model_type} "
+            "do not support incremental training"
+        )
+
+    rng = np.random.default_rng(cfg.get("seed"))
+
+    def chunks(train: bool) -> Iterator[tuple[pd.DataFrame, pd.Series]]:
+        for _, X, y in data_module.iter_train_data(cfg.chunk_size, train=train):
+            yield X, y
+
+    # Fit each preprocessing step on the output of the previous ones
+    for i, (name, step) in enumerate(pipeline.steps[:-1]):
+        logger.info(f"Fitting step <{name}> incrementally")
+        for X, y in chunks(train=True):
+            step.partial_fit(pipeline[:i].transform(X) if i else X, y)
+
+    name, estimator = pipeline.steps[-1]
+    preprocess = pipeline[:-1].transform if len(pipeline.steps) > 1 else None
+    for epoch in range(cfg.get("epochs", 1)):
+        logger.info(f"Training step <{name}> incrementally (epoch {epoch + 1})")
+        n_rows = 0
+        for X, y in chunks(train=True):
+            # Shuffle within the chunk, as stochastic optimizers expect
+            order = rng.permutation(len(X))
+            X, y = X.iloc[order], y.iloc[order]
+            estimator.partial_fit(preprocess(X) if preprocess else X, y)
+            n_rows += len(X)
+        logger.info(f"Trained on {n_rows} rows")
+
+    # Evaluate model on the held out rows
+    logger.info("Evaluating model on the held out rows")
+    metrics = RunningRegressionMetrics()
+    for X, y in chunks(train=False):
+        metrics.update(y, pipeline.predict(X))
+
+    results_df = pd.DataFrame(metrics.compute(), index=[cfg.model.model_type])
+    logger.info(f"Validation results:\n{results_df}")
+
+    # Save results
+    save_results(results_df, output_dir / "validation_results.csv")
+
+    return pipeline
+
+
+def search_hyperparameters(
+    cfg: DictConfig,
+    pipeline: Pipeline,
+    X: pd.DataFrame,
+    y: pd.Series,
+    output_dir: Path,
+) -> Pipeline:
+    """
+    Search the hyperparameters of a pipeline within a single process.
+
+    The data is loaded once and every candidate is evaluated on the same folds, in
+    parallel. The best candidate is refit on the whole training split.
+
+    Args:
+        cfg: Configuration composed by Hydra
+        pipeline: The pipeline whose hyperparameters are searched
+        X: Features for each sample
+        y: Target variable for each sample
+        output_dir: Where to save the search results
+
+    Returns:
+        Pipeline: The best pipeline, fitted on the whole training split
+    """
+    logger.info(f"Performing hyperparameter search <{cfg.search._target_}>")
+    with parallelism("search", pipeline, n_jobs=cfg.search.get("n_jobs")) as n_jobs:
+        search = hydra.utils.instantiate(cfg.search, estimator=pipeline, n_jobs=n_jobs)
+        search.fit(X, y)
+
+    # Format and display search results
+    results_df = format_search_results(search.cv_results_)
+    logger.info(f"Hyperparameter search results:\n{results_df.head(10)}")
+    logger.info(f"Best parameters: {search.best_params_}")
+
+    # Save results
+    save_results(results_df, output_dir / "search_results.csv")
+
+    return search.best_estimator_
+
+
+def resolve_checkpoint(checkpoint: str, checkpoint_dir: str | None) -> Path:
+    """
+    Resolve a checkpoint path, where "latest" is the newest checkpoint saved.
+
+    Args:
+        checkpoint: Path of the checkpoint, or "latest"
+        checkpoint_dir: Directory of the saved checkpoints
+
+    Returns:
+        Path: The path of the checkpoint
+
+    Raises:
+        FileNotFoundError: If the checkpoint does not exist
+    """
+    if checkpoint == "latest":
+        # Timestamped names sort chronologically
+        checkpoints = sorted(Path(checkpoint_dir or ".").glob("model-*.joblib"))
+        if not checkpoints:
+            raise FileNotFoundError(f"No checkpoint found in {checkpoint_dir}")
+        return checkpoints[-1]
+
+    if not Path(checkpoint).is_file():
+        raise FileNotFoundError(f"Checkpoint not found at {checkpoint}")
+
+    return Path(checkpoint)
+
+
+def retrain(
+    cfg: DictConfig,
+    parent: Path,
+    data_module: DataModule,
+    output_dir: Path,
+) -> tuple[Pipeline | None, dict[str, Any]]:
+    """
+    Continue training a checkpoint on the rows added or changed since.
+
+    Rows are matched by id against the hashes recorded in the lineage of the parent
+    checkpoint (see `save_lineage`), held out rows included; without a lineage,
+    every row counts as new. A random forest grows `cfg.retrain_estimators` more
+    trees on the training rows the parent was not trained on or that changed since,
+    an SGD model runs `cfg.epochs` more passes over them, and a lasso model is refit
+    on the whole training split starting from its previous coefficients. The parent
+    and the retrained model are evaluated on the held out rows the parent was not
+    trained on.
+
+    Args:
+        cfg: Configuration composed by Hydra
+        parent: Path of the checkpoint to continue training
+        data_module: The data module providing the training split
+        output_dir: Where to save the validation results
+
+    Returns:
+        tuple[Pipeline | None, dict[str, Any]]: The retrained pipeline, or None if
+            the training split did not change, and the lineage metadata to record
+
+    Raises:
+        ValueError: If the checkpoint cannot be warm-started on the training split
+    """
+    logger.info(f"Retraining checkpoint {parent}")
+    # The loaded model is shared with other callers, so it is updated on a copy
+    pipeline = copy.deepcopy(load_model(parent, mmap_mode=None))
+
+    model_type = model_type_of(pipeline) if isinstance(pipeline, Pipeline) else None
+    if model_type not in WARM_START:
+        raise ValueError(f"Model type {model_type} does not support retraining")
+
+    X, y = get_training_split(cfg, data_module)
+    if list(getattr(pipeline, "feature_names_in_", X.columns)) != list(X.columns):
+        raise ValueError(f"Features differ from those {parent} was trained on")
+
+    lineage = load_lineage(parent)
+    if lineage is None:
+        logger.warning(f"No lineage recorded for {parent}, every row counts as new")
+        lineage = {
+            "ids": np.empty(0, dtype=np.uint64),
+            "row_hashes": np.empty(0, dtype=np.uint64),
+            "held_out": np.empty(0, dtype=bool),
+        }
+    ids, row_hashes = data_module.row_hashes(train=True)
+    test_ids, test_hashes = data_module.row_hashes(train=False)
+    new, changed = changed_rows(
+        lineage,
+        np.concatenate([ids, test_ids]),
+        np.concatenate([row_hashes, test_hashes]),
+    )
+    logger.info(f"{new.sum()} new and {changed.sum()} changed rows since {parent}")
+
+    if not (new | changed).any():
+        logger.info("Training data unchanged since the parent checkpoint")
+        return None, {}
+
+    if WARM_START[model_type] == "delta":
+        rows = np.flatnonzero(~trained_rows(lineage, ids) | changed[: len(ids)])
+        if not len(rows):
+            logger.info("Training split unchanged since the parent checkpoint")
+            return None, {}
+        X, y = X.iloc[rows], y.iloc[rows]
+    logger.info(f"Warm-starting {model_type} model on {len(X)} rows")
+    with stage("warm_start"), parallelism("warm_start", pipeline, n_tasks=1):
+        warm_start(
+            pipeline,
+            X,
+            y,
+            n_estimators=cfg.get("retrain_estimators", 50),
+            epochs=cfg.get("epochs", 1),
+            seed=cfg.get("seed"),
+        )
+
+    # Evaluate both models on the held out rows, unless the parent was trained on them
+    _, X_test, y_test = data_module.get_split(train=False)
+    unseen = ~trained_rows(lineage, test_ids)
+    if not unseen.all():
+        logger.warning(
+            f"Evaluating on {unseen.sum()} of {len(unseen)} held out rows, "
+            f"{parent} was trained on the others"
+        )
+        X_test, y_test = X_test[unseen], y_test[unseen]
+    results = {}
+    for name, model in (("parent", load_model(parent)), (model_type, pipeline)):
+        metrics = RunningRegressionMetrics()
+        metrics.update(y_test, model.predict(X_test))
+        results[name] = metrics.compute()
+
+    results_df = pd.DataFrame.from_dict(results, orient="index")
+    logger.info(f"Validation results:\n{results_df}")
+
+    # Save results
+    save_results(results_df, output_dir / "validation_results.csv")
+
+    return pipeline, {
+        "model_type": model_type,
+        "new_rows": int(new.sum()),
+        "changed_rows": int(changed.sum()),
+    }
+
+
+def save_checkpoint(
+    cfg: DictConfig,
+    pipeline: Pipeline | FoldEnsemble,
+    data_module: DataModule | None = None,
+    parent: Path | None = None,
+    **metadata: Any,
+) -> None:
+    """
+    Save the trained model to a timestamped checkpoint, if configured.
+
+    Given the data module, the lineage of the checkpoint (its parent and the
+    fingerprint of its training and held out rows) is recorded next to it, so that
+    it can be retrained on the rows added or changed since. With
+    `cfg.compact_checkpoint`, random forests are saved compactly (see
+    `compact_model`) and the size, load time and accuracy of the checkpoint are
+    compared to those of the original model. Random forests trained from scratch
+    with bootstrap are first pruned within `cfg.prune_loss_budget` of out-of-bag
+    loss on the training split (see `prune_forest`), and both are compared on those
+    rows, which leaves the held out rows to test.py. With `cfg.compile_model`, the
+    compiled model is saved next to it as well (see `compile_pipeline`).
+
+    Args:
+        cfg: Configuration composed by Hydra
+        pipeline: The trained pipeline
+        data_module: The data module providing the training split, if any
+        parent: The checkpoint the model was retrained from, if any
+        **metadata: Additional metadata recorded in the lineage
+    """
     if cfg.get("checkpoint_dir"):
         logger.info("Saving trained model")
 
+        # The transformer cache is only needed while fitting, and the threads chosen
+        # by the resource governor are chosen again wherever the checkpoint is used
+        for estimator in getattr(pipeline, "estimators", [pipeline]):
+            estimator.set_params(memory=None)
+            model = estimator.steps[-1][1]
+            if cfg.get("resources") and "n_jobs" in model.get_params():
+                model.set_params(n_jobs=None)
+
         now = datetime.now()
         date_str = now.strftime("%Y-%m-%d")
         time_str = now.strftime("%H-%M-%S")
         filename = f"model-{date_str}_{time_str}.joblib"
 
-        model_path = Path(cfg.checkpoint_dir) / filename
-        with open(model_path, "wb") as f:
-            joblib.dump(pipeline, f)
-        logger.info(f"Model saved to {model_path}")
+        original, compact = pipeline, cfg.get("compact_checkpoint")
+        # Retrained forests hold trees fitted on other rows than the training split
+        X_train = y_train = None
+        oob = bool(compact) and data_module is not None and parent is None
+        if oob and has_out_of_bag_rows(pipeline):
+            _, X_train, y_train = data_module.get_split(train=True)
+            if cfg.get("prune_loss_budget"):
+                with stage("prune_forest"):
+                    pipeline = prune_forest(
+                        pipeline, X_train, y_train, cfg.prune_loss_budget, oob=True
+                    )
+        elif compact and cfg.get("prune_loss_budget"):
+            logger.warning(
+                "Only random forests trained from scratch with bootstrap can be "
+                "pruned, skipping"
+            )
+
+        with stage("save_checkpoint"):
+            path = save_model(
+                compact_model(pipeline) if compact else pipeline,
+                Path(cfg.checkpoint_dir) / filename,
+            )
+            if compact:
+                with stage("compaction_report"):
+                    report = compaction_report(
+                        original, pipeline, path, X_train, y_train, oob=True
+                    )
+                logger.info(
+                    f"Compaction:\n{pd.DataFrame.from_dict(report, orient='index')}"
+                )
+                metadata["compaction"] = report
+            if data_module is not None:
+                ids, row_hashes = data_module.row_hashes(train=True)
+                test_ids, test_hashes = data_module.row_hashes(train=False)
+                save_lineage(
+                    path,
+                    np.concatenate([ids, test_ids]),
+                    np.concatenate([row_hashes, test_hashes]),
+                    parent=parent,
+                    held_out=np.arange(len(ids) + len(test_ids)) >= len(ids),
+                    **metadata,
+                )
+
+        # Export the array-backed model that predict.py loads with compiled=true
+        if cfg.get("compile_model"):
+            model_type = (
+                model_type_of(pipeline) if isinstance(pipeline, Pipeline) else None
+            )
+            if model_type in COMPILABLE_TYPES:
+                with stage("compile_model"):
+                    save_compiled(compile_pipeline(pipeline), compiled_path(path))
+            else:
+                logger.info(f"Model type {model_type} cannot be compiled, skipping")
 
 
 @hydra.main(
@@ -92,7 +859,22 @@ def main(cfg: DictConfig) -> None:
     Args:
         cfg: Configuration composed by Hydra
     """
-    train(cfg)
+    output_dir = Path(hydra.core.hydra_config.HydraConfig.get().runtime.output_dir)
+
+    profiler = Profiler()
+    if cfg.get("profiling"):
+        profiler = hydra.utils.instantiate(cfg.profiling)
+
+    # Split the cores between the workers and the threads within them
+    governor = contextlib.nullcontext()
+    if cfg.get("resources"):
+        governor = hydra.utils.instantiate(cfg.resources)
+
+    try:
+        with profiler, governor:
+            train(cfg)
+    finally:
+        profiler.save(output_dir)
 
 
 if __name__ == "__main__":
@@ -1,12 +1,19 @@
+from __future__ import annotations
+
+import heapq
+import itertools
 import logging
 import os
 import random
-from typing import Dict, Union
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Union
 from pathlib import Path
 import numpy as np
-from omegaconf import DictConfig
-import pandas as pd
-import hydra
+
+# Hydra and pandas are imported where needed, as importing them dominates the
+# startup time of short jobs using only the lighter helpers
+if TYPE_CHECKING:
+    import pandas as pd
+    from omegaconf import DictConfig
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +30,21 @@ def seed_everything(seed: int) -> None:
     os.environ["PYTHONHASHSEED"] = str(seed)
 
 
+# Metrics of sklearn.metrics computed from shared intermediates by `_compute_metrics`
+VECTORIZED_METRICS = frozenset(
+    {
+        "mean_absolute_error",
+        "mean_absolute_percentage_error",
+        "mean_squared_error",
+        "root_mean_squared_error",
+        "median_absolute_error",
+        "max_error",
+        "r2_score",
+        "explained_variance_score",
+    }
+)
+
+
 def evaluate_model(
     cfg: DictConfig,
     y_true: Union[np.ndarray, pd.Series],
@@ -31,6 +53,10 @@ def evaluate_model(
     """
     Evaluate model predictions using multiple metrics.
 
+    The inputs are converted to float arrays once, and the regression metrics of
+    `VECTORIZED_METRICS` are computed together from shared residuals. Other metrics
+    are instantiated with Hydra and called as usual.
+
     Args:
         cfg (DictConfig): A dictionary with metric names as keys and their parameters as values
         y_true (Union[np.ndarray, pd.Series]): True target values, either as a numpy array or pandas Series
@@ -39,11 +65,197 @@ def evaluate_model(
     Returns:
         Dict[str, float]: A dictionary with metric names as keys and their computed values as values
     """
-    metrics = {}
+    vectorized, others = _resolve_metrics(cfg)
+    y_true = np.ascontiguousarray(y_true, dtype=np.float64)
+    y_pred = np.ascontiguousarray(y_pred, dtype=np.float64)
+
+    metrics = {
+        name: float(value)
+        for name, value in _compute_metrics(vectorized, y_true, y_pred).items()
+    }
+    for name, metric in others.items():
+        metrics[name] = metric(y_true, y_pred)
+
+    return {name: metrics[name] for name in cfg}
+
+
+def bootstrap_metrics(
+    cfg: DictConfig,
+    y_true: Union[np.ndarray, pd.Series],
+    y_pred: Union[np.ndarray, pd.Series],
+    n_resamples: int = 1000,
+    confidence: float = 0.95,
+    seed: int | None = None,
+    max_block_size: int = 2**22,
+) -> Dict[str, tuple[float, float]]:
+    """
+    Estimate confidence intervals of the metrics by bootstrapping the predictions.
+
+    Resamples are drawn as rows of an index matrix and every metric of
+    `VECTORIZED_METRICS` is computed over all of them at once, in blocks of at most
+    `max_block_size` resampled values to bound memory.
+
+    Args:
+        cfg (DictConfig): A dictionary with metric names as keys and their parameters as values
+        y_true (Union[np.ndarray, pd.Series]): True target values
+        y_pred (Union[np.ndarray, pd.Series]): Predicted target values
+        n_resamples (int, optional): Number of bootstrap resamples. Defaults to 1000.
+        confidence (float, optional): Confidence level of the intervals. Defaults to 0.95.
+        seed (int | None, optional): Seed of the resampling. Defaults to None.
+        max_block_size (int, optional): Maximum number of resampled values held in
+            memory at once. Defaults to 2**22.
+
+    Returns:
+        Dict[str, tuple[float, float]]: A dictionary with metric names as keys and
+            the lower and upper bounds of their confidence intervals as values
+    """
+    vectorized, others = _resolve_metrics(cfg)
+    y_true = np.ascontiguousarray(y_true, dtype=np.float64)
+    y_pred = np.ascontiguousarray(y_pred, dtype=np.float64)
+    n = len(y_true)
+
+    rng = np.random.default_rng(seed)
+    samples: Dict[str, list[np.ndarray]] = {name: [] for name in cfg}
+    block_size = max(1, max_block_size // n)
+    for start in range(0, n_resamples, block_size):
+        indices = rng.integers(0, n, size=(min(block_size, n_resamples - start), n))
+        true, pred = y_true[indices], y_pred[indices]
+
+        for name, values in _compute_metrics(vectorized, true, pred).items():
+            samples[name].append(values)
+        for name, metric in others.items():
+            samples[name].append(np.array([metric(t, p) for t, p in zip(true, pred)]))
+
+    alpha = (1 - confidence) / 2
+    intervals = {}
+    for name, blocks in samples.items():
+        low, high = np.quantile(np.concatenate(blocks), [alpha, 1 - alpha])
+        intervals[name] = (float(low), float(high))
+
+    return intervals
+
+
+def _resolve_metrics(
+    cfg: DictConfig,
+) -> tuple[Dict[str, str], Dict[str, Any]]:
+    import hydra
+
+    # Split the metrics into vectorized ones and Hydra partials of the others
+    vectorized, others = {}, {}
     for name, params in cfg.items():
-        metrics[name] = hydra.utils.instantiate(params, y_true, y_pred)
+        module, _, function = params._target_.rpartition(".")
+        options = {k: v for k, v in params.items() if k != "_target_"}
+        if (
+            module == "sklearn.metrics"
+            and function in VECTORIZED_METRICS
+            and set(options) <= {"multioutput"}
+            and options.get("multioutput", "uniform_average") == "uniform_average"
+        ):
+            vectorized[name] = function
+        else:
+            others[name] = hydra.utils.instantiate(params, _partial_=True)
+
+    return vectorized, others
+
+
+def _compute_metrics(
+    metrics: Dict[str, str], y_true: np.ndarray, y_pred: np.ndarray
+) -> Dict[str, np.ndarray]:
+    # Compute the metrics along the last axis, sharing intermediates between them
+    errors = y_true - y_pred
+    absolute_errors = np.abs(errors)
+    sum_squared_errors = np.einsum("...i,...i->...", errors, errors)
+    n = y_true.shape[-1]
+
+    def _total_sum_of_squares(values: np.ndarray) -> np.ndarray:
+        centered = values - values.mean(axis=-1, keepdims=True)
+        return np.einsum("...i,...i->...", centered, centered)
+
+    def _score(residual: np.ndarray, total: np.ndarray) -> np.ndarray:
+        # As scikit-learn, a constant target scores 1 if perfectly predicted, else 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            score = 1 - residual / total
+        return np.where(total == 0, np.where(residual == 0, 1.0, 0.0), score)
+
+    results = {}
+    for name, function in metrics.items():
+        if function == "mean_absolute_error":
+            results[name] = absolute_errors.mean(axis=-1)
+        elif function == "mean_absolute_percentage_error":
+            results[name] = (
+                absolute_errors / np.maximum(np.abs(y_true), np.finfo(np.float64).eps)
+            ).mean(axis=-1)
+        elif function == "mean_squared_error":
+            results[name] = sum_squared_errors / n
+        elif function == "root_mean_squared_error":
+            results[name] = np.sqrt(sum_squared_errors / n)
+        elif function == "median_absolute_error":
+            results[name] = np.median(absolute_errors, axis=-1)
+        elif function == "max_error":
+            results[name] = absolute_errors.max(axis=-1)
+        elif function == "r2_score":
+            results[name] = _score(sum_squared_errors, _total_sum_of_squares(y_true))
+        elif function == "explained_variance_score":
+            results[name] = _score(
+                _total_sum_of_squares(errors), _total_sum_of_squares(y_true)
+            )
+
+    return results
+
+
+class RunningRegressionMetrics:
+    """Regression metrics accumulated over batches of predictions in constant memory."""
+
+    def __init__(self) -> None:
+        """Initialize the accumulators."""
+        self.n = 0
+        self.sum_absolute_error = 0.0
+        self.sum_absolute_percentage_error = 0.0
+        self.sum_squared_error = 0.0
+        self.sum_true = 0.0
+        self.sum_squared_true = 0.0
 
-    return metrics
+    def update(
+        self,
+        y_true: Union[np.ndarray, pd.Series],
+        y_pred: Union[np.ndarray, pd.Series],
+    ) -> None:
+        """
+        Accumulate a batch of predictions.
+
+        Args:
+            y_true (Union[np.ndarray, pd.Series]): True target values of the batch
+            y_pred (Union[np.ndarray, pd.Series]): Predicted target values of the batch
+        """
+        y_true = np.asarray(y_true, dtype=np.float64)
+        errors = y_true - np.asarray(y_pred, dtype=np.float64)
+        absolute_errors = np.abs(errors)
+
+        self.n += len(y_true)
+        self.sum_absolute_error += absolute_errors.sum()
+        self.sum_absolute_percentage_error += (
+            absolute_errors / np.maximum(np.abs(y_true), np.finfo(np.float64).eps)
+        ).sum()
+        self.sum_squared_error += np.dot(errors, errors)
+        self.sum_true += y_true.sum()
+        self.sum_squared_true += np.dot(y_true, y_true)
+
+    def compute(self) -> Dict[str, float]:
+        """
+        Compute the metrics over every batch seen so far.
+
+        Returns:
+            Dict[str, float]: A dictionary with metric names as keys and their computed values as values
+        """
+        total_sum_of_squares = self.sum_squared_true - self.sum_true**2 / self.n
+
+        return {
+            "mean_absolute_error": self.sum_absolute_error / self.n,
+            "mean_absolute_percentage_error": self.sum_absolute_percentage_error
+            / self.n,
+            "root_mean_squared_error": np.sqrt(self.sum_squared_error / self.n),
+            "r2_score": 1 - self.sum_squared_error / total_sum_of_squares,
+        }
 
 
 def format_cv_results(cv_results: Dict[str, np.ndarray]) -> Dict[str, str]:
@@ -71,6 +283,47 @@ def format_cv_results(cv_results: Dict[str, np.ndarray]) -> Dict[str, str]:
     return results
 
 
+def format_search_results(cv_results: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """
+    Format hyperparameter search results for display, best candidate first.
+
+    Args:
+        cv_results (Dict[str, np.ndarray]): The `cv_results_` of a fitted search
+
+    Returns:
+        pd.DataFrame: One row per candidate (and iteration, for successive halving)
+    """
+    import pandas as pd
+
+    results = pd.DataFrame(
+        {
+            "params": [str(params) for params in cv_results["params"]],
+            "rank": cv_results["rank_test_score"],
+        }
+    )
+
+    # Successive halving evaluates candidates over several iterations
+    for key in ("iter", "n_resources"):
+        if key in cv_results:
+            results[key] = cv_results[key]
+
+    for split in ("test", "train"):
+        if f"mean_{split}_score" in cv_results:
+            results[f"{split}_score"] = [
+                f"{mean:.3f} ± {std:.3f}"
+                for mean, std in zip(
+                    cv_results[f"mean_{split}_score"], cv_results[f"std_{split}_score"]
+                )
+            ]
+
+    results["fit_time"] = cv_results["mean_fit_time"]
+
+    return results.sort_values(
+        ["rank", *(["iter"] if "iter" in results else [])],
+        ascending=[True, *([False] if "iter" in results else [])],
+    )
+
+
 def save_results(results: pd.DataFrame, filename: Path) -> None:
     """
     Save results to a CSV file.
@@ -84,3 +337,81 @@ def save_results(results: pd.DataFrame, filename: Path) -> None:
     """
     results.to_csv(filename, index=True)
     logger.info(f"Results saved to {filename}")
+
+
+def top_predictions(predictions: pd.DataFrame, target: str, k: int) -> pd.DataFrame:
+    """
+    Select the k rows with the largest predictions, largest first.
+
+    Selects them in linear time, instead of sorting every prediction.
+
+    Args:
+        predictions (pd.DataFrame): The predictions
+        target (str): Column of the predicted values
+        k (int): Number of rows to select
+
+    Returns:
+        pd.DataFrame: The selected rows, sorted by prediction (descending)
+    """
+    if k <= 0:
+        return predictions.iloc[:0]
+
+    values = predictions[target].to_numpy()
+    if len(values) > k:
+        predictions = predictions.iloc[np.argpartition(values, -k)[-k:]]
+
+    return predictions.sort_values(target, ascending=False)
+
+
+class TopK:
+    """Bounded min-heap keeping the k items with the largest values seen so far."""
+
+    def __init__(self, k: int):
+        """
+        Initialize the heap.
+
+        Args:
+            k (int): Number of items to keep.
+        """
+        self.k = k
+        self._heap: list[tuple[float, int, Any]] = []
+        self._counter = itertools.count()
+
+    def update(self, items: Iterable[Any], values: np.ndarray) -> None:
+        """
+        Offer a batch of items to the heap.
+
+        Args:
+            items (Iterable[Any]): Items of the batch (e.g. sample ids).
+            values (np.ndarray): Values the items are ranked by.
+        """
+        if self.k <= 0:
+            return
+
+        values = np.asarray(values)
+        if not hasattr(items, "__len__"):
+            items = list(items)
+
+        # Only the k largest values of the batch can make it into the heap
+        if len(values) > self.k:
+            candidates = np.argpartition(values, -self.k)[-self.k :]
+            items, values = (
+                np.asarray(items, dtype=object)[candidates],
+                values[candidates],
+            )
+
+        for item, value in zip(items, values):
+            entry = (float(value), next(self._counter), item)
+            if len(self._heap) < self.k:
+                heapq.heappush(self._heap, entry)
+            elif entry > self._heap[0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def items(self) -> list[tuple[Any, float]]:
+        """
+        Get the kept items, largest value first.
+
+        Returns:
+            list[tuple[Any, float]]: Pairs of item and value.
+        """
+        return [(item, value) for value, _, item in sorted(self._heap, reverse=True)]
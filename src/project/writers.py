@@ -0,0 +1,212 @@
+import abc
+import bz2
+import gzip
+import io
+import logging
+import lzma
+from pathlib import Path
+from typing import IO, Any
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionWriter(abc.ABC):
+    """Write predictions to a file chunk by chunk, without holding all of them."""
+
+    def __init__(self, path: str | Path):
+        """
+        Initialize the writer. The file is created on the first write.
+
+        Args:
+            path (str | Path): Path of the file.
+        """
+        self.path = Path(path)
+        self.rows = 0
+
+    def write(self, df: pd.DataFrame) -> None:
+        """
+        Append a chunk of predictions to the file.
+
+        Args:
+            df (pd.DataFrame): The chunk of predictions.
+        """
+        self._write(df)
+        self.rows += len(df)
+
+    def close(self) -> None:
+        """Flush and close the file."""
+        logger.info(f"Wrote {self.rows} predictions to {self.path}")
+
+    def __enter__(self) -> "PredictionWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @abc.abstractmethod
+    def _write(self, df: pd.DataFrame) -> None:
+        """Append a chunk of predictions to the file, in the writer's format."""
+
+
+class CSVWriter(PredictionWriter):
+    """Write predictions as CSV, compressed according to the file suffix.
+
+    Supported suffixes are ".gz", ".bz2", ".xz" and ".zst" (which requires the
+    `zstandard` package); any other suffix is written uncompressed.
+    """
+
+    def __init__(self, path: str | Path, compression_level: int | None = None):
+        """
+        Initialize the writer.
+
+        Args:
+            path (str | Path): Path of the file.
+            compression_level (int | None, optional): Compression level, or None for
+                a balanced default (6 for gzip and xz, 9 for bz2 and 3 for zstd).
+                Defaults to None.
+        """
+        super().__init__(path)
+        self.compression_level = compression_level
+        self._file: IO[str] | None = None
+
+    def _write(self, df: pd.DataFrame) -> None:
+        if self._file is None:
+            self._file = self._open()
+        df.to_csv(self._file, header=self.rows == 0, index=False)
+
+    def _open(self) -> IO[str]:
+        level = self.compression_level
+        suffix = self.path.suffix
+
+        if suffix == ".gz":
+            return gzip.open(
+                self.path, "wt", newline="", compresslevel=6 if level is None else level
+            )
+        if suffix == ".bz2":
+            return bz2.open(
+                self.path, "wt", newline="", compresslevel=9 if level is None else level
+            )
+        if suffix == ".xz":
+            return lzma.open(self.path, "wt", newline="", preset=level)
+        if suffix == ".zst":
+            try:
+                import zstandard
+            except ImportError as e:
+                raise ImportError(
+                    "Writing .zst files requires the zstandard package"
+                ) from e
+
+            compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+            return io.TextIOWrapper(
+                compressor.stream_writer(open(self.path, "wb")), newline=""
+            )
+
+        return open(self.path, "w", newline="")
+
+    def close(self) -> None:
+        """Flush and close the file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        super().close()
+
+
+class ArrowWriter(PredictionWriter):
+    """Write predictions as Parquet or Feather (Arrow IPC) files.
+
+    Each chunk is written as a row group (Parquet) or a record batch (Feather).
+    Requires the `pyarrow` package.
+    """
+
+    def __init__(self, path: str | Path, format: str = "parquet"):
+        """
+        Initialize the writer.
+
+        Args:
+            path (str | Path): Path of the file.
+            format (str, optional): Either "parquet" or "feather".
+                Defaults to "parquet".
+
+        Raises:
+            ValueError: If the format is not supported.
+            ImportError: If pyarrow is not installed.
+        """
+        if format not in ("parquet", "feather"):
+            raise ValueError(f"Invalid Arrow format: {format}")
+
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                f"Writing {format} files requires the pyarrow package"
+            ) from e
+
+        super().__init__(path)
+        self.format = format
+        self._writer: Any = None
+        self._schema: Any = None
+
+    def _write(self, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            # Chunks may be downcast to different widths, so numeric columns are
+            # written at full width for every chunk to share the file's schema
+            self._schema = pa.schema(
+                [field.with_type(_widest(field.type)) for field in table.schema],
+                metadata=table.schema.metadata,
+            )
+            if self.format == "parquet":
+                import pyarrow.parquet as pq
+
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            else:
+                self._writer = pa.ipc.new_file(self.path, self._schema)
+
+        self._writer.write_table(table.cast(self._schema))
+
+    def close(self) -> None:
+        """Flush and close the file."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        super().close()
+
+
+def _widest(data_type: Any) -> Any:
+    import pyarrow as pa
+
+    if pa.types.is_signed_integer(data_type):
+        return pa.int64()
+    if pa.types.is_unsigned_integer(data_type):
+        return pa.uint64()
+    if pa.types.is_floating(data_type):
+        return pa.float64()
+    return data_type
+
+
+def open_writer(path: str | Path, **kwargs: Any) -> PredictionWriter:
+    """
+    Create the prediction writer matching the suffix of a file.
+
+    ".parquet" and ".pq" files are written as Parquet, ".feather" and ".arrow" files
+    as Feather, and anything else as CSV (compressed for ".gz", ".bz2", ".xz" and
+    ".zst" files).
+
+    Args:
+        path (str | Path): Path of the file.
+        **kwargs (Any): Additional arguments to pass to the writer.
+
+    Returns:
+        PredictionWriter: The writer.
+    """
+    suffix = Path(path).suffix
+    if suffix in (".parquet", ".pq"):
+        return ArrowWriter(path, format="parquet", **kwargs)
+    if suffix in (".feather", ".arrow"):
+        return ArrowWriter(path, format="feather", **kwargs)
+
+    return CSVWriter(path, **kwargs)
@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+
+from benchmark import benchmark_model, compare_results, make_dataset, run_isolated
+from data.module import DataModule
+from models import create_pipeline
+
+
+def test_benchmark_model(tmp_path):
+    """Test that a model benchmark reports positive timings and throughput."""
+    train_url, test_url = make_dataset(tmp_path, n_rows=200, n_features=4, seed=0)
+    data_module = DataModule(train_url, test_url, "target")
+    _, X, y = data_module.get_train_data()
+    _, X_test = data_module.get_test_data()
+
+    results = benchmark_model(
+        create_pipeline("linear", True, 0), X, y, X_test, cv=2, latency_repeats=5
+    )
+
+    assert (y > 0).all()
+    assert list(X.columns) == ["x0", "x1", "x2", "x3"]
+    for measurement, value in results.items():
+        assert value is None or value > 0, measurement
+    assert results["predict_latency_p50_ms"] <= results["predict_latency_p99_ms"]
+
+
+def test_run_isolated():
+    """Test that a function runs in a process of its own and returns its result."""
+    assert run_isolated(os.getpid) != os.getpid()
+    assert run_isolated(divmod, 7, 2) == (3, 1)
+
+
+def test_compare_results():
+    """Test that slower timings and lower throughput are flagged as regressions."""
+    baseline = {"linear": {"fit_seconds": 1.0, "predict_rows_per_second": 1000.0}}
+    results = {
+        "linear": {"fit_seconds": 1.1, "predict_rows_per_second": 500.0},
+        "lasso": {"fit_seconds": 2.0},
+    }
+
+    regressions = compare_results(results, baseline, tolerance=0.25)
+
+    assert [r["measurement"] for r in regressions] == ["predict_rows_per_second"]
+    np.testing.assert_allclose(regressions[0]["change"], -0.5)
+    assert compare_results(results, baseline, tolerance=0.05)[0]["change"] > 0
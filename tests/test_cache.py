@@ -0,0 +1,154 @@
+import functools
+import logging
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.cache import DatasetCache
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """Fixture that writes a small CSV dataset to disk."""
+    df = pd.DataFrame(
+        {
+            "id": np.arange(5),
+            "feature": np.linspace(0.0, 1.0, 5),
+            "name": list("abcde"),
+        }
+    )
+    path = tmp_path / "train.csv"
+    df.to_csv(path, index=False)
+    return path, df
+
+
+def test_cache_miss_then_hit(tmp_path, dataset, caplog):
+    """Test that the second load is served from the cache with the same content."""
+    path, df = dataset
+    cache = DatasetCache(tmp_path / "cache")
+
+    with caplog.at_level(logging.INFO):
+        first = cache.load(str(path))
+        second = cache.load(str(path))
+
+    assert "Dataset cache miss" in caplog.text
+    assert "Dataset cache hit" in caplog.text
+    assert len(cache.entries()) == 1
+    pd.testing.assert_frame_equal(first, second)
+    np.testing.assert_array_equal(second["feature"], df["feature"])
+    assert second["name"].tolist() == df["name"].tolist()
+
+
+def test_cache_detects_modified_source(tmp_path, dataset):
+    """Test that modifying the source file produces a new cache entry."""
+    path, df = dataset
+    cache = DatasetCache(tmp_path / "cache")
+    cache.load(str(path))
+
+    df.assign(feature=df["feature"] * 2).to_csv(path, index=False)
+    reloaded = cache.load(str(path))
+
+    np.testing.assert_array_equal(reloaded["feature"], df["feature"] * 2)
+    assert len(cache.entries()) == 2
+
+
+def test_cache_invalidate(tmp_path, dataset):
+    """Test that invalidation drops the existing entries of the URL."""
+    path, _ = dataset
+    DatasetCache(tmp_path / "cache").load(str(path))
+
+    cache = DatasetCache(tmp_path / "cache", invalidate=True)
+    entry = cache.entries()[0]
+    cache.load(str(path))
+
+    assert len(cache.entries()) == 1
+    assert cache.entries()[0] == entry
+
+
+def test_cache_size_cap(tmp_path, dataset):
+    """Test that least recently used entries are evicted past the size cap."""
+    path, df = dataset
+    other = tmp_path / "test.csv"
+    df.to_csv(other, index=False)
+
+    cache = DatasetCache(tmp_path / "cache", max_size_mb=1e-6)
+    cache.load(str(path))
+    cache.load(str(other))
+
+    assert len(cache.entries()) == 1
+
+
+def test_cache_column_projection(tmp_path, dataset):
+    """Test that only the selected columns are read back from the cache."""
+    path, _ = dataset
+    cache = DatasetCache(tmp_path / "cache")
+    cache.load(str(path))
+
+    projected = cache.load(str(path), usecols=lambda c: c != "name")
+
+    assert list(projected.columns) == ["id", "feature"]
+
+
+def test_cache_widening_keeps_columns(tmp_path, dataset, caplog):
+    """Test that alternating column selections end up sharing one entry."""
+    path, _ = dataset
+    cache = DatasetCache(tmp_path / "cache")
+    cache.load(str(path), usecols=lambda c: c != "name")
+
+    widened = cache.load(str(path), usecols=lambda c: c != "feature")
+    with caplog.at_level(logging.INFO):
+        projected = cache.load(str(path), usecols=lambda c: c != "name")
+
+    assert list(widened.columns) == ["id", "name"]
+    assert list(projected.columns) == ["id", "feature"]
+    assert "Dataset cache hit" in caplog.text
+    assert len(cache.entries()) == 1
+
+
+def test_cache_options(tmp_path, dataset):
+    """Test that datasets parsed with different options are cached apart."""
+    path, _ = dataset
+    cache = DatasetCache(tmp_path / "cache")
+
+    def reader(dtype):
+        return lambda source, usecols: pd.read_csv(
+            source, usecols=usecols, dtype={"feature": dtype}
+        )
+
+    cache.load(str(path), reader=reader("float32"), options={"dtype": "float32"})
+    df = cache.load(str(path), reader=reader("float64"), options={"dtype": "float64"})
+
+    assert df["feature"].dtype == np.float64
+    assert len(cache.entries()) == 2
+
+
+class NoHeadHandler(SimpleHTTPRequestHandler):
+    """Handler of a server rejecting HEAD requests."""
+
+    def do_HEAD(self):
+        self.send_error(405)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_cache_hashes_content_when_head_is_rejected(tmp_path, dataset):
+    """Test that a dataset is loaded and cached when its server rejects HEAD."""
+    path, df = dataset
+    handler = functools.partial(NoHeadHandler, directory=str(path.parent))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    url = f"http://{host}:{port}/{path.name}"
+    try:
+        cache = DatasetCache(tmp_path / "cache")
+        assert cache.fingerprint(url) is None
+        pd.testing.assert_frame_equal(cache.load(url), df)
+        pd.testing.assert_frame_equal(cache.load(url), df)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert len(list((tmp_path / "cache").iterdir())) == 1
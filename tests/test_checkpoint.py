@@ -0,0 +1,114 @@
+import os
+
+import numpy as np
+import pytest
+
+from checkpoint import (
+    changed_rows,
+    clear_model_cache,
+    data_fingerprint,
+    load_lineage,
+    load_model,
+    save_lineage,
+    trained_rows,
+    save_model,
+)
+from models import create_pipeline
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    """Fixture that saves a fitted linear pipeline as a checkpoint."""
+    X = np.random.default_rng(0).random((50, 3))
+    pipeline = create_pipeline(model_type="linear").fit(X, X.sum(axis=1))
+    clear_model_cache()
+    return save_model(pipeline, tmp_path / "model.joblib"), pipeline, X
+
+
+def test_load_model_roundtrip(checkpoint):
+    """Test that a loaded checkpoint predicts like the saved pipeline."""
+    path, pipeline, X = checkpoint
+
+    np.testing.assert_allclose(load_model(path).predict(X), pipeline.predict(X))
+
+
+def test_load_model_memory_maps_arrays(checkpoint):
+    """Test that the model arrays are memory-mapped from the checkpoint."""
+    path, _, _ = checkpoint
+
+    assert isinstance(load_model(path).named_steps["scaler"].mean_, np.memmap)
+    assert not isinstance(
+        load_model(path, mmap_mode=None).named_steps["scaler"].mean_, np.memmap
+    )
+
+
+def test_load_model_cache(checkpoint):
+    """Test that repeated loads are served from the cache until the file changes."""
+    path, pipeline, _ = checkpoint
+    model = load_model(path)
+
+    assert load_model(path) is model
+
+    save_model(pipeline, path)
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1))
+    assert load_model(path) is not model
+
+
+def test_lineage_roundtrip(checkpoint):
+    """Test that the lineage of a checkpoint is recorded next to it."""
+    path, _, _ = checkpoint
+    ids, row_hashes = np.arange(5, dtype=np.uint64), np.arange(5, 10, dtype=np.uint64)
+
+    assert load_lineage(path) is None
+
+    held_out = np.array([False, False, False, True, True])
+    save_lineage(
+        path,
+        ids,
+        row_hashes,
+        parent="parent.joblib",
+        held_out=held_out,
+        model_type="linear",
+    )
+    lineage = load_lineage(path)
+
+    assert lineage["parent"] == "parent.joblib"
+    assert lineage["model_type"] == "linear"
+    assert lineage["rows"] == 5
+    assert lineage["data_fingerprint"] == data_fingerprint(ids[::-1], row_hashes[::-1])
+    np.testing.assert_array_equal(lineage["ids"], ids)
+    np.testing.assert_array_equal(lineage["held_out"], held_out)
+
+
+def test_changed_rows():
+    """Test that rows are matched by id to find the new and changed ones."""
+    lineage = {
+        "ids": np.array([3, 1, 2], dtype=np.uint64),
+        "row_hashes": np.array([30, 10, 20], dtype=np.uint64),
+    }
+    ids = np.array([1, 2, 3, 4], dtype=np.uint64)
+    row_hashes = np.array([10, 21, 30, 40], dtype=np.uint64)
+
+    new, changed = changed_rows(lineage, ids, row_hashes)
+
+    np.testing.assert_array_equal(new, [False, False, False, True])
+    np.testing.assert_array_equal(changed, [False, True, False, False])
+
+
+def test_trained_rows():
+    """Test that rows held out from a checkpoint do not count as trained on."""
+    lineage = {
+        "ids": np.array([3, 1, 2], dtype=np.uint64),
+        "row_hashes": np.array([30, 10, 20], dtype=np.uint64),
+        "held_out": np.array([True, False, False]),
+    }
+    ids = np.array([1, 2, 3, 4], dtype=np.uint64)
+
+    np.testing.assert_array_equal(
+        trained_rows(lineage, ids), [True, True, False, False]
+    )
+
+    empty = {key: value[:0] for key, value in lineage.items()}
+    new, changed = changed_rows(empty, ids, ids)
+    assert new.all() and not changed.any()
+    assert not trained_rows(empty, ids).any()
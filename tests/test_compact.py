@@ -0,0 +1,149 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from checkpoint import load_model, save_model
+from compact import compact_model, compaction_report, prune_forest
+from models import FoldEnsemble, create_pipeline
+
+
+@pytest.fixture
+def data():
+    """Fixture providing a nonlinear target of a few features."""
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(
+        rng.normal(size=(400, 4)) * [1, 10, 100, 0.1], columns=list("abcd")
+    )
+    y = np.sin(X["a"]) + X["b"] / 10 + rng.normal(scale=0.1, size=400)
+    return X, y
+
+
+@pytest.fixture
+def save_path(tmp_path):
+    """Fixture saving compact models to a checkpoint, returning its path."""
+    return lambda model: save_model(compact_model(model), tmp_path / "model.joblib")
+
+
+@pytest.fixture
+def forest(data):
+    """Fixture providing a random forest pipeline fitted on the data."""
+    X, y = data
+    return create_pipeline(model_type="random_forest", n_estimators=20).fit(X, y)
+
+
+def test_compact_checkpoint_loads_transparently(tmp_path, data, forest):
+    """Test that a compact checkpoint is smaller and loads as a regular model."""
+    X, _ = data
+    full = save_model(forest, tmp_path / "full.joblib")
+    compact = save_model(compact_model(forest), tmp_path / "compact.joblib")
+
+    assert compact.stat().st_size < 0.7 * full.stat().st_size
+
+    model = load_model(compact)
+    trees = model.steps[-1][1].estimators_
+    assert trees[0].tree_.threshold.dtype == np.float64
+    # Thresholds are rounded so that every row takes the same path
+    for tree, original in zip(trees, forest.steps[-1][1].estimators_):
+        Xt = np.asarray(forest[:-1].transform(X), dtype=np.float32)
+        np.testing.assert_array_equal(tree.apply(Xt), original.apply(Xt))
+    np.testing.assert_allclose(model.predict(X), forest.predict(X), rtol=1e-6)
+
+
+def test_compact_model_leaves_model_unchanged(tmp_path, data):
+    """Test that models without forests are saved as is, and forests are copied."""
+    X, y = data
+    linear = create_pipeline(model_type="linear").fit(X, y)
+    ensemble = FoldEnsemble(
+        [create_pipeline(model_type="random_forest", n_estimators=5).fit(X, y)]
+    )
+
+    assert compact_model(linear) is linear
+
+    full = save_model(ensemble, tmp_path / "full.joblib")
+    path = save_model(compact_model(ensemble), tmp_path / "ensemble.joblib")
+    assert path.stat().st_size < 0.7 * full.stat().st_size
+    np.testing.assert_allclose(
+        joblib.load(path).predict(X), ensemble.predict(X), rtol=1e-6
+    )
+    # The trees of the model itself are not replaced
+    tree = ensemble.estimators[0].steps[-1][1].estimators_[0].tree_
+    assert tree.value.dtype == np.float64
+
+
+@pytest.mark.parametrize("loss_budget", [0.0, 0.1, 1.0])
+def test_prune_forest_within_budget(data, forest, loss_budget):
+    """Test that pruning keeps the validation loss within the budget."""
+    X, y = data
+    X_val, y_val = X.iloc[300:], y.iloc[300:]
+    base_loss = np.mean((forest.predict(X_val) - y_val) ** 2)
+
+    pruned = prune_forest(forest, X_val, y_val, loss_budget)
+    trees = pruned.steps[-1][1].estimators_
+
+    assert np.mean((pruned.predict(X_val) - y_val) ** 2) <= base_loss * (
+        1 + loss_budget
+    ) * (1 + 1e-9)
+    assert pruned.steps[-1][1].n_estimators == len(trees)
+    assert len(forest.steps[-1][1].estimators_) == 20
+    if loss_budget == 1.0:
+        node_count = sum(t.tree_.node_count for t in forest.steps[-1][1].estimators_)
+        assert sum(t.tree_.node_count for t in trees) < node_count / 2
+
+
+def test_prune_forest_options(data, forest):
+    """Test that depth capping and tree dropping can be disabled."""
+    X, y = data
+    depth = max(t.tree_.max_depth for t in forest.steps[-1][1].estimators_)
+
+    pruned = prune_forest(forest, X, y, 1.0, cap_depth=False)
+    trees = pruned.steps[-1][1].estimators_
+    assert len(trees) < 20
+    assert all(t in forest.steps[-1][1].estimators_ for t in trees)
+
+    pruned = prune_forest(forest, X, y, 1.0, drop_trees=False)
+    assert len(pruned.steps[-1][1].estimators_) == 20
+    assert max(t.tree_.max_depth for t in pruned.steps[-1][1].estimators_) < depth
+
+
+def test_prune_forest_out_of_bag(data, forest, save_path):
+    """Test that a forest is pruned on the out-of-bag rows of its training rows."""
+    X, y = data
+
+    pruned = prune_forest(forest, X, y, 1.0, oob=True)
+
+    assert len(pruned.steps[-1][1].estimators_) < 20
+    # Out-of-bag accuracy is that of unseen rows, well below the in-sample one
+    in_sample = compaction_report(forest, pruned, save_path(pruned), X, y)
+    report = compaction_report(forest, pruned, save_path(pruned), X, y, oob=True)
+    assert report["original"]["r2_score"] < in_sample["original"]["r2_score"]
+    assert report["compact"]["r2_score"] > 0.5
+
+    with pytest.raises(ValueError, match="other rows"):
+        prune_forest(forest, X.iloc[:100], y.iloc[:100], 1.0, oob=True)
+
+
+def test_prune_unsupported_model_type(data):
+    """Test that pruning a model other than a random forest raises an error."""
+    X, y = data
+    pipeline = create_pipeline(model_type="linear").fit(X, y)
+
+    with pytest.raises(ValueError, match="cannot be pruned"):
+        prune_forest(pipeline, X, y, 0.1)
+
+
+def test_compaction_report(tmp_path, data, forest):
+    """Test that the report compares the original and compact checkpoints."""
+    X, y = data
+    path = save_model(compact_model(forest), tmp_path / "model.joblib")
+
+    report = compaction_report(forest, forest, path, X, y)
+
+    assert report["compact"]["size_mb"] < report["original"]["size_mb"]
+    assert report["compact"]["r2_score"] == pytest.approx(
+        report["original"]["r2_score"], abs=1e-6
+    )
+    assert list(tmp_path.iterdir()) == [path]
+
+    report = compaction_report(forest, forest, path)
+    assert set(report["compact"]) == {"size_mb", "load_s"}
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from compiled import (
+    COMPILABLE_TYPES,
+    CompiledModel,
+    compile_pipeline,
+    compiled_path,
+    load_compiled,
+    save_compiled,
+)
+from models import create_pipeline
+
+
+@pytest.fixture
+def data():
+    """Fixture providing features of various scales and a noisy target."""
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(
+        rng.normal(size=(200, 4)) * [1, 10, 100, 0.1] + 5, columns=list("abcd")
+    )
+    y = X @ np.array([1.0, 0.2, 0.01, 5.0]) + rng.normal(size=200)
+    return X, y
+
+
+@pytest.mark.parametrize("model_type", COMPILABLE_TYPES)
+@pytest.mark.parametrize("scale_features", [True, False])
+def test_compiled_model_matches_pipeline(tmp_path, data, model_type, scale_features):
+    """Test that a saved and loaded compiled model predicts like the pipeline."""
+    X, y = data
+    params = {"n_estimators": 10} if model_type == "random_forest" else {}
+    pipeline = create_pipeline(
+        model_type=model_type, scale_features=scale_features, **params
+    ).fit(X, y)
+
+    path = save_compiled(compile_pipeline(pipeline), tmp_path / "model.compiled.npz")
+    model = load_compiled(path)
+
+    np.testing.assert_allclose(model.predict(X), pipeline.predict(X), rtol=1e-9)
+    # Features are selected by name
+    np.testing.assert_allclose(
+        model.predict(X[X.columns[::-1]]), pipeline.predict(X), rtol=1e-9
+    )
+
+
+def test_compiled_forest_splits_like_pipeline(data):
+    """Test that rows close to a split take the same branch as in the pipeline."""
+    X, y = data
+    pipeline = create_pipeline(model_type="random_forest", n_estimators=10).fit(X, y)
+    scaler, forest = pipeline.named_steps["scaler"], pipeline.steps[-1][1]
+
+    # Raw values around every split threshold, in float64
+    rows = []
+    for tree in forest.estimators_:
+        split = tree.tree_.children_left >= 0
+        for feature, threshold in zip(
+            tree.tree_.feature[split], tree.tree_.threshold[split]
+        ):
+            value = threshold * scaler.scale_[feature] + scaler.mean_[feature]
+            for delta in (-1e-6, -1e-9, 0.0, 1e-9, 1e-6):
+                row = X.mean().to_numpy(copy=True)
+                row[feature] = value * (1 + delta)
+                rows.append(row)
+    X_near = pd.DataFrame(rows, columns=X.columns)
+
+    np.testing.assert_allclose(
+        compile_pipeline(pipeline).predict(X_near), pipeline.predict(X_near), rtol=1e-9
+    )
+
+
+def test_compiled_forest_batches(data):
+    """Test that a compiled forest predicts alike in batches of any size."""
+    X, y = data
+    pipeline = create_pipeline(model_type="random_forest", n_estimators=10).fit(X, y)
+    model = compile_pipeline(pipeline)
+    model.batch_size = 15
+
+    np.testing.assert_allclose(model.predict(X), pipeline.predict(X), rtol=1e-9)
+
+
+def test_compile_unsupported_model_type(data):
+    """Test that compiling an unsupported model type raises an error."""
+    X, y = data
+    pipeline = create_pipeline(model_type="svm").fit(X, y)
+
+    with pytest.raises(ValueError, match="cannot be compiled"):
+        compile_pipeline(pipeline)
+
+
+def test_compiled_missing_features(data):
+    """Test that predicting without some features raises an error."""
+    X, y = data
+    model = compile_pipeline(create_pipeline(model_type="linear").fit(X, y))
+
+    with pytest.raises(ValueError, match="Missing features: b"):
+        model.predict(X.drop(columns=["b"]))
+
+
+def test_compiled_model_is_abstract():
+    """Test that compiled models have to implement their arrays and prediction."""
+    with pytest.raises(TypeError, match="_predict"):
+        CompiledModel(None)
+
+
+def test_compiled_path():
+    """Test that compiled models are saved next to their checkpoint."""
+    assert str(compiled_path("models/model-1.joblib")) == "models/model-1.compiled.npz"
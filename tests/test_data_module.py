@@ -0,0 +1,253 @@
+import gc
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.module import DataModule
+
+
+@pytest.fixture
+def dataset_urls(tmp_path):
+    """Fixture that writes small train and test CSV datasets to disk."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "id": np.arange(20),
+            "a": rng.random(20),
+            "b": rng.random(20),
+            "unused": rng.random(20),
+            "count": rng.integers(0, 100, 20),
+            "target": rng.random(20),
+        }
+    )
+    df.to_csv(tmp_path / "train.csv", index=False)
+    df.drop(columns=["target"]).to_csv(tmp_path / "test.csv", index=False)
+    return str(tmp_path / "train.csv"), str(tmp_path / "test.csv")
+
+
+def test_unused_columns_are_not_loaded(dataset_urls):
+    """Test that excluded features are never parsed."""
+    data_module = DataModule(*dataset_urls, "target", exclude_features=["unused"])
+
+    assert "unused" not in data_module.df_train.columns
+    assert "unused" not in data_module.df_test.columns
+    assert data_module.features_selected == ["id", "a", "b", "count"]
+
+
+def test_include_features(dataset_urls):
+    """Test that only the included features, the id and the target are loaded."""
+    data_module = DataModule(*dataset_urls, "target", include_features=["a"])
+
+    assert list(data_module.df_train.columns) == ["id", "a", "target"]
+    assert data_module.features_selected == ["id", "a"]
+
+
+def test_downcast(dataset_urls):
+    """Test that features are downcast while the target keeps its precision."""
+    data_module = DataModule(*dataset_urls, "target", dtypes={"b": "float64"})
+    df = data_module.df_train
+
+    assert df["a"].dtype == np.float32
+    assert df["b"].dtype == np.float64
+    assert df["count"].dtype == np.int8
+    assert df["target"].dtype == np.float64
+
+
+def test_cached_dtypes_follow_settings(tmp_path, dataset_urls, caplog):
+    """Test that changing the dtype settings does not reuse cached datasets."""
+    cache_dir = tmp_path / "cache"
+    kwargs = {"cache_dir": cache_dir, "exclude_features": ["unused"]}
+    DataModule(*dataset_urls, "target", **kwargs).df_train
+    caplog.clear()
+
+    with caplog.at_level(logging.INFO):
+        df = DataModule(*dataset_urls, "target", downcast=False, **kwargs).df_train
+
+    assert df["a"].dtype == np.float64
+    assert "Dataset cache miss" in caplog.text
+    assert "Skipped parsing 1 unused columns: unused\n" in caplog.text
+
+
+def test_no_downcast(dataset_urls):
+    """Test that downcasting can be disabled."""
+    data_module = DataModule(*dataset_urls, "target", downcast=False)
+
+    assert data_module.df_train["a"].dtype == np.float64
+
+
+def test_cached_projection(tmp_path, dataset_urls):
+    """Test that a cached dataset is reused and widened when more columns are needed."""
+    cache_dir = tmp_path / "cache"
+    narrow = DataModule(
+        *dataset_urls, "target", include_features=["a"], cache_dir=cache_dir
+    )
+    wide = DataModule(*dataset_urls, "target", cache_dir=cache_dir)
+
+    assert list(narrow.df_train.columns) == ["id", "a", "target"]
+    assert "unused" in wide.df_train.columns
+    np.testing.assert_array_equal(narrow.df_train["a"], wide.df_train["a"])
+
+
+def test_get_test_data_leaves_training_data_unloaded(dataset_urls):
+    """Test that the test data is selected without loading the training data."""
+    data_module = DataModule(*dataset_urls, "target", exclude_features=["unused"])
+
+    ids, X = data_module.get_test_data()
+    assert list(X.columns) == ["a", "b", "count"]
+    assert data_module._df_train is None
+
+    _, X = data_module.get_test_data(features=["b", "a"])
+    assert list(X.columns) == ["b", "a"]
+    assert data_module._df_train is None
+
+
+def test_iter_test_data(dataset_urls):
+    """Test that streaming the test data yields the same rows as loading it."""
+    data_module = DataModule(*dataset_urls, "target", exclude_features=["unused"])
+    ids, X = data_module.get_test_data()
+
+    chunks = list(data_module.iter_test_data(chunk_size=6, features=["b", "a"]))
+
+    assert len(chunks) == 4
+    assert list(chunks[0][1].columns) == ["b", "a"]
+    pd.testing.assert_series_equal(pd.concat([i for i, _ in chunks]), ids)
+    np.testing.assert_array_equal(
+        pd.concat([x for _, x in chunks])[["a", "b"]], X[["a", "b"]]
+    )
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_iter_train_data(tmp_path, dataset_urls, cached):
+    """Test that streamed training and held out rows partition the dataset."""
+    cache_dir = tmp_path / "cache" if cached else None
+    data_module = DataModule(
+        *dataset_urls, "target", test_size=0.3, cache_dir=cache_dir
+    )
+    ids, X, y = data_module.get_train_data()
+
+    train = list(data_module.iter_train_data(chunk_size=7, train=True))
+    held_out = list(data_module.iter_train_data(chunk_size=7, train=False))
+    train_ids = pd.concat([i for i, _, _ in train])
+    held_out_ids = pd.concat([i for i, _, _ in held_out])
+
+    assert set(train_ids).isdisjoint(held_out_ids)
+    assert sorted([*train_ids, *held_out_ids]) == sorted(ids)
+    assert 0 < len(held_out_ids) < len(train_ids)
+    np.testing.assert_array_equal(
+        pd.concat([x for _, x, _ in train]).to_numpy(),
+        X[ids.isin(train_ids)].to_numpy(),
+    )
+    np.testing.assert_array_equal(
+        pd.concat([t for _, _, t in held_out]), y[ids.isin(held_out_ids)]
+    )
+
+
+def test_split_is_deterministic_and_persisted(tmp_path, dataset_urls, caplog):
+    """Test that a seeded split is reproduced, and reloaded from the cache."""
+    cache_dir = tmp_path / "cache"
+    kwargs = {"seed": 0, "split": "stratified", "cache_dir": cache_dir}
+    first = DataModule(*dataset_urls, "target", **kwargs)
+    ids, X, y = first.get_split(train=True)
+
+    with caplog.at_level(logging.INFO):
+        second = DataModule(*dataset_urls, "target", **kwargs)
+        second_ids, _, _ = second.get_split(train=True)
+    test_ids, _, _ = second.get_split(train=False)
+
+    assert "Loaded stratified train/test split" in caplog.text
+    pd.testing.assert_series_equal(ids, second_ids)
+    assert set(ids).isdisjoint(test_ids)
+    assert len(ids) + len(test_ids) == 20
+    assert "id" not in X.columns
+    np.testing.assert_array_equal(y, first.df_train.set_index("id").loc[ids, "target"])
+
+
+def test_random_split_is_stable(tmp_path):
+    """Test that rows keep their random split when the dataset grows."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"id": np.arange(500), "a": rng.random(500)})
+    df["target"] = rng.random(500)
+    df.iloc[:400].to_csv(tmp_path / "train.csv", index=False)
+    df.iloc[:400].to_csv(tmp_path / "test.csv", index=False)
+    ids, _, _ = DataModule(
+        str(tmp_path / "train.csv"), str(tmp_path / "test.csv"), "target", seed=0
+    ).get_split(train=True)
+
+    df.to_csv(tmp_path / "train.csv", index=False)
+    grown = DataModule(
+        str(tmp_path / "train.csv"), str(tmp_path / "test.csv"), "target", seed=0
+    )
+    grown_ids, _, _ = grown.get_split(train=True)
+    test_ids, _, _ = grown.get_split(train=False)
+
+    assert set(ids) <= set(grown_ids)
+    assert set(test_ids).isdisjoint(ids)
+    assert 50 < len(test_ids) < 150
+
+
+@pytest.mark.parametrize("split", ["stratified", "group", "time_series"])
+def test_split_strategies(dataset_urls, split):
+    """Test that every split strategy partitions the rows."""
+    data_module = DataModule(
+        *dataset_urls,
+        "target",
+        test_size=0.25,
+        seed=0,
+        split=split,
+        group_column="count" if split == "group" else None,
+        time_column="a" if split == "time_series" else None,
+    )
+    train_ids, _, _ = data_module.get_split(train=True)
+    test_ids, X_test, _ = data_module.get_split(train=False)
+
+    assert sorted([*train_ids, *test_ids]) == list(range(20))
+    if split == "group":
+        df = data_module.df_train.set_index("id")
+        assert set(df.loc[train_ids, "count"]).isdisjoint(df.loc[test_ids, "count"])
+    if split == "time_series":
+        assert len(test_ids) == 5
+        assert X_test["a"].min() >= data_module.get_split(train=True)[1]["a"].max()
+
+
+def test_time_series_split_without_test_rows(dataset_urls):
+    """Test that a test size of zero keeps every row for training."""
+    data_module = DataModule(
+        *dataset_urls, "target", test_size=0.0, split="time_series", time_column="a"
+    )
+
+    assert len(data_module.get_split(train=True)[0]) == 20
+    assert data_module.get_split(train=False)[0].empty
+
+
+def test_group_split_requires_column(dataset_urls):
+    """Test that the group split refuses to run without a group column."""
+    with pytest.raises(ValueError, match="group_column"):
+        DataModule(*dataset_urls, "target", split="group")
+
+
+def test_shared_split(tmp_path, dataset_urls):
+    """Test that the shared split matches the split and is backed by a file."""
+    shared_dir = tmp_path / "shared"
+    shared_dir.mkdir()
+    data_module = DataModule(
+        *dataset_urls, "target", seed=0, shared_dir=str(shared_dir), downcast=False
+    )
+    ids, X, y = data_module.get_split(train=True)
+    shared_ids, shared_X, shared_y = data_module.get_shared_split(train=True)
+
+    pd.testing.assert_series_equal(shared_ids, ids)
+    pd.testing.assert_frame_equal(shared_X, X.astype(np.float64))
+    pd.testing.assert_series_equal(shared_y, y)
+
+    features = np.asarray(shared_X)
+    assert features.flags.c_contiguous
+    while not isinstance(features, np.memmap):
+        features = features.base
+    assert Path(features.filename).parent.parent == shared_dir
+
+    del data_module, shared_X, shared_y, features
+    gc.collect()
+    assert not any(shared_dir.iterdir())
@@ -0,0 +1,218 @@
+import functools
+import gzip
+import hashlib
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.fetch import DatasetFetcher, FileTransport, Transport, detect_compression
+from data.module import DataModule
+
+
+class FlakyTransport(FileTransport):
+    """File transport failing once after a number of bytes, recording the offsets.
+
+    The stream either raises, or ends early without an error if `short_read`.
+    """
+
+    def __init__(self, fail_after: int | None = None, short_read: bool = False):
+        self.fail_after = fail_after
+        self.short_read = short_read
+        self.offsets = []
+
+    def open(self, url, offset=0):
+        self.offsets.append(offset)
+        stream, offset = super().open(url, offset)
+        if self.fail_after is None or len(self.offsets) > 1:
+            return stream, offset
+
+        data = stream.read(self.fail_after)
+        stream.close()
+        transport = self
+
+        class Broken:
+            def __init__(self):
+                self.sent = False
+
+            def read(self, size):
+                if not self.sent:
+                    self.sent = True
+                    return data
+                if transport.short_read:
+                    return b""
+                raise ConnectionResetError("Connection reset")
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                pass
+
+        return Broken(), offset
+
+
+@pytest.fixture
+def source(tmp_path):
+    """Fixture that writes a file to download."""
+    path = tmp_path / "source" / "data.bin"
+    path.parent.mkdir()
+    path.write_bytes(np.random.default_rng(0).bytes(10000))
+    return path
+
+
+def test_fetch_file_url(tmp_path, source):
+    """Test that a file:// URL is downloaded once, until it changes."""
+    transport = FlakyTransport()
+    fetcher = DatasetFetcher(tmp_path / "downloads", transports={"file": transport})
+
+    path = fetcher.fetch(source.as_uri())
+    assert path.read_bytes() == source.read_bytes()
+    assert path.name == "data.bin"
+
+    assert fetcher.fetch(source.as_uri()) == path
+    assert transport.offsets == [0]
+
+
+def test_fetch_resumes(tmp_path, source):
+    """Test that a failed download is retried from the bytes already received."""
+    transport = FlakyTransport(fail_after=3000)
+    fetcher = DatasetFetcher(
+        tmp_path / "downloads",
+        transports={"file": transport},
+        backoff=0.0,
+        chunk_size=1000,
+        checksums={source.as_uri(): hashlib.sha256(source.read_bytes()).hexdigest()},
+    )
+
+    path = fetcher.fetch(source.as_uri())
+
+    assert transport.offsets == [0, 3000]
+    assert path.read_bytes() == source.read_bytes()
+
+
+def test_fetch_resumes_short_read(tmp_path, source):
+    """Test that a download ending early without an error is resumed."""
+    transport = FlakyTransport(fail_after=3000, short_read=True)
+    fetcher = DatasetFetcher(
+        tmp_path / "downloads", transports={"file": transport}, backoff=0.0
+    )
+
+    path = fetcher.fetch(source.as_uri())
+
+    assert transport.offsets == [0, 3000]
+    assert path.read_bytes() == source.read_bytes()
+
+
+def test_fetch_checksum_mismatch(tmp_path, source):
+    """Test that a download not matching its checksum is rejected."""
+    fetcher = DatasetFetcher(
+        tmp_path / "downloads", checksums={source.as_uri(): "sha256:" + "0" * 64}
+    )
+
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        fetcher.fetch(source.as_uri())
+    assert not fetcher.local_path(source.as_uri()).exists()
+
+
+def test_fetch_gives_up(tmp_path):
+    """Test that a download failing every retry raises the error."""
+    fetcher = DatasetFetcher(tmp_path / "downloads", retries=1, backoff=0.0)
+
+    with pytest.raises(OSError):
+        fetcher.fetch((tmp_path / "missing.csv").as_uri())
+
+
+def test_transport_is_abstract():
+    """Test that transports have to implement both stat and open."""
+
+    class StatOnly(Transport):
+        def stat(self, url):
+            return {"size": None, "validator": None}
+
+    with pytest.raises(TypeError, match="open"):
+        StatOnly()
+
+
+def test_detect_compression(tmp_path):
+    """Test that gzip files are recognized by their content."""
+    with gzip.open(tmp_path / "data", "wt") as f:
+        f.write("a,b\n1,2\n")
+    (tmp_path / "plain").write_text("a,b\n1,2\n")
+
+    assert detect_compression(tmp_path / "data") == "gzip"
+    assert detect_compression(tmp_path / "plain") is None
+
+
+@pytest.fixture
+def http_server(tmp_path):
+    """Fixture serving a directory of compressed datasets over HTTP."""
+    root = tmp_path / "served"
+    root.mkdir()
+    df = pd.DataFrame({"id": np.arange(20), "a": np.arange(20) / 2, "target": 1.0})
+    with gzip.open(root / "train.csv.gz", "wt") as f:
+        df.to_csv(f, index=False)
+    zstandard = pytest.importorskip("zstandard")
+    (root / "test.csv.zst").write_bytes(
+        zstandard.ZstdCompressor().compress(
+            df.drop(columns=["target"]).to_csv(index=False).encode()
+        )
+    )
+
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=str(root))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    yield f"http://{host}:{port}", df
+    server.shutdown()
+    server.server_close()
+
+
+def test_data_module_downloads_compressed_datasets(tmp_path, http_server):
+    """Test that the data module downloads and parses compressed remote datasets."""
+    url, df = http_server
+    data_module = DataModule(
+        f"{url}/train.csv.gz",
+        f"{url}/test.csv.zst",
+        "target",
+        download_dir=str(tmp_path / "downloads"),
+    )
+
+    _, X, y = data_module.get_train_data()
+    ids, X_test = data_module.get_test_data()
+
+    np.testing.assert_allclose(X["a"], df["a"])
+    np.testing.assert_array_equal(ids, df["id"])
+    downloads = (tmp_path / "downloads").glob("*/*")
+    assert sorted(p.name for p in downloads if p.suffix != ".json") == [
+        "test.csv.zst",
+        "train.csv.gz",
+    ]
+
+
+class NoHeadHandler(SimpleHTTPRequestHandler):
+    """Handler of a server rejecting HEAD requests."""
+
+    def do_HEAD(self):
+        self.send_error(405)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_fetch_when_head_is_rejected(tmp_path, source):
+    """Test that a dataset is downloaded when its server rejects HEAD."""
+    handler = functools.partial(NoHeadHandler, directory=str(source.parent))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    try:
+        fetcher = DatasetFetcher(tmp_path / "downloads")
+        path = fetcher.fetch(f"http://{host}:{port}/{source.name}")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert path.read_bytes() == source.read_bytes()
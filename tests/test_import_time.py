@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src" / "project"
+
+# Time spent importing the project modules themselves, excluding the libraries they
+# cannot do without (numpy, and scikit-learn's core with the joblib it imports), in
+# seconds
+IMPORT_BUDGET = 0.1
+REQUIRED_LIBRARIES = ("numpy", "sklearn", "joblib")
+
+
+def _import(code: str) -> tuple[set[str], list[tuple[int, str, float]]]:
+    """Run code in a fresh interpreter, returning the imported modules and timings."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import sys\n{code}\nprint(','.join(sys.modules))",
+        ],
+        env={**os.environ, "PYTHONPATH": str(SRC_DIR)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        timings.append((depth, name.strip(), int(cumulative) / 1e6))
+
+    return set(result.stdout.strip().split(",")), timings
+
+
+def _own_time(timings: list[tuple[int, str, float]], module: str) -> float:
+    """Cumulative import time of a module, minus its required library imports."""
+    index = next(i for i, (_, name, _) in enumerate(timings) if name == module)
+    depth, _, cumulative = timings[index]
+
+    # Children are reported before their parent, one level deeper
+    for child_depth, name, child_cumulative in reversed(timings[:index]):
+        if child_depth <= depth:
+            break
+        if child_depth == depth + 1 and name.split(".")[0] in REQUIRED_LIBRARIES:
+            cumulative -= child_cumulative
+
+    return cumulative
+
+
+def test_utils_import_is_light():
+    """Test that the utilities import neither Hydra, pandas nor scikit-learn."""
+    modules, _ = _import("import utils")
+
+    assert not {"hydra", "omegaconf", "pandas", "sklearn"} & modules
+
+
+@pytest.mark.parametrize(
+    "model_type, expected, unexpected",
+    [
+        ("linear", "sklearn.linear_model", "sklearn.ensemble"),
+        ("sgd", "sklearn.linear_model", "sklearn.ensemble"),
+        ("svm", "sklearn.svm", "sklearn.ensemble"),
+    ],
+)
+def test_only_selected_estimator_is_imported(model_type, expected, unexpected):
+    """Test that creating a pipeline imports the selected estimator's module only."""
+    modules, _ = _import(
+        f"import models\nmodels.create_pipeline({model_type!r}, memory=None)"
+    )
+
+    assert expected in modules
+    assert unexpected not in modules
+    assert "sklearn.kernel_approximation" not in modules
+
+
+def test_import_time_budget():
+    """Test that importing the project modules stays within the startup budget."""
+    # The fastest of a few runs, as the first one may pay for a cold disk cache
+    own_times = []
+    for _ in range(3):
+        _, timings = _import("import models\nimport utils")
+        own_times.append(_own_time(timings, "models") + _own_time(timings, "utils"))
+
+    assert min(own_times) < IMPORT_BUDGET
@@ -0,0 +1,76 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+import inference
+from inference import InferenceEngine
+from models import create_pipeline
+
+
+@pytest.fixture
+def fitted_pipeline():
+    """Fixture that provides a fitted random forest pipeline and its inputs."""
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.random((500, 4)), columns=["a", "b", "c", "d"])
+    y = X["a"] * 2 + X["b"]
+    pipeline = create_pipeline(model_type="random_forest", n_estimators=10)
+    pipeline.fit(X, y)
+    return pipeline, X
+
+
+@pytest.mark.parametrize("backend", ["loky", "threading"])
+def test_parallel_matches_serial(fitted_pipeline, backend):
+    """Test that sharded predictions are identical to the serial path and in order."""
+    pipeline, X = fitted_pipeline
+    engine = InferenceEngine(n_jobs=2, batch_size=64, backend=backend)
+
+    np.testing.assert_array_equal(engine.predict(pipeline, X), pipeline.predict(X))
+
+
+def test_parallel_from_checkpoint(tmp_path, fitted_pipeline):
+    """Test that process workers can load the pipeline from its checkpoint."""
+    pipeline, X = fitted_pipeline
+    checkpoint = tmp_path / "model.joblib"
+    joblib.dump(pipeline, checkpoint)
+    engine = InferenceEngine(n_jobs=2, batch_size=64)
+
+    np.testing.assert_array_equal(
+        engine.predict(pipeline, X, checkpoint=checkpoint), pipeline.predict(X)
+    )
+
+
+@pytest.mark.parametrize("mmap_mode", [None, "r"])
+def test_workers_load_with_mmap_mode(tmp_path, fitted_pipeline, monkeypatch, mmap_mode):
+    """Test that workers load the checkpoint with the engine's memory-mapping mode."""
+    pipeline, X = fitted_pipeline
+    checkpoint = tmp_path / "model.joblib"
+    joblib.dump(pipeline, checkpoint)
+    modes = []
+
+    def load_model(path, mmap_mode="r"):
+        modes.append(mmap_mode)
+        return joblib.load(path, mmap_mode=mmap_mode)
+
+    monkeypatch.setattr(inference, "load_model", load_model)
+    engine = InferenceEngine(
+        n_jobs=2, batch_size=64, backend="sequential", mmap_mode=mmap_mode
+    )
+
+    np.testing.assert_array_equal(
+        engine.predict(pipeline, X, checkpoint=checkpoint), pipeline.predict(X)
+    )
+    assert set(modes) == {mmap_mode}
+
+
+def test_n_jobs_override(fitted_pipeline, caplog):
+    """Test that the workers of a call override those of the engine."""
+    pipeline, X = fitted_pipeline
+    engine = InferenceEngine(n_jobs=1, batch_size=64, backend="threading")
+
+    with caplog.at_level("INFO"):
+        y_pred = engine.predict(pipeline, X, n_jobs=2)
+
+    assert engine.n_batches(len(X)) == 8
+    assert "n_jobs=2" in caplog.text
+    np.testing.assert_array_equal(y_pred, pipeline.predict(X))
@@ -1,12 +1,23 @@
 import pytest
 import numpy as np
+from joblib.memory import MemorizedFunc
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
-from sklearn.linear_model import LinearRegression, Lasso
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression, Lasso, Ridge, SGDRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.kernel_approximation import Nystroem, RBFSampler
 from sklearn.svm import SVR
 
-from models import create_pipeline
+from models import (
+    FIT_COSTS,
+    MODEL_TYPES,
+    WARM_START,
+    FoldEnsemble,
+    TransformerCache,
+    create_pipeline,
+    model_type_of,
+    warm_start,
+)
 
 
 @pytest.fixture
@@ -94,6 +105,66 @@ def test_svm_model():
     assert svm_model.kernel == "rbf"
 
 
+def test_hist_gradient_boosting_model():
+    """Test creating a pipeline with a histogram-based gradient boosting model."""
+    pipeline = create_pipeline(
+        model_type="hist_gradient_boosting", learning_rate=0.05, max_iter=50
+    )
+
+    # Check model parameters
+    hgb_model = pipeline.steps[1][1]
+    assert isinstance(hgb_model, HistGradientBoostingRegressor)
+    assert hgb_model.learning_rate == 0.05
+    assert hgb_model.max_iter == 50
+    assert hgb_model.random_state == 1234
+
+
+def test_sgd_model_partial_fit(sample_data):
+    """Test that the SGD model can be trained incrementally."""
+    X, y = sample_data
+    pipeline = create_pipeline(model_type="sgd", alpha=0.001)
+
+    sgd_model = pipeline.steps[1][1]
+    assert isinstance(sgd_model, SGDRegressor)
+    assert sgd_model.alpha == 0.001
+    assert sgd_model.random_state == 1234
+
+    sgd_model.partial_fit(X, y)
+    sgd_model.partial_fit(X, y)
+    assert sgd_model.t_ > 1
+
+
+@pytest.mark.parametrize(
+    "approximation,kernel_class",
+    [("nystroem", Nystroem), ("rbf_sampler", RBFSampler)],
+)
+def test_svm_approx_model(approximation, kernel_class):
+    """Test creating a pipeline with a kernel approximation and a linear model."""
+    pipeline = create_pipeline(
+        model_type="svm_approx",
+        approximation=approximation,
+        n_components=50,
+        gamma=0.5,
+        alpha=2.0,
+    )
+
+    # Check pipeline structure
+    assert [name for name, _ in pipeline.steps] == ["scaler", "kernel", "model"]
+    kernel = pipeline.steps[1][1]
+    assert isinstance(kernel, kernel_class)
+    assert kernel.n_components == 50
+    assert kernel.gamma == 0.5
+    assert kernel.random_state == 1234
+    assert isinstance(pipeline.steps[2][1], Ridge)
+    assert pipeline.steps[2][1].alpha == 2.0
+
+
+def test_invalid_kernel_approximation():
+    """Test that an invalid kernel approximation raises a ValueError."""
+    with pytest.raises(ValueError, match="Invalid kernel approximation: invalid"):
+        create_pipeline(model_type="svm_approx", approximation="invalid")
+
+
 def test_custom_seed():
     """Test that the seed is correctly passed to models."""
     custom_seed = 42
@@ -129,6 +200,9 @@ def test_functional_pipeline(sample_data):
         ("lasso", Lasso),
         ("random_forest", RandomForestRegressor),
         ("svm", SVR),
+        ("hist_gradient_boosting", HistGradientBoostingRegressor),
+        ("sgd", SGDRegressor),
+        ("svm_approx", Ridge),
     ],
 )
 def test_all_model_types(model_type, model_class):
@@ -155,3 +229,121 @@ def test_scaling_option(scale_features):
     else:
         assert len(pipeline.steps) == 1
         assert pipeline.steps[0][0] == "model"
+
+
+def test_transformer_cache(tmp_path, sample_data):
+    """Test that fitted preprocessing steps are reused through the cache."""
+    X, y = sample_data
+
+    pipeline = create_pipeline(model_type="linear", memory=str(tmp_path))
+    pipeline.fit(X, y)
+    create_pipeline(model_type="linear", memory=str(tmp_path)).fit(X, y)
+
+    assert isinstance(pipeline.memory, TransformerCache)
+    assert pipeline.memory.stats() == {"hits": 1, "misses": 1}
+
+
+def test_transformer_cache_hashes_once(tmp_path, monkeypatch):
+    """Test that recording a hit does not hash the arguments a second time."""
+    hashed = []
+    get_args_id = MemorizedFunc._get_args_id
+
+    def counted_get_args_id(self, *args, **kwargs):
+        hashed.append(args)
+        return get_args_id(self, *args, **kwargs)
+
+    monkeypatch.setattr(MemorizedFunc, "_get_args_id", counted_get_args_id)
+    cached = TransformerCache(tmp_path).cache(np.square)
+
+    cached(np.arange(3))
+    cached(np.arange(3))
+
+    assert len(hashed) == 2
+    assert TransformerCache(tmp_path).stats() == {"hits": 1, "misses": 1}
+
+
+def test_transformer_cache_stats_are_compacted(tmp_path, monkeypatch):
+    """Test that the statistics log is compacted into totals as it grows."""
+    monkeypatch.setattr(TransformerCache, "STATS_MAX_BYTES", 64)
+    cache = TransformerCache(tmp_path)
+    cached = cache.cache(np.square)
+
+    for _ in range(20):
+        cached(np.arange(3))
+
+    assert cache.stats() == {"hits": 19, "misses": 1}
+    assert (tmp_path / TransformerCache.STATS_FILE).stat().st_size <= 64
+
+
+def test_no_transformer_cache():
+    """Test that no cache is used by default."""
+    pipeline = create_pipeline(model_type="linear")
+
+    assert pipeline.memory is None
+
+
+def test_fold_ensemble(sample_data):
+    """Test that a fold ensemble averages the predictions of its estimators."""
+    X, y = sample_data
+    estimators = [
+        create_pipeline(model_type="linear").fit(X[:2], y[:2]),
+        create_pipeline(model_type="lasso", alpha=0.1).fit(X, y),
+    ]
+
+    ensemble = FoldEnsemble(estimators)
+
+    np.testing.assert_allclose(
+        ensemble.predict(X),
+        (estimators[0].predict(X) + estimators[1].predict(X)) / 2,
+    )
+
+
+def test_fit_costs_cover_model_types():
+    """Test that every model type has a fit cost to schedule it by."""
+    assert set(FIT_COSTS) == set(MODEL_TYPES)
+
+
+@pytest.mark.parametrize("model_type", MODEL_TYPES)
+def test_model_type_of(model_type):
+    """Test that the model type of a pipeline is found from its estimator."""
+    assert model_type_of(create_pipeline(model_type=model_type)) == model_type
+
+
+def test_warm_start_random_forest():
+    """Test that warm-starting a random forest grows more trees."""
+    X = np.random.default_rng(0).random((60, 3))
+    pipeline = create_pipeline(model_type="random_forest", n_estimators=5)
+    pipeline.fit(X[:40], X[:40].sum(axis=1))
+    trees = list(pipeline.named_steps["model"].estimators_)
+
+    warm_start(pipeline, X[40:], X[40:].sum(axis=1), n_estimators=3)
+
+    model = pipeline.named_steps["model"]
+    assert len(model.estimators_) == 8
+    assert model.estimators_[:5] == trees
+    assert not model.warm_start
+
+
+@pytest.mark.parametrize("model_type", ["sgd", "lasso"])
+def test_warm_start_linear(model_type):
+    """Test that warm-starting a linear model continues from its coefficients."""
+    X = np.random.default_rng(0).random((60, 3))
+    y = X @ np.array([1.0, 2.0, 3.0])
+    pipeline = create_pipeline(model_type=model_type, alpha=0.001)
+    pipeline.fit(X[:40], y[:40])
+    coef = pipeline.named_steps["model"].coef_.copy()
+
+    rows = slice(None) if WARM_START[model_type] == "full" else slice(40, None)
+    warm_start(pipeline, X[rows], y[rows])
+
+    assert not np.array_equal(pipeline.named_steps["model"].coef_, coef)
+    assert not getattr(pipeline.named_steps["model"], "warm_start", False)
+
+
+def test_warm_start_unsupported(sample_data):
+    """Test that warm-starting an unsupported model type raises an error."""
+    X, y = sample_data
+    pipeline = create_pipeline(model_type="linear").fit(X, y)
+
+    with pytest.raises(ValueError, match="does not support warm starts"):
+        warm_start(pipeline, X, y)
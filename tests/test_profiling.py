@@ -0,0 +1,51 @@
+import json
+import time
+
+import numpy as np
+
+from profiling import Profiler, stage
+
+
+def test_stages_are_recorded(tmp_path):
+    """Test that nested and repeated stages are recorded and saved."""
+    profiler = Profiler(trace_memory=True)
+    with profiler:
+        for _ in range(2):
+            with stage("outer"):
+                with stage("inner"):
+                    np.ones(1_000_000)
+                time.sleep(0.01)
+
+    profile = json.loads(profiler.save(tmp_path).read_text())
+
+    assert list(profile["stages"]) == ["outer/inner", "outer"]
+    assert profile["hottest_stage"] == "outer"
+    outer, inner = profile["stages"]["outer"], profile["stages"]["outer/inner"]
+    assert outer["calls"] == 2
+    assert outer["wall_seconds"] >= inner["wall_seconds"] + 0.02
+    assert inner["peak_traced_mb"] >= 7.5
+    assert outer["peak_traced_mb"] >= inner["peak_traced_mb"]
+
+
+def test_cprofile_of_hottest_stage(tmp_path):
+    """Test that the cProfile statistics of the hottest stage are saved."""
+    profiler = Profiler(cprofile=True)
+    with profiler:
+        with stage("fast"):
+            pass
+        with stage("slow"):
+            time.sleep(0.01)
+
+    profile = json.loads(profiler.save(tmp_path).read_text())
+
+    assert profile["cprofile"] == "profile.prof"
+    assert "sleep" in (tmp_path / "profile.txt").read_text()
+
+
+def test_stage_without_profiler():
+    """Test that stages are ignored without an active profiler."""
+    profiler = Profiler()
+    with stage("ignored"):
+        pass
+
+    assert profiler.stages == {}
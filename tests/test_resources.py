@@ -0,0 +1,80 @@
+import pytest
+from threadpoolctl import threadpool_info
+
+from models import FoldEnsemble, create_pipeline
+from resources import ResourceGovernor, parallelism, shallow_copy
+
+
+@pytest.mark.parametrize(
+    "model_types, n_tasks, n_jobs, expected",
+    [
+        # Threaded models get the cores the workers leave
+        ({"random_forest"}, 5, None, (5, 3)),
+        ({"hist_gradient_boosting"}, 1, None, (1, 16)),
+        # Single-threaded models run a thread per worker
+        ({"lasso"}, 5, None, (5, 1)),
+        ({"svm"}, None, None, (16, 1)),
+        # Any threaded model gets threads
+        ({"lasso", "random_forest"}, 40, None, (16, 1)),
+        ({"lasso", "random_forest"}, 4, None, (4, 4)),
+        # The configured number of workers caps the governed one
+        ({"random_forest"}, 10, 2, (2, 8)),
+        ({"random_forest"}, 10, -1, (10, 1)),
+        ({"random_forest"}, 10, -13, (4, 4)),
+    ],
+)
+def test_layout(model_types, n_tasks, n_jobs, expected):
+    """Test how the cores are split between workers and threads."""
+    governor = ResourceGovernor(n_cores=16)
+
+    assert governor.layout(model_types, n_tasks=n_tasks, n_jobs=n_jobs) == expected
+
+
+def test_layout_overrides():
+    """Test that fixed numbers of workers and threads override the automatic ones."""
+    governor = ResourceGovernor(n_cores=16, outer_jobs=2, inner_threads=3)
+
+    assert governor.layout({"lasso"}, n_tasks=5) == (2, 3)
+
+
+def test_parallelism_without_governor():
+    """Test that stages are left as configured without an active governor."""
+    pipeline = create_pipeline(model_type="random_forest")
+
+    with parallelism("fit", pipeline, n_tasks=1, n_jobs=-1) as n_jobs:
+        assert n_jobs == -1
+        assert pipeline.steps[-1][1].n_jobs is None
+
+
+def test_parallelism_limits_threads():
+    """Test that the threads of the estimators and of BLAS are limited in a stage."""
+    pipelines = [
+        create_pipeline(model_type="random_forest", n_jobs=7) for _ in range(2)
+    ]
+    models = [FoldEnsemble(pipelines), create_pipeline(model_type="linear")]
+
+    with ResourceGovernor(n_cores=8):
+        with parallelism("cross_validate", models, n_tasks=4, n_jobs=-1) as n_jobs:
+            assert n_jobs == 4
+            assert all(p.steps[-1][1].n_jobs == 2 for p in pipelines)
+            assert all(info["num_threads"] <= 2 for info in threadpool_info())
+
+    assert all(p.steps[-1][1].n_jobs == 7 for p in pipelines)
+    # Outside of the governor's block, stages are not governed anymore
+    with parallelism("fit", pipelines[0], n_tasks=1) as n_jobs:
+        assert n_jobs is None
+        assert pipelines[0].steps[-1][1].n_jobs == 7
+
+
+def test_shallow_copy_is_governed_alone():
+    """Test that governing a shallow copy leaves the original model untouched."""
+    pipelines = [create_pipeline(model_type="random_forest") for _ in range(2)]
+    ensemble = FoldEnsemble(pipelines)
+    copied = shallow_copy(ensemble)
+
+    with ResourceGovernor(n_cores=4):
+        with parallelism("predict", copied, n_tasks=1):
+            assert all(p.steps[-1][1].n_jobs == 4 for p in copied.estimators)
+            assert all(p.steps[-1][1].n_jobs is None for p in pipelines)
+
+    assert copied.estimators[0].steps[0][1] is pipelines[0].steps[0][1]
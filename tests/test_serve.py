@@ -0,0 +1,108 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from models import create_pipeline
+from serve import MicroBatcher, PredictionServer
+
+
+@pytest.fixture
+def server():
+    """Fixture that runs a prediction server on a free local port."""
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.random((100, 2)), columns=["a", "b"])
+    pipeline = create_pipeline(model_type="linear").fit(X, X["a"] - X["b"])
+
+    server = PredictionServer(pipeline, port=0, max_batch_size=32, max_wait_ms=20)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, pipeline, X
+    server.shutdown()
+    thread.join()
+
+
+def request(server, path, payload=None):
+    """Send a request to the server and decode its JSON response."""
+    host, port = server.address
+    data = json.dumps(payload).encode() if payload is not None else None
+    with urllib.request.urlopen(f"http://{host}:{port}{path}", data=data) as response:
+        return json.loads(response.read())
+
+
+def test_predict(server):
+    """Test that predictions match the pipeline for both payload layouts."""
+    server, pipeline, X = server
+    expected = pipeline.predict(X.iloc[:3])
+
+    records = request(server, "/predict", {"instances": X.iloc[:3].to_dict("records")})
+    rows = request(
+        server,
+        "/predict",
+        {"columns": ["b", "a"], "data": X.iloc[:3][["b", "a"]].values.tolist()},
+    )
+
+    np.testing.assert_allclose(records["predictions"], expected)
+    np.testing.assert_allclose(rows["predictions"], expected)
+
+
+def test_concurrent_requests_are_batched(server):
+    """Test that concurrent requests are coalesced and answered correctly."""
+    server, pipeline, X = server
+
+    def predict_row(i):
+        payload = {"instances": X.iloc[[i]].to_dict("records")}
+        return request(server, "/predict", payload)["predictions"][0]
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        predictions = list(executor.map(predict_row, range(len(X))))
+
+    np.testing.assert_allclose(predictions, pipeline.predict(X))
+
+    stats = request(server, "/stats")
+    assert stats["requests"] == len(X)
+    assert stats["batches"] < len(X)
+    assert stats["p99_ms"] >= stats["p50_ms"] > 0
+
+
+def test_missing_features(server):
+    """Test that a request lacking features is rejected."""
+    server, _, _ = server
+
+    with pytest.raises(urllib.error.HTTPError) as e:
+        request(server, "/predict", {"instances": [{"a": 1.0}]})
+
+    assert e.value.code == 400
+
+
+def test_non_numeric_request(server):
+    """Test that a request with non-numeric values is rejected by itself."""
+    server, _, _ = server
+
+    with pytest.raises(urllib.error.HTTPError) as e:
+        request(server, "/predict", {"instances": [{"a": "one", "b": 2.0}]})
+
+    assert e.value.code == 400
+
+
+def test_failed_batch_is_retried_per_request(server):
+    """Test that a request failing its batch does not fail the others."""
+    _, pipeline, X = server
+    batcher = MicroBatcher(pipeline.predict, max_wait_ms=200)
+    bad = X.iloc[:2].assign(a=np.nan)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [
+            executor.submit(batcher.submit, frame) for frame in (X.iloc[:3], bad, X)
+        ]
+    batcher.close()
+
+    np.testing.assert_allclose(futures[0].result(), pipeline.predict(X.iloc[:3]))
+    np.testing.assert_allclose(futures[2].result(), pipeline.predict(X))
+    with pytest.raises(ValueError, match="NaN"):
+        futures[1].result()
@@ -0,0 +1,187 @@
+import json
+from contextlib import nullcontext
+
+import hydra
+import numpy as np
+import pandas as pd
+import pytest
+from hydra import compose, initialize_config_dir
+from hydra.core.hydra_config import HydraConfig
+from omegaconf import open_dict
+
+from checkpoint import load_lineage, load_model, trained_rows
+from train import CONFIG_DIR, train
+
+
+def write_dataset(path, n_rows, seed=0):
+    """Write a synthetic regression dataset of `n_rows` rows to `path`."""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, 3))
+    df = pd.DataFrame(X, columns=["a", "b", "c"])
+    df.insert(0, "id", np.arange(n_rows))
+    df["target"] = X[:, 0] + np.sin(X[:, 1]) + rng.normal(scale=0.1, size=n_rows)
+    df.to_csv(path, index=False)
+    return df
+
+
+@pytest.fixture
+def compose_train(tmp_path):
+    """Fixture composing the training configuration on synthetic datasets."""
+    write_dataset(tmp_path / "train.csv", 200)
+    write_dataset(tmp_path / "test.csv", 20).drop(columns=["target"]).to_csv(
+        tmp_path / "test.csv", index=False
+    )
+
+    def compose_train(*overrides):
+        cfg = compose(
+            "train",
+            overrides=[
+                f"data.train_dataset_url={tmp_path / 'train.csv'}",
+                f"data.test_dataset_url={tmp_path / 'test.csv'}",
+                "data.target_variable=target",
+                "data.exclude_features=[]",
+                "data.cache_dir=null",
+                "data.download_dir=null",
+                "cross_validate.cv=2",
+                "cross_validate.n_jobs=1",
+                "share_data=false",
+                "compile_model=false",
+                f"checkpoint_dir={tmp_path / 'models'}",
+                f"hydra.runtime.output_dir={tmp_path / 'outputs'}",
+                *overrides,
+            ],
+            return_hydra_config=True,
+        )
+        HydraConfig.instance().set_config(cfg)
+        with open_dict(cfg):
+            del cfg["hydra"]
+
+        for directory in ("models", "outputs"):
+            (tmp_path / directory).mkdir(exist_ok=True)
+        return cfg
+
+    # Training composes model configurations of its own
+    with initialize_config_dir(CONFIG_DIR.as_posix(), version_base="1.3"):
+        yield compose_train
+
+
+def test_retrain_keeps_parent_rows_out_of_validation(tmp_path, compose_train):
+    """Test that retraining a grown dataset holds out no row the parent fitted."""
+    train(compose_train("model=random_forest", "model.n_estimators=5"))
+    (parent,) = (tmp_path / "models").glob("*.joblib")
+
+    # 60 rows added and 10 changed
+    added = write_dataset(tmp_path / "added.csv", 60, seed=1)
+    added["id"] += 200
+    df = pd.concat([write_dataset(tmp_path / "train.csv", 200), added])
+    df.iloc[:10, 1] += 1
+    df.to_csv(tmp_path / "train.csv", index=False)
+
+    (tmp_path / "child").mkdir()
+    train(
+        compose_train(
+            "model=random_forest",
+            f"parent_checkpoint={parent}",
+            f"checkpoint_dir={tmp_path / 'child'}",
+            "retrain_estimators=3",
+        )
+    )
+    (child,) = (tmp_path / "child").glob("*.joblib")
+
+    parent_lineage, child_lineage = load_lineage(parent), load_lineage(child)
+    assert child_lineage["parent"] == str(parent)
+    assert child_lineage["new_rows"] == 60
+    assert child_lineage["changed_rows"] == 10
+    held_out = child_lineage["ids"][child_lineage["held_out"]]
+    assert not trained_rows(parent_lineage, held_out).any()
+
+    results = pd.read_csv(tmp_path / "outputs" / "validation_results.csv")
+    assert len(results) == 2
+    assert json.loads(child.with_suffix(".lineage.json").read_text())["rows"] == 260
+
+
+def test_compact_checkpoint_is_pruned_out_of_bag(tmp_path, compose_train, caplog):
+    """Test that a compact forest is pruned without looking at the held out rows."""
+    cfg = compose_train(
+        "model=random_forest",
+        "model.n_estimators=10",
+        "compact_checkpoint=true",
+        "prune_loss_budget=0.5",
+    )
+    train(cfg)
+    (path,) = (tmp_path / "models").glob("*.joblib")
+
+    report = load_lineage(path)["compaction"]
+    assert "out-of-bag loss" in caplog.text
+    assert report["compact"]["size_mb"] < report["original"]["size_mb"]
+    assert "r2_score" in report["compact"]
+
+
+@pytest.mark.parametrize("final_model", ["refit", "concurrent", "ensemble"])
+def test_final_model(tmp_path, compose_train, final_model):
+    """Test that every final model strategy saves a checkpoint after CV."""
+    train(compose_train(f"final_model={final_model}", "cross_validate.cv=3"))
+    (path,) = (tmp_path / "models").glob("*.joblib")
+
+    model = load_model(path)
+    cv_results = pd.read_csv(tmp_path / "outputs" / "cv_results.csv", index_col=0)
+    assert list(cv_results.index) == ["linear"]
+    assert hasattr(model, "estimators") == (final_model == "ensemble")
+    if final_model == "ensemble":
+        assert len(model.estimators) == 3
+
+    X = write_dataset(tmp_path / "predict.csv", 5)[["a", "b", "c"]]
+    assert model.predict(X).shape == (5,)
+
+
+def test_train_incremental(tmp_path, compose_train, caplog):
+    """Test that a model is trained out-of-core on chunks of the training rows."""
+    train(compose_train("model=sgd", "chunk_size=64", "epochs=2"))
+    (path,) = (tmp_path / "models").glob("*.joblib")
+
+    results = pd.read_csv(tmp_path / "outputs" / "validation_results.csv", index_col=0)
+    assert list(results.index) == ["sgd"]
+    assert caplog.text.count("(epoch ") == 2
+    X = write_dataset(tmp_path / "predict.csv", 5)[["a", "b", "c"]]
+    assert load_model(path).predict(X).shape == (5,)
+
+    with pytest.raises(ValueError, match="do not support incremental training"):
+        train(compose_train("model=random_forest", "chunk_size=64"))
+
+
+def test_train_models(tmp_path, compose_train, caplog):
+    """Test that several models are compared with the overrides of the run."""
+    train(
+        compose_train(
+            "models=[linear,lasso]",
+            "model=lasso",
+            "model.scale_features=false",
+            "model.alpha=0.01",
+        )
+    )
+    (path,) = (tmp_path / "models").glob("*.joblib")
+
+    leaderboard = pd.read_csv(tmp_path / "outputs" / "cv_results.csv", index_col=0)
+    assert sorted(leaderboard.index) == ["lasso", "linear"]
+    assert list(leaderboard["rank"]) == [1, 2]
+    # Every model was composed without the scaler
+    assert len(load_model(path).steps) == 1
+    # The regularization of the lasso does not apply to the linear model
+    assert "Skipped overrides for model linear: model.alpha=0.01" in caplog.text
+    assert "Skipped overrides for model lasso" not in caplog.text
+
+
+@pytest.mark.parametrize("governed", [True, False])
+def test_governed_checkpoint_leaves_threads_unset(tmp_path, compose_train, governed):
+    """Test that threads chosen by the governor are not saved in the checkpoint."""
+    cfg = compose_train(
+        "model=random_forest",
+        "model.n_estimators=5",
+        "+model.n_jobs=2",
+        *([] if governed else ["~resources"]),
+    )
+    with hydra.utils.instantiate(cfg.resources) if governed else nullcontext():
+        train(cfg)
+    (path,) = (tmp_path / "models").glob("*.joblib")
+
+    assert load_model(path).steps[-1][1].n_jobs == (None if governed else 2)
@@ -0,0 +1,185 @@
+import numpy as np
+
+from utils import TopK
+
+
+def test_top_k_matches_full_sort():
+    """Test that the bounded heap keeps the same items as a full sort."""
+    rng = np.random.default_rng(0)
+    values = rng.random(1000)
+    ids = np.arange(1000)
+
+    top_k = TopK(10)
+    for chunk in np.array_split(np.arange(1000), 7):
+        top_k.update(ids[chunk], values[chunk])
+
+    expected = np.argsort(values)[::-1][:10]
+    assert [item for item, _ in top_k.items()] == expected.tolist()
+    np.testing.assert_allclose([v for _, v in top_k.items()], values[expected])
+
+
+def test_top_k_fewer_items_than_k():
+    """Test that every item is kept when fewer than k are offered."""
+    top_k = TopK(5)
+    top_k.update(["a", "b"], np.array([1.0, 2.0]))
+
+    assert top_k.items() == [("b", 2.0), ("a", 1.0)]
+
+
+def test_top_k_zero():
+    """Test that nothing is kept when k is zero."""
+    top_k = TopK(0)
+    top_k.update(["a", "b"], np.array([1.0, 2.0]))
+
+    assert top_k.items() == []
+
+
+def test_top_predictions_zero():
+    """Test that no prediction is selected when k is zero."""
+    import pandas as pd
+
+    from utils import top_predictions
+
+    predictions = pd.DataFrame({"id": np.arange(5), "target": np.arange(5.0)})
+
+    assert top_predictions(predictions, "target", 0).empty
+
+
+def test_format_search_results():
+    """Test that search results are ranked, best candidate first."""
+    from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+    from sklearn.model_selection import HalvingGridSearchCV
+
+    from models import create_pipeline
+    from utils import format_search_results
+
+    rng = np.random.default_rng(0)
+    X = rng.random((60, 2))
+    y = X[:, 0] + rng.normal(scale=0.1, size=60)
+    search = HalvingGridSearchCV(
+        create_pipeline(model_type="lasso"),
+        {"model__alpha": [0.001, 0.1, 10.0]},
+        cv=3,
+        return_train_score=True,
+    ).fit(X, y)
+
+    results = format_search_results(search.cv_results_)
+
+    assert list(results.columns) == [
+        "params",
+        "rank",
+        "iter",
+        "n_resources",
+        "test_score",
+        "train_score",
+        "fit_time",
+    ]
+    assert results.iloc[0]["params"] == str(search.best_params_)
+
+
+def test_running_regression_metrics():
+    """Test that metrics accumulated over batches match scikit-learn's."""
+    from sklearn.metrics import (
+        mean_absolute_error,
+        mean_absolute_percentage_error,
+        r2_score,
+        root_mean_squared_error,
+    )
+
+    from utils import RunningRegressionMetrics
+
+    rng = np.random.default_rng(0)
+    y_true = rng.random(100) + 0.5
+    y_pred = y_true + rng.normal(scale=0.1, size=100)
+
+    metrics = RunningRegressionMetrics()
+    for batch in np.array_split(np.arange(100), 6):
+        metrics.update(y_true[batch], y_pred[batch])
+    results = metrics.compute()
+
+    np.testing.assert_allclose(
+        results["mean_absolute_error"], mean_absolute_error(y_true, y_pred)
+    )
+    np.testing.assert_allclose(
+        results["mean_absolute_percentage_error"],
+        mean_absolute_percentage_error(y_true, y_pred),
+    )
+    np.testing.assert_allclose(
+        results["root_mean_squared_error"], root_mean_squared_error(y_true, y_pred)
+    )
+    np.testing.assert_allclose(results["r2_score"], r2_score(y_true, y_pred))
+
+
+def test_evaluate_model_matches_sklearn():
+    """Test that vectorized metrics match scikit-learn's, alongside other metrics."""
+    from omegaconf import OmegaConf
+    from sklearn import metrics as sklearn_metrics
+
+    from utils import evaluate_model
+
+    rng = np.random.default_rng(0)
+    y_true = rng.random(200) + 0.5
+    y_pred = y_true + rng.normal(scale=0.1, size=200)
+    names = [
+        "mean_absolute_error",
+        "mean_absolute_percentage_error",
+        "root_mean_squared_error",
+        "median_absolute_error",
+        "max_error",
+        "r2_score",
+        "explained_variance_score",
+        "mean_squared_log_error",
+    ]
+    cfg = OmegaConf.create(
+        {name: {"_target_": f"sklearn.metrics.{name}"} for name in names}
+    )
+
+    results = evaluate_model(cfg, y_true, y_pred)
+
+    assert list(results) == names
+    for name in names:
+        expected = getattr(sklearn_metrics, name)(y_true, y_pred)
+        np.testing.assert_allclose(results[name], expected, err_msg=name)
+
+
+def test_bootstrap_metrics():
+    """Test that bootstrap intervals are reproducible and contain the point estimate."""
+    from omegaconf import OmegaConf
+
+    from utils import bootstrap_metrics, evaluate_model
+
+    rng = np.random.default_rng(0)
+    y_true = rng.random(500)
+    y_pred = y_true + rng.normal(scale=0.1, size=500)
+    cfg = OmegaConf.create(
+        {
+            "r2_score": {"_target_": "sklearn.metrics.r2_score"},
+            "mean_absolute_error": {"_target_": "sklearn.metrics.mean_absolute_error"},
+        }
+    )
+
+    intervals = bootstrap_metrics(cfg, y_true, y_pred, n_resamples=200, seed=0)
+    blocked = bootstrap_metrics(
+        cfg, y_true, y_pred, n_resamples=200, seed=0, max_block_size=10000
+    )
+    metrics = evaluate_model(cfg, y_true, y_pred)
+
+    for name, (low, high) in intervals.items():
+        assert low < metrics[name] < high
+    assert blocked == intervals
+
+
+def test_top_predictions():
+    """Test that the selected top predictions match a full sort."""
+    import pandas as pd
+
+    from utils import top_predictions
+
+    rng = np.random.default_rng(0)
+    predictions = pd.DataFrame({"id": np.arange(1000), "target": rng.random(1000)})
+
+    top = top_predictions(predictions, "target", 10)
+
+    pd.testing.assert_frame_equal(
+        top, predictions.sort_values("target", ascending=False).head(10)
+    )
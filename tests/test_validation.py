@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.module import DataModule
+from data.validation import DataValidator
+
+
+@pytest.fixture
+def frame():
+    """Fixture providing a frame breaking every rule once."""
+    return pd.DataFrame(
+        {
+            "id": [0, 1, 2, 3, 4, 1],
+            "a": [0.1, np.nan, 0.3, np.inf, 0.5, 0.6],
+            "label": ["x", "y", None, "z", "w", "v"],
+            "target": [1.0, 2.0, 3.0, 4.0, -1.0, 6.0],
+        }
+    )
+
+
+def test_validate_rules(frame):
+    """Test that every rule flags its rows and the valid mask excludes them all."""
+    validator = DataValidator(schema={"target": {"min": 0}})
+
+    valid, broken = validator.validate(frame)
+
+    np.testing.assert_array_equal(valid, [True, False, False, False, False, False])
+    np.testing.assert_array_equal(broken["missing"], [0, 1, 1, 0, 0, 0])
+    np.testing.assert_array_equal(broken["infinite"], [0, 0, 0, 1, 0, 0])
+    np.testing.assert_array_equal(broken["out_of_range"], [0, 0, 0, 0, 1, 0])
+    np.testing.assert_array_equal(broken["duplicate_id"], [0, 0, 0, 0, 0, 1])
+
+
+def test_disabled_rules(frame):
+    """Test that disabled rules are not checked."""
+    validator = DataValidator(
+        drop_missing=False, drop_infinite=False, drop_duplicate_ids=False
+    )
+
+    valid, broken = validator.validate(frame)
+
+    assert valid.all()
+    assert broken == {}
+
+
+def test_clean_reports_and_quarantines(tmp_path, frame):
+    """Test that cleaning reports per-rule counts and quarantines rejected rows."""
+    validator = DataValidator(quarantine_dir=tmp_path)
+
+    df = validator.clean(frame, "train")
+
+    assert df["id"].tolist() == [0, 4]
+    assert validator.reports["train"] == {
+        "rows": 6,
+        "rejected": 4,
+        "missing": 2,
+        "infinite": 1,
+        "duplicate_id": 1,
+    }
+    quarantined = pd.read_csv(tmp_path / "train-rejected.csv")
+    assert quarantined["rejected_by"].tolist() == [
+        "missing",
+        "missing",
+        "infinite",
+        "duplicate_id",
+    ]
+
+
+def test_clean_valid_frame_is_not_copied(frame):
+    """Test that a frame without invalid rows is returned as is."""
+    df = frame.iloc[[0, 4]]
+
+    assert DataValidator().clean(df, "test") is df
+
+
+def test_duplicates_across_chunks(frame):
+    """Test that duplicate ids are found across the chunks of a dataset."""
+    validator = DataValidator(drop_missing=False, drop_infinite=False)
+    seen_ids: set = set()
+
+    first = validator.clean(frame.iloc[:3], "train", seen_ids=seen_ids)
+    second = validator.clean(frame.iloc[3:], "train", seen_ids=seen_ids)
+
+    assert first["id"].tolist() == [0, 1, 2]
+    assert second["id"].tolist() == [3, 4]
+    assert validator.reports["train"]["duplicate_id"] == 1
+
+
+def test_data_module_validates_both_datasets(tmp_path):
+    """Test that invalid rows of both datasets are dropped and quarantined."""
+    df = pd.DataFrame(
+        {
+            "id": np.arange(20),
+            "a": np.linspace(0, 1, 20),
+            "target": np.linspace(1, 2, 20),
+        }
+    )
+    df.loc[3, "a"] = np.inf
+    df.loc[5, "target"] = 10.0
+    pd.concat([df, df.iloc[[7]]]).to_csv(tmp_path / "train.csv", index=False)
+    df.drop(columns=["target"]).to_csv(tmp_path / "test.csv", index=False)
+
+    data_module = DataModule(
+        str(tmp_path / "train.csv"),
+        str(tmp_path / "test.csv"),
+        "target",
+        schema={"target": {"max": 5}},
+        quarantine_dir=str(tmp_path / "quarantine"),
+    )
+
+    ids, _, _ = data_module.get_train_data()
+    test_ids, _ = data_module.get_test_data()
+
+    assert sorted(ids) == [i for i in range(20) if i not in (3, 5)]
+    assert sorted(test_ids) == [i for i in range(20) if i != 3]
+    assert data_module.validator.reports["train"]["rejected"] == 3
+    assert (tmp_path / "quarantine" / "test-rejected.csv").is_file()
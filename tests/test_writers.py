@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from writers import ArrowWriter, CSVWriter, open_writer
+
+
+@pytest.fixture
+def predictions():
+    """Fixture providing a frame of predictions."""
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({"id": np.arange(100), "target": rng.random(100)})
+
+
+@pytest.mark.parametrize(
+    "suffix", [".csv", ".csv.gz", ".csv.bz2", ".csv.xz", ".csv.zst"]
+)
+def test_csv_writer_round_trip(tmp_path, predictions, suffix):
+    """Test that chunks written as (compressed) CSV read back as the whole frame."""
+    if suffix == ".csv.zst":
+        pytest.importorskip("zstandard")
+    path = tmp_path / f"predictions{suffix}"
+
+    with open_writer(path) as writer:
+        assert isinstance(writer, CSVWriter)
+        for chunk in np.array_split(np.arange(100), 3):
+            writer.write(predictions.iloc[chunk])
+
+    assert writer.rows == 100
+    pd.testing.assert_frame_equal(pd.read_csv(path), predictions)
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".feather"])
+def test_arrow_writer_round_trip(tmp_path, predictions, suffix):
+    """Test that chunks written as Parquet or Feather read back as the whole frame."""
+    pytest.importorskip("pyarrow")
+    path = tmp_path / f"predictions{suffix}"
+
+    with open_writer(path) as writer:
+        assert isinstance(writer, ArrowWriter)
+        writer.write(predictions.iloc[:40])
+        writer.write(predictions.iloc[40:])
+
+    read = pd.read_parquet if suffix == ".parquet" else pd.read_feather
+    pd.testing.assert_frame_equal(read(path), predictions)
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".feather"])
+def test_arrow_writer_widens_chunks(tmp_path, suffix):
+    """Test that chunks whose ids were downcast to different widths are written."""
+    pytest.importorskip("pyarrow")
+    path = tmp_path / f"predictions{suffix}"
+    chunks = [
+        pd.DataFrame({"id": np.arange(100, dtype=np.int8), "target": 1.0}),
+        pd.DataFrame(
+            {"id": np.arange(1000, 1100, dtype=np.int16), "target": np.float32(2.0)}
+        ),
+        pd.DataFrame(
+            {"id": np.arange(10**6, 10**6 + 100, dtype=np.int32), "target": 3.0}
+        ),
+    ]
+
+    with open_writer(path) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+
+    read = pd.read_parquet if suffix == ".parquet" else pd.read_feather
+    expected = pd.concat(chunks, ignore_index=True).astype(
+        {"id": np.int64, "target": np.float64}
+    )
+    pd.testing.assert_frame_equal(read(path), expected)